@@ -0,0 +1,133 @@
+import json
+import secrets
+import threading
+from email.parser import BytesParser
+from http.client import responses
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlsplit, parse_qs
+
+from src.Benchmarks.local_server import LocalServer, Response, json_response
+from src.Benchmarks.fake_calendar_service import FakeCalendarService
+
+# Local stand-in for the Calendar v3 REST API, including the multipart batch endpoint, backed by
+# FakeCalendarService. googleapiclient is pointed at it through a rewritten discovery document, so
+# the writer runs its real request, batch and retry code against it.
+
+CALENDARS_PATH = '/calendar/v3/calendars/'
+BATCH_PATH = '/batch/calendar/v3'
+
+
+def api_error(status: int, message: str, reason: str) -> Response:
+    return json_response(status, {'error': {'code': status, 'message': message,
+                                            'errors': [{'domain': 'global', 'reason': reason, 'message': message}]}})
+
+
+class FakeCalendarServer(LocalServer):
+    def __init__(self, service: Optional[FakeCalendarService] = None, latency_ms: float = 0.0,
+                 throttle_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency_ms, seed)
+        self.service = service or FakeCalendarService()
+        # Share of calls answered with 403 rateLimitExceeded, to exercise the limiter's retries
+        self.throttle_rate = throttle_rate
+
+    def call(self, method: str, path: str, query: Dict[str, list], body: bytes) -> Response:
+        if not path.startswith(CALENDARS_PATH):
+            return api_error(404, 'Not Found', 'notFound')
+        parts = path[len(CALENDARS_PATH):].split('/')
+        if len(parts) not in (2, 3) or parts[1] != 'events':
+            return api_error(404, 'Not Found', 'notFound')
+        if self.chance(self.throttle_rate):
+            self.count('throttled')
+            return api_error(403, 'Rate Limit Exceeded', 'rateLimitExceeded')
+        calendar_id = unquote(parts[0])
+        event_id = unquote(parts[2]) if len(parts) == 3 else None
+        params = {name: values[0] for name, values in query.items()}
+        payload = json.loads(body) if body else None
+        try:
+            if event_id is None and method == 'GET':
+                result = self.service.list_events(calendar_id, params.get('pageToken'),
+                                                  int(params.get('maxResults', 250)), params.get('syncToken'),
+                                                  params.get('timeMin'), params.get('privateExtendedProperty'),
+                                                  params.get('q'))
+            elif event_id is None and method == 'POST':
+                result = self.service.insert_event(calendar_id, payload)
+            elif method == 'PUT':
+                result = self.service.update_event(calendar_id, event_id, payload)
+            elif method == 'PATCH':
+                result = self.service.patch_event(calendar_id, event_id, payload)
+            elif method == 'DELETE':
+                self.service.delete_event(calendar_id, event_id)
+                return 204, {}, b''
+            else:
+                return api_error(405, 'Method Not Allowed', 'badRequest')
+        except KeyError as error:
+            return api_error(404, str(error), 'notFound')
+        except Exception as error:
+            status = getattr(getattr(error, 'resp', None), 'status', None)
+            if status is None:
+                raise
+            return api_error(status, str(error), {409: 'duplicate', 410: 'deleted'}.get(status, 'notFound'))
+        return json_response(200, result)
+
+    def batch(self, headers: Dict[str, str], body: bytes) -> Response:
+        self.service.count('batch')
+        content_type = headers.get('Content-Type') or headers.get('content-type') or ''
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body)
+        boundary = 'batch_' + secrets.token_hex(8)
+        out: List[str] = []
+        for part in message.get_payload():
+            request_text = part.get_payload()
+            head, _, request_body = request_text.replace('\r\n', '\n').partition('\n\n')
+            request_line = head.split('\n', 1)[0]
+            method, target = request_line.split(' ')[:2]
+            target_parts = urlsplit(target)
+            status, response_headers, content = self.call(method, target_parts.path, parse_qs(target_parts.query),
+                                                          request_body.encode('utf-8'))
+            content_id = part['Content-ID'] or ''
+            out.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                       f"Content-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+                       f"HTTP/1.1 {status} {responses.get(status, '')}\r\n"
+                       f"Content-Type: {response_headers.get('Content-Type', 'application/json')}\r\n"
+                       f"Content-Length: {len(content)}\r\n\r\n{content.decode('utf-8')}\r\n")
+        out.append(f"--{boundary}--\r\n")
+        return 200, {'Content-Type': f"multipart/mixed; boundary={boundary}"}, ''.join(out).encode('utf-8')
+
+    def handle(self, method: str, path: str, query: Dict[str, list], headers: Dict[str, str],
+               body: bytes) -> Response:
+        if path == BATCH_PATH and method == 'POST':
+            self.count('batch')
+            return self.batch(headers, body)
+        self.count('single')
+        return self.call(method, path, query, body)
+
+
+class LocalServiceFactory(object):
+    # Drop-in for CalendarServiceFactory that builds real googleapiclient services aimed at a local server
+    def __init__(self, base_url: str):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self._local = threading.local()
+        self._discovery_doc: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get_credentials(self) -> object:
+        return object()
+
+    def get_discovery_document(self) -> str:
+        with self._lock:
+            if self._discovery_doc is None:
+                from googleapiclient.discovery_cache import get_static_doc
+                document = json.loads(get_static_doc('calendar', 'v3'))
+                # The batch endpoint is built from rootUrl, client_options only moves the REST calls
+                document['rootUrl'] = self.base_url
+                self._discovery_doc = json.dumps(document)
+            return self._discovery_doc
+
+    def get_service(self) -> Any:
+        # One service per thread, httplib2 connections are not thread safe
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            import httplib2
+            from googleapiclient.discovery import build_from_document
+            service = build_from_document(self.get_discovery_document(), http=httplib2.Http(timeout=30))
+            self._local.service = service
+        return service
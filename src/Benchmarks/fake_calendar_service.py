@@ -0,0 +1,179 @@
+import itertools
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+# In-memory stand-in for the googleapiclient Calendar v3 service. It covers the calls the
+# loader makes: events().list/insert/update/patch/delete(...).execute() and new_batch_http_request.
+
+
+class FakeHttpError(Exception):
+    # Carries resp.status like googleapiclient's HttpError, which is all the loader reads from it
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.resp = type('FakeResponse', (dict,), {'status': status})()
+
+
+class FakeRequest(object):
+    def __init__(self, func: Callable[[], Any]):
+        self._func = func
+
+    def execute(self, num_retries: int = 0) -> Any:
+        return self._func()
+
+
+class FakeBatch(object):
+    def __init__(self, service: 'FakeCalendarService', callback: Optional[Callable] = None):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request: FakeRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None):
+        self._requests.append((request_id or str(len(self._requests)), request, callback or self._callback))
+
+    def execute(self, http: Any = None):
+        self._service.count('batch')
+        for request_id, request, callback in self._requests:
+            try:
+                response, error = request.execute(), None
+            except Exception as exception:
+                response, error = None, exception
+            if callback is not None:
+                callback(request_id, response, error)
+
+
+class FakeEventsResource(object):
+    def __init__(self, service: 'FakeCalendarService'):
+        self._service = service
+
+    def list(self, calendarId: str, pageToken: Optional[str] = None, maxResults: int = 250,
+             syncToken: Optional[str] = None, timeMin: Optional[str] = None,
+             privateExtendedProperty: Optional[str] = None, q: Optional[str] = None, **kwargs) -> FakeRequest:
+        return FakeRequest(lambda: self._service.list_events(calendarId, pageToken, maxResults, syncToken, timeMin,
+                                                             privateExtendedProperty, q))
+
+    def insert(self, calendarId: str, body: dict, **kwargs) -> FakeRequest:
+        return FakeRequest(lambda: self._service.insert_event(calendarId, body))
+
+    def update(self, calendarId: str, eventId: str, body: dict, **kwargs) -> FakeRequest:
+        return FakeRequest(lambda: self._service.update_event(calendarId, eventId, body))
+
+    def patch(self, calendarId: str, eventId: str, body: dict, **kwargs) -> FakeRequest:
+        return FakeRequest(lambda: self._service.patch_event(calendarId, eventId, body))
+
+    def delete(self, calendarId: str, eventId: str, **kwargs) -> FakeRequest:
+        return FakeRequest(lambda: self._service.delete_event(calendarId, eventId))
+
+
+class FakeCalendarService(object):
+    def __init__(self):
+        self.calendars: Dict[str, Dict[str, dict]] = {}
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def count(self, call: str):
+        with self._lock:
+            self.calls[call] += 1
+
+    def events(self) -> FakeEventsResource:
+        return FakeEventsResource(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+    def _store(self, calendar_id: str, event: dict) -> dict:
+        event['updated_sequence'] = next(self._sequence)
+        self.calendars.setdefault(calendar_id, {})[event['id']] = event
+        return event
+
+    def list_events(self, calendar_id: str, page_token: Optional[str], max_results: int,
+                    sync_token: Optional[str], time_min: Optional[str], private_property: Optional[str] = None,
+                    query: Optional[str] = None) -> dict:
+        self.count('list')
+        with self._lock:
+            events = list(self.calendars.get(calendar_id, {}).values())
+            if sync_token is not None:
+                events = [event for event in events if event['updated_sequence'] > int(sync_token)]
+            else:
+                events = [event for event in events if event.get('status') != 'cancelled']
+                if time_min is not None:
+                    events = [event for event in events if event['start']['dateTime'][:10] >= time_min[:10]]
+                if private_property is not None:
+                    name, value = private_property.split('=', 1)
+                    events = [event for event in events
+                              if ((event.get('extendedProperties') or {}).get('private') or {}).get(name) == value]
+                if query is not None:
+                    events = [event for event in events if query.lower() in (event.get('summary') or '').lower()]
+            events.sort(key=lambda event: (event['start']['dateTime'], event['id']))
+            offset = int(page_token or 0)
+            page = [dict(event) for event in events[offset:offset + max_results]]
+            result = {'items': page}
+            if offset + max_results < len(events):
+                result['nextPageToken'] = str(offset + max_results)
+            elif private_property is None and query is None:
+                # Like the real API, filtered listings come back without a sync token
+                result['nextSyncToken'] = str(max([0] + [event['updated_sequence']
+                                                         for event in self.calendars.get(calendar_id, {}).values()]))
+            return result
+
+    def insert_event(self, calendar_id: str, body: dict) -> dict:
+        self.count('insert')
+        with self._lock:
+            event = dict(body)
+            event.setdefault('id', f"fake{next(self._ids)}")
+            if event['id'] in self.calendars.get(calendar_id, {}):
+                # Client chosen ids stay taken even after the event is deleted
+                raise FakeHttpError(409, f"The requested identifier already exists: {event['id']}")
+            event['status'] = 'confirmed'
+            return dict(self._store(calendar_id, event))
+
+    def update_event(self, calendar_id: str, event_id: str, body: dict) -> dict:
+        self.count('update')
+        with self._lock:
+            if event_id not in self.calendars.get(calendar_id, {}):
+                raise FakeHttpError(404, f"Event {event_id} not found")
+            event = dict(body, id=event_id)
+            event.setdefault('status', 'confirmed')
+            return dict(self._store(calendar_id, event))
+
+    def patch_event(self, calendar_id: str, event_id: str, body: dict) -> dict:
+        self.count('patch')
+        with self._lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None:
+                raise FakeHttpError(404, f"Event {event_id} not found")
+            if 'extendedProperties' in body:
+                # Like the real API, patching private properties merges them with the existing ones
+                private = dict((event.get('extendedProperties') or {}).get('private') or {})
+                private.update((body['extendedProperties'] or {}).get('private') or {})
+                body = dict(body, extendedProperties={'private': private})
+            event = dict(event, **body)
+            return dict(self._store(calendar_id, event))
+
+    def delete_event(self, calendar_id: str, event_id: str) -> str:
+        self.count('delete')
+        with self._lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None:
+                raise FakeHttpError(404, f"Event {event_id} not found")
+            if event.get('status') == 'cancelled':
+                raise FakeHttpError(410, f"Event {event_id} has been deleted")
+            self._store(calendar_id, dict(event, status='cancelled'))
+            return ''
+
+    def live_events(self, calendar_id: str) -> List[dict]:
+        return [event for event in self.calendars.get(calendar_id, {}).values() if event.get('status') != 'cancelled']
+
+
+class FakeServiceFactory(object):
+    # Drop-in for CalendarServiceFactory so the writer can run without Google credentials
+    def __init__(self, service: Optional[FakeCalendarService] = None):
+        self.service = service or FakeCalendarService()
+
+    def get_credentials(self) -> object:
+        return object()
+
+    def get_service(self) -> FakeCalendarService:
+        return self.service
@@ -0,0 +1,103 @@
+import json
+import random
+import secrets
+import calendar
+import datetime as dt
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Set
+
+from src.Benchmarks.local_server import LocalServer, Response, json_response
+from src.Benchmarks.synthetic_storeforce import random_month_schedule, generate_month_page
+from src.config.LUSH_STORE_FORCE_URL import LOGIN_PATH, SCHEDULE_PATH
+
+# Local stand-in for the StoreForce ESS site. It serves the JSON endpoints HttpScheduleSource reads
+# and the rendered knockout month page, both from the same per user synthetic schedule.
+
+ESS_PATH = '/storeforce/ess/'
+SESSION_COOKIE = 'ESSSession'
+
+
+class FakeStoreForceServer(LocalServer):
+    def __init__(self, users: Dict[str, str], latency_ms: float = 0.0, login_failure_rate: float = 0.0,
+                 density: float = 0.6, noise_blocks: int = 200, seed: int = 0):
+        super().__init__(latency_ms, seed)
+        self.users = dict(users)
+        self.login_failure_rate = login_failure_rate
+        self.density = density
+        self.noise_blocks = noise_blocks
+        self.seed = seed
+        self._sessions: Dict[str, str] = {}
+        # Users whose schedule was reshuffled, and how many times
+        self._generations: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        return self.url.rstrip('/') + ESS_PATH
+
+    def reshuffle(self, users: Set[str]):
+        # Gives these users a different schedule from now on, like a manager editing the rota
+        with self._lock:
+            for user in users:
+                self._generations[user] = self._generations.get(user, 0) + 1
+
+    def month_schedule(self, user: str, year: int, month: int) -> Dict[int, str]:
+        generation = self._generations.get(user, 0)
+        return random_month_schedule(year, month, self.density,
+                                     random.Random(f"{self.seed}|{user}|{generation}|{year}|{month}"))
+
+    def _session_user(self, headers: Dict[str, str]) -> Optional[str]:
+        cookie = SimpleCookie(headers.get('Cookie') or '')
+        token = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        with self._lock:
+            return self._sessions.get(token)
+
+    @staticmethod
+    def _month(query: Dict[str, list]) -> tuple:
+        today = dt.date.today()
+        return int(query.get('year', [today.year])[0]), int(query.get('month', [today.month])[0])
+
+    def login(self, body: bytes) -> Response:
+        self.count('login')
+        if self.chance(self.login_failure_rate):
+            self.count('login_failed')
+            return json_response(503, {'Success': False, 'Message': 'Service temporarily unavailable'})
+        credentials = json.loads(body or b'{}')
+        user = credentials.get('UserName')
+        if user not in self.users or self.users[user] != credentials.get('Password'):
+            return json_response(200, {'Success': False, 'Message': 'Invalid user name or password'})
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._sessions[token] = user
+        return json_response(200, {'Success': True},
+                             {'Set-Cookie': f"{SESSION_COOKIE}={token}; Path={ESS_PATH}; HttpOnly"})
+
+    def schedule_model(self, user: str, year: int, month: int) -> dict:
+        scheduled_days = self.month_schedule(user, year, month)
+        weeks: List[dict] = []
+        for week in calendar.Calendar(firstweekday=6).monthdayscalendar(year, month):
+            weeks.append({'Days': [{'Day': day or None, 'Shift': scheduled_days.get(day)} for day in week]})
+        return {'MonthName': calendar.month_name[month], 'ScheduleWeeks': weeks}
+
+    def handle(self, method: str, path: str, query: Dict[str, list], headers: Dict[str, str],
+               body: bytes) -> Response:
+        if not path.startswith(ESS_PATH):
+            return 404, {}, b''
+        route = path[len(ESS_PATH):]
+        if route == LOGIN_PATH and method == 'POST':
+            return self.login(body)
+        user = self._session_user(headers)
+        if route == SCHEDULE_PATH and method == 'GET':
+            self.count('schedule')
+            if user is None:
+                return json_response(401, {'Message': 'Authorization has been denied for this request.'})
+            return json_response(200, self.schedule_model(user, *self._month(query)))
+        if route == '' and method == 'GET':
+            self.count('page')
+            if user is None:
+                return 200, {'Content-Type': 'text/html; charset=utf-8'}, \
+                    b'<!DOCTYPE html><html><body><form id="login"><input name="UserName">' \
+                    b'<input name="Password" type="password"><button type="submit">Login</button></form></body></html>'
+            year, month = self._month(query)
+            page = generate_month_page(year, month, self.month_schedule(user, year, month), self.noise_blocks)
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, page.encode('utf-8')
+        return 404, {}, b''
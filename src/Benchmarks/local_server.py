@@ -0,0 +1,107 @@
+import json
+import time
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+# Shared plumbing for the load-test stand-ins: a threaded HTTP server on an ephemeral localhost
+# port, with injected latency and per route request counters. Subclasses implement handle().
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+def json_response(status: int, body: object, headers: Optional[Dict[str, str]] = None) -> Response:
+    return status, dict(headers or {}, **{'Content-Type': 'application/json; charset=UTF-8'}), \
+        json.dumps(body).encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so the clients' connection pools behave like they do against the real hosts
+    protocol_version = 'HTTP/1.1'
+
+    def _dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        parts = urlsplit(self.path)
+        server: LocalServer = self.server.owner
+        server.delay()
+        try:
+            status, headers, content = server.handle(self.command, parts.path, parse_qs(parts.query),
+                                                     dict(self.headers.items()), body)
+        except Exception as error:
+            status, headers, content = json_response(500, {'error': {'code': 500, 'message': repr(error)}})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Every worker connects at once when a run starts
+    request_queue_size = 256
+
+
+class LocalServer(ABC):
+    def __init__(self, latency_ms: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.requests = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'LocalServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def count(self, route: str):
+        with self._lock:
+            self.requests[route] += 1
+
+    def chance(self, rate: float) -> bool:
+        with self._lock:
+            return self._rng.random() < rate
+
+    def delay(self):
+        if self.latency_ms:
+            with self._lock:
+                # +-50% around the configured latency, so requests don't finish in lockstep
+                seconds = self.latency_ms / 1000 * self._rng.uniform(0.5, 1.5)
+            time.sleep(seconds)
+
+    @abstractmethod
+    def handle(self, method: str, path: str, query: Dict[str, list], headers: Dict[str, str],
+               body: bytes) -> Response:
+        pass
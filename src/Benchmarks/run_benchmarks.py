@@ -0,0 +1,185 @@
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import datetime as dt
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Schedule_Loader import ScheduleLoader
+from src.Classes.Schedule_Parser import extract_scheduled_rows
+from src.Classes.Reconciliation_Planner import plan_reconciliation, horizon_end
+from src.Classes.Calendar_Batch_Writer import CalendarBatchWriter
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter
+from src.Classes.Google_Calendar_Writer import LushGoogleCalendarWriter
+from src.Classes.Schedule_Pipeline import load_user_schedule
+from src.Benchmarks.synthetic_storeforce import generate_pages, SHIFT_CHOICES
+from src.Benchmarks.fake_calendar_service import FakeServiceFactory
+from src.Benchmarks.static_schedule_source import StaticScheduleSource
+
+# Usage: python -m src.Benchmarks.run_benchmarks --months 2 --users 20 --output bench.json --compare old.json
+
+
+def measure(func: Callable[[], object], repeat: int, number: int) -> Dict[str, float]:
+    timings = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - start_time) / number * 1000)
+    return {'repeat': repeat, 'number': number, 'mean_ms': statistics.mean(timings), 'min_ms': min(timings),
+            'median_ms': statistics.median(timings), 'max_ms': max(timings)}
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def loader_windows(pages: List[tuple]) -> List[tuple]:
+    # One loader covers every generated month, starting today like a live scrape
+    loader = ScheduleLoader('bench', 'bench', 0, load=False, date=dt.date.today(), months=len(pages))
+    return [(loader, [page[3] for page in pages])]
+
+
+def legacy_parse(windows: List[tuple]) -> Dict[str, WorkShift]:
+    out_dict = {}
+    for loader, page_sources in windows:
+        schedule = [BeautifulSoup(page_source, 'html.parser').find_all('div', class_="calendar-day scheduled")
+                    for page_source in page_sources]
+        out_dict.update(loader.parse_scheduled_days(schedule))
+    return out_dict
+
+
+def fast_parse(windows: List[tuple]) -> Dict[str, WorkShift]:
+    out_dict = {}
+    for loader, page_sources in windows:
+        out_dict.update(loader.parse_scheduled_rows([extract_scheduled_rows(page_source)
+                                                     for page_source in page_sources]))
+    return out_dict
+
+
+def run(months: int, users: int, repeat: int, seed: int, noise_blocks: int) -> dict:
+    start = dt.date.today().replace(day=1)
+    pages = generate_pages(start, months, seed=seed, noise_blocks=noise_blocks)
+    windows = loader_windows(pages)
+    soups = [(loader, [BeautifulSoup(page_source, 'html.parser').find_all('div', class_="calendar-day scheduled")
+                       for page_source in page_sources]) for loader, page_sources in windows]
+    schedule = fast_parse(windows)
+    parity = {key: (shift.shift_local_start_time, shift.shift_local_end_time)
+              for key, shift in legacy_parse(windows).items()} == \
+             {key: (shift.shift_local_start_time, shift.shift_local_end_time) for key, shift in schedule.items()}
+    rows = [(shift.date, shift.start_time, shift.end_time) for shift in schedule.values()]
+    shift_strings = SHIFT_CHOICES * 50
+
+    results = {
+        'legacy_parse_full_page': measure(lambda: legacy_parse(windows), repeat, 3),
+        'parse_scheduled_days': measure(lambda: [loader.parse_scheduled_days(soup) for loader, soup in soups],
+                                        repeat, 10),
+        'fast_parse_full_page': measure(lambda: fast_parse(windows), repeat, 10),
+        'parse_workday_shift_string_x300': measure(
+            lambda: [ScheduleLoader.parse_workday_shift_string(shift) for shift in shift_strings], repeat, 10),
+        'work_shift_init': measure(lambda: [WorkShift(*row) for row in rows], repeat, 50),
+        'work_shift_from_rows': measure(lambda: WorkShift.from_rows(rows), repeat, 50),
+    }
+
+    # Calendar side: every user gets the same shifts on their own fake calendar, limited to the
+    # window LushGoogleCalendarWriter reconciles
+    today = dt.date.today()
+    calendar_schedule = {key: shift for key, shift in schedule.items() if shift.date <= horizon_end(today, months)}
+    user_names = [f"user{index}" for index in range(users)]
+    schedules = {user: calendar_schedule for user in user_names}
+    source = StaticScheduleSource(schedules, months)
+    # The fake service has no quota, pacing it would only measure the limiter's sleeps
+    limiter = CalendarRateLimiter(rate=1e9, burst=1e9)
+
+    def initial_load():
+        factory = FakeServiceFactory()
+        for user in user_names:
+            load_user_schedule(source, [LushGoogleCalendarWriter(service_factory=factory, rate_limiter=limiter)],
+                               user, 'bench', f"{user}@calendar")
+        return factory.service
+
+    with redirect_stdout(io.StringIO()):
+        service = initial_load()
+        writer = LushGoogleCalendarWriter(service_factory=FakeServiceFactory(service), rate_limiter=limiter)
+    existing_events = service.live_events(f"{user_names[0]}@calendar")
+
+    results['plan_reconciliation'] = measure(
+        lambda: plan_reconciliation(calendar_schedule.values(), existing_events, today + dt.timedelta(days=1),
+                                    horizon_end(today, months)), repeat, 20)
+    results['update_schedule_steady_state'] = measure(
+        lambda: [writer.update_schedule(f"{user}@calendar", dict(calendar_schedule),
+                                        CalendarBatchWriter(service, f"{user}@calendar", limiter=limiter), months)
+                 for user in user_names], repeat, 1)
+    results['load_user_schedule_initial'] = measure(initial_load, repeat, 1)
+    results['load_user_schedule_steady_state'] = measure(
+        lambda: [load_user_schedule(source, [writer], user, 'bench', f"{user}@calendar") for user in user_names],
+        repeat, 1)
+
+    # API calls are deterministic, so one counted run of each scenario is enough
+    service.calls.clear()
+    with redirect_stdout(io.StringIO()):
+        initial_calls = dict(initial_load().calls)
+        for user in user_names:
+            load_user_schedule(source, [writer], user, 'bench', f"{user}@calendar")
+    return {'meta': {'version': git_version(), 'python': platform.python_version(),
+                     'timestamp': dt.datetime.utcnow().isoformat() + 'Z',
+                     'months': months, 'users': users, 'repeat': repeat, 'seed': seed,
+                     'shifts_parsed': len(schedule), 'shifts_per_user': len(calendar_schedule),
+                     'page_bytes': sum(len(page[3]) for page in pages), 'parser_parity': parity,
+                     'api_calls_initial_load': initial_calls, 'api_calls_steady_state': dict(service.calls)},
+            'results': results}
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path, 'r') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"{'Benchmark':<36} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for name, result in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            print(f"{name:<36} {'-':>12} {result['median_ms']:>12.3f} {'new':>7}")
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"{name:<36} {old['median_ms']:>12.3f} {result['median_ms']:>12.3f} {ratio:>7.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the scrape, parse and reconcile hot paths')
+    parser.add_argument('--months', type=int, default=2)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--noise-blocks', type=int, default=200)
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    current = run(args.months, args.users, args.repeat, args.seed, args.noise_blocks)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(current, output_file, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+    if args.compare:
+        compare(current, args.compare)
+    if not current['meta']['parser_parity']:
+        print('Fast parser output differs from parse_scheduled_days', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
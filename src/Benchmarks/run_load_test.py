@@ -0,0 +1,186 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import datetime as dt
+from collections import Counter
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional, Tuple
+
+from src.Classes.Concurrent_User_Runner import ConcurrentUserRunner, UserRunResult
+from src.Classes.Schedule_Source import HttpScheduleSource, ScheduleFetchError
+from src.Classes.Schedule_Parser import extract_scheduled_rows, iter_month_shifts
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.work_shift import WorkShift
+from src.Classes.Schedule_Sink import IcsScheduleSink
+from src.Classes.Schedule_Snapshot_Store import ScheduleSnapshotStore
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter
+from src.Benchmarks.fake_storeforce_server import FakeStoreForceServer
+from src.Benchmarks.fake_calendar_server import FakeCalendarServer, LocalServiceFactory
+from src.Benchmarks.run_benchmarks import git_version
+
+# End to end load test: LushGoogleCalendarWriter runs through ConcurrentUserRunner with the same
+# writer settings LoadUserSchedules uses, against a local StoreForce and a local Calendar v3 server.
+# Usage: python -m src.Benchmarks.run_load_test --users 100 --workers 8 --storeforce-latency-ms 150 --output load.json
+
+
+class PageScheduleSource(HttpScheduleSource):
+    # Stand-in for SeleniumScheduleSource, which production uses unless USE_HTTP_SOURCE is set. It reads
+    # the rendered month pages and extracts them with the parser the browser scrape runs on page_source,
+    # only the browser itself is left out.
+    def fetch_month(self, session, year: int, month: int) -> str:
+        response = session.get(self.base_url, params={'year': year, 'month': month}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ScheduleFetchError(f"Schedule page for {year}-{month:02d} failed with HTTP {response.status_code}")
+        return response.text
+
+    @staticmethod
+    def parse_month(page: str, year: int, month: int, today: dt.date) -> Dict[str, WorkShift]:
+        return key_shifts(iter_month_shifts(extract_scheduled_rows(page), year, month, today))
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest rank, good enough for per-user latencies
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows, --trace-memory still reports the Python heap there
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_phase(name: str, runner: ConcurrentUserRunner, users: List[Tuple[str, str, str]],
+              storeforce: FakeStoreForceServer, calendar_server: FakeCalendarServer) -> dict:
+    calendar_before = Counter(calendar_server.service.calls)
+    http_before = Counter(calendar_server.requests)
+    storeforce_before = Counter(storeforce.requests)
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        results: List[UserRunResult] = runner.run(users)
+    wall_seconds = time.perf_counter() - start_time
+    seconds = [result.seconds for result in results if result.ok]
+    per_user = len(users) or 1
+    calendar_calls = Counter(calendar_server.service.calls) - calendar_before
+    # Every call inside a batch counts against the quota, single calls are the lists
+    calendar_http = Counter(calendar_server.requests) - http_before
+    storeforce_requests = Counter(storeforce.requests) - storeforce_before
+    return {'phase': name, 'users': len(users), 'failed': sum(1 for result in results if not result.ok),
+            'wall_seconds': wall_seconds, 'users_per_minute': len(results) / wall_seconds * 60 if wall_seconds else 0,
+            'p50_user_seconds': percentile(seconds, 0.5), 'p95_user_seconds': percentile(seconds, 0.95),
+            'max_user_seconds': max(seconds) if seconds else None,
+            'calendar_calls_per_user': {call: count / per_user for call, count in sorted(calendar_calls.items())},
+            'calendar_http_requests_per_user': {route: count / per_user for route, count in sorted(calendar_http.items())},
+            'storeforce_requests_per_user': {route: count / per_user
+                                             for route, count in sorted(storeforce_requests.items())},
+            'peak_traced_mb': tracemalloc.get_traced_memory()[1] / (1024 * 1024) if tracemalloc.is_tracing() else None}
+
+
+def run(users: int, workers: int, months: int, storeforce_latency_ms: float, calendar_latency_ms: float,
+        login_failure_rate: float, throttle_rate: float, churn: float, qps: float, seed: int,
+        source_kind: str = 'page') -> dict:
+    accounts = [(f"loaduser{index:04d}", f"pass{index:04d}", f"loaduser{index:04d}@load.test")
+                for index in range(users)]
+    phases = []
+    with tempfile.TemporaryDirectory() as work_dir, \
+            FakeStoreForceServer({user: password for user, password, _ in accounts}, storeforce_latency_ms,
+                                 login_failure_rate, seed=seed) as storeforce, \
+            FakeCalendarServer(latency_ms=calendar_latency_ms, throttle_rate=throttle_rate, seed=seed) \
+            as calendar_server:
+        source_class = PageScheduleSource if source_kind == 'page' else HttpScheduleSource
+        source = source_class(base_url=storeforce.base_url, months=months, pool_size=workers)
+        # The fake server has no quota, so by default only its throttling paces the writers
+        limiter = CalendarRateLimiter(rate=qps) if qps else CalendarRateLimiter(rate=1e9, burst=1e9)
+        writer_kwargs = {'schedule_source': source, 'service_factory': LocalServiceFactory(calendar_server.url),
+                         'incremental': True, 'sync_dir': os.path.join(work_dir, 'sync'),
+                         'snapshot_store': ScheduleSnapshotStore(os.path.join(work_dir, 'snapshots.sqlite3')),
+                         'journal_dir': os.path.join(work_dir, 'journal'), 'rate_limiter': limiter,
+                         'sinks': [IcsScheduleSink(os.path.join(work_dir, 'feeds'))]}
+        runner = ConcurrentUserRunner(max_workers=workers, use_processes=False, writer_kwargs=writer_kwargs)
+        try:
+            # Empty calendars, then nothing changed, then a share of the rota edited by a manager
+            phases.append(run_phase('initial', runner, accounts, storeforce, calendar_server))
+            phases.append(run_phase('steady', runner, accounts, storeforce, calendar_server))
+            changed = random.Random(seed).sample([user for user, _, _ in accounts], round(users * churn))
+            storeforce.reshuffle(set(changed))
+            phases.append(run_phase('churn', runner, accounts, storeforce, calendar_server))
+        finally:
+            source.close()
+    return {'meta': {'version': git_version(), 'python': platform.python_version(),
+                     'timestamp': dt.datetime.utcnow().isoformat() + 'Z', 'users': users, 'workers': workers,
+                     'months': months, 'storeforce_latency_ms': storeforce_latency_ms,
+                     'calendar_latency_ms': calendar_latency_ms, 'login_failure_rate': login_failure_rate,
+                     'throttle_rate': throttle_rate, 'churn': churn, 'qps': qps, 'seed': seed,
+                     'source': source_kind,
+                     # The servers run in this process, so this includes them
+                     'peak_rss_mb': peak_rss_mb()},
+            'phases': phases}
+
+
+def print_report(report: dict):
+    print(f"{'Phase':<8} {'users/min':>10} {'p50 s':>7} {'p95 s':>7} {'failed':>7} {'cal calls/user':>15} "
+          f"{'sf reqs/user':>13} {'heap MB':>8}")
+    for phase in report['phases']:
+        calendar_calls = sum(count for call, count in phase['calendar_calls_per_user'].items() if call != 'batch')
+        storeforce_requests = sum(count for route, count in phase['storeforce_requests_per_user'].items()
+                                  if route != 'login_failed')
+        p50, p95, heap = phase['p50_user_seconds'], phase['p95_user_seconds'], phase['peak_traced_mb']
+        print(f"{phase['phase']:<8} {phase['users_per_minute']:>10.1f} "
+              f"{p50 if p50 is not None else float('nan'):>7.3f} {p95 if p95 is not None else float('nan'):>7.3f} "
+              f"{phase['failed']:>7} {calendar_calls:>15.2f} {storeforce_requests:>13.2f} "
+              f"{heap if heap is not None else float('nan'):>8.1f}")
+    rss = report['meta']['peak_rss_mb']
+    print(f"Peak RSS: {rss:.1f} MB" if rss is not None else 'Peak RSS: not available on this platform')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Load test the loader end to end against local stand-ins')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--months', type=int, default=2)
+    parser.add_argument('--storeforce-latency-ms', type=float, default=150)
+    parser.add_argument('--calendar-latency-ms', type=float, default=30)
+    parser.add_argument('--login-failure-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of calendar calls answered 403')
+    parser.add_argument('--churn', type=float, default=0.1, help='share of users whose rota changes before the last phase')
+    parser.add_argument('--qps', type=float, default=0, help='calendar queries per second, 0 for no pacing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', choices=('page', 'http'), default='page',
+                        help='scrape the rendered month pages like the browser source, or read the JSON endpoints')
+    parser.add_argument('--trace-memory', action='store_true', help='also report the peak Python heap per phase')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    # Injected failures would otherwise print a traceback per user
+    logging.basicConfig(level=logging.CRITICAL)
+    if args.trace_memory:
+        tracemalloc.start()
+    report = run(args.users, args.workers, args.months, args.storeforce_latency_ms, args.calendar_latency_ms,
+                 args.login_failure_rate, args.throttle_rate, args.churn, args.qps, args.seed, args.source)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    print_report(report)
+    # Failures the run injected itself are expected, anything else is not
+    return 0 if args.login_failure_rate or all(phase['failed'] == 0 for phase in report['phases']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
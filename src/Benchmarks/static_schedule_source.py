@@ -0,0 +1,20 @@
+from typing import Dict
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Schedule_Source import ScheduleSource
+from src.config.SCHEDULE_HORIZON_CONFIG import HORIZON_MONTHS
+
+# Schedule source that hands back fixed schedules instead of scraping, so the writer and the
+# sinks can be driven without StoreForce. Shared by the benchmarks and the tests.
+
+
+class StaticScheduleSource(ScheduleSource):
+    def __init__(self, schedules: Dict[str, Dict[str, WorkShift]], months: int = HORIZON_MONTHS):
+        # user -> schedule keyed like the planner keys shifts
+        self.schedules = schedules
+        self.months = months
+        self.calls = 0
+
+    def fetch_schedule(self, user_in: str, user_pass: str) -> Dict[str, WorkShift]:
+        self.calls += 1
+        return dict(self.schedules[user_in])
@@ -0,0 +1,63 @@
+import calendar
+import datetime as dt
+import random
+from typing import Dict, List, Optional, Tuple
+
+# Generates pages shaped like the rendered StoreForce ESS schedule view: a knockout bound
+# month grid where scheduled days carry a Day and a Shift label.
+
+SHIFT_CHOICES = ['9:00 AM - 5:00 PM', '10:00 AM - 6:30 PM', '11:30 AM - 8:00 PM', '12:00 PM - 9:00 PM',
+                 '7:00 AM - 3:00 PM', '2:00 PM - 10:00 PM']
+
+
+def random_month_schedule(year: int, month: int, density: float = 0.6,
+                          rng: Optional[random.Random] = None) -> Dict[int, str]:
+    rng = rng or random.Random()
+    days_in_month = calendar.monthrange(year, month)[1]
+    return {day: rng.choice(SHIFT_CHOICES) for day in range(1, days_in_month + 1) if rng.random() < density}
+
+
+def _day_cell(day: int, shift: Optional[str]) -> str:
+    if not day:
+        return '<td><div class="calendar-day other-month"></div></td>'
+    if shift is None:
+        return (f'<td><div class="calendar-day">'
+                f'<label class="day-number" data-bind="text: Day">{day}</label></div></td>')
+    return (f'<td><div class="calendar-day scheduled">'
+            f'<label class="day-number" data-bind="text: Day">{day}</label>'
+            f'<span class="shift-icon"></span>'
+            f'<label class="shift-hours" data-bind="text: Shift">{shift}</label></div></td>')
+
+
+def generate_month_page(year: int, month: int, scheduled_days: Dict[int, str], noise_blocks: int = 200) -> str:
+    weeks = []
+    for week in calendar.Calendar(firstweekday=6).monthdays2calendar(year, month):
+        cells = [_day_cell(day, scheduled_days.get(day)) for day, _ in week]
+        weeks.append('<tr>' + ''.join(cells) + '</tr>')
+    # The live page carries a lot of unrelated markup, the noise blocks stand in for it
+    noise = ''.join(f'<div class="menu-item" data-bind="visible: ShowItem{index}"><a href="#item{index}">'
+                    f'<span>Menu entry {index}</span></a><p>Lorem ipsum dolor sit amet {index}</p></div>'
+                    for index in range(noise_blocks))
+    return (f'<!DOCTYPE html><html><head><title>StoreForce ESS</title>'
+            f'<script>var model = {{"loaded": true}};</script></head><body>'
+            f'<div id="buttons"><button data-bind="click: ScheduleClicked">Schedule</button></div>'
+            f'<div id="navigation">{noise}</div>'
+            f'<div id="scheduleContent"><div class="month-header">'
+            f'<button data-bind="click: PreviousMonthClicked">&lt;</button>'
+            f'<span data-bind="text: MonthName">{calendar.month_name[month]}</span>'
+            f'<button data-bind="click: NextMonthClicked">&gt;</button></div>'
+            f'<table class="calendar"><tbody data-bind="foreach: ScheduleWeeks">{"".join(weeks)}</tbody></table>'
+            f'</div></body></html>')
+
+
+def generate_pages(start: dt.date, months: int, density: float = 0.6, seed: int = 0,
+                   noise_blocks: int = 200) -> List[Tuple[int, int, Dict[int, str], str]]:
+    # (year, month, scheduled days, page html) for `months` consecutive months from start
+    rng = random.Random(seed)
+    pages = []
+    for month_offset in range(months):
+        year = start.year + (start.month - 1 + month_offset) // 12
+        month = (start.month - 1 + month_offset) % 12 + 1
+        scheduled_days = random_month_schedule(year, month, density, rng)
+        pages.append((year, month, scheduled_days, generate_month_page(year, month, scheduled_days, noise_blocks)))
+    return pages
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from src.Classes.Run_Metrics import METRICS
+from src.Classes.Calendar_Batch_Writer import BatchItemResult, conflict_body, is_already_deleted
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter, get_rate_limiter, error_status
+from src.config.RATE_LIMIT_CONFIG import ASYNC_MAX_CONCURRENCY, ASYNC_PER_CALENDAR_CONCURRENCY
+
+# Optional asyncio client for the Calendar v3 REST endpoints. aiohttp is only imported when a
+# client is opened, so installs without it keep working with the googleapiclient writer.
+CALENDAR_API_URL = 'https://www.googleapis.com/calendar/v3/'
+
+# (operation, key, event id, body), the same calls CalendarBatchWriter queues as requests
+Operation = Tuple[str, Optional[str], Optional[str], Optional[dict]]
+
+
+class _ApiResponse(dict):
+    # Headers with a status attribute, the shape googleapiclient's HttpError.resp has, so the
+    # rate limiter helpers read both error types the same way
+    def __init__(self, status: int, headers: Dict[str, str]):
+        super().__init__((name.lower(), value) for name, value in headers.items())
+        self.status = status
+
+
+class CalendarApiError(Exception):
+    def __init__(self, status: int, content: bytes, headers: Dict[str, str], method: str, url: str):
+        self.resp = _ApiResponse(status, headers)
+        self.content = content
+        super().__init__(f"{method} {url} returned HTTP {status}: {content[:200]!r}")
+
+
+def default_token_provider() -> str:
+    from src.Classes.Calendar_Service_Factory import get_service_factory
+    creds = get_service_factory().get_credentials()
+    if creds is None:
+        raise ValueError("Error generating credentials for google calendar api, check token and google api settings")
+    return creds.token
+
+
+class AsyncCalendarClient(object):
+    def __init__(self, token_provider: Callable[[], str] = default_token_provider, base_url: str = CALENDAR_API_URL,
+                 max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+                 per_calendar_concurrency: int = ASYNC_PER_CALENDAR_CONCURRENCY,
+                 limiter: Optional[CalendarRateLimiter] = None, timeout: float = 30):
+        if max_concurrency < 1 or per_calendar_concurrency < 1:
+            raise ValueError(f"Concurrency limits must be at least 1, got {max_concurrency} and "
+                             f"{per_calendar_concurrency}")
+        self.token_provider = token_provider
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.max_concurrency = max_concurrency
+        self.per_calendar_concurrency = per_calendar_concurrency
+        self.limiter = limiter or get_rate_limiter()
+        self.timeout = timeout
+        self._session = None
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._calendar_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> 'AsyncCalendarClient':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def open(self):
+        import aiohttp
+        if self._session is None:
+            # One pooled session for every calendar, sized to the global limit
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _slots_for(self, calendar_id: str) -> asyncio.Semaphore:
+        slots = self._calendar_slots.get(calendar_id)
+        if slots is None:
+            slots = self._calendar_slots[calendar_id] = asyncio.Semaphore(self.per_calendar_concurrency)
+        return slots
+
+    def _events_url(self, calendar_id: str, event_id: Optional[str] = None) -> str:
+        url = f"{self.base_url}calendars/{quote(calendar_id, safe='')}/events"
+        return url if event_id is None else f"{url}/{quote(event_id, safe='')}"
+
+    async def _acquire_quota(self, call: str):
+        waited = 0.0
+        while True:
+            delay = self.limiter.bucket.try_acquire()
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+            waited += delay
+        if waited:
+            METRICS.observe('calendar_limiter_wait', waited, call=call)
+
+    async def _request(self, call: str, calendar_id: str, method: str, url: str,
+                       params: Optional[Dict[str, Any]] = None, body: Optional[dict] = None) -> Optional[dict]:
+        if self._session is None:
+            raise RuntimeError('AsyncCalendarClient is not open, use it as an async context manager')
+        query = {name: str(value).lower() if isinstance(value, bool) else str(value)
+                 for name, value in (params or {}).items() if value is not None}
+        attempt = 0
+        while True:
+            # Calendar first, so a busy calendar never holds global slots while it queues
+            async with self._slots_for(calendar_id), self._global_slots:
+                await self._acquire_quota(call)
+                token = await asyncio.get_running_loop().run_in_executor(None, self.token_provider)
+                async with self._session.request(method, url, params=query, json=body,
+                                                 headers={'Authorization': f"Bearer {token}"}) as response:
+                    content = await response.read()
+                    METRICS.incr('calendar_api_calls', call=f"async_{call}")
+                    if response.status < 400:
+                        return json.loads(content) if content else None
+                    error = CalendarApiError(response.status, content, dict(response.headers), method, url)
+            if not self.limiter.should_retry(error, attempt, call):
+                raise error
+            delay = self.limiter.backoff(attempt, error)
+            logging.warning(f"Async calendar {call} call throttled with HTTP {error_status(error)}, "
+                            f"retrying in {delay:.2f}s")
+            METRICS.incr('calendar_retries', call=call)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def list_events(self, calendar_id: str, **list_params) -> List[dict]:
+        # Same paging as list_events_paged, the parameters are the v3 query parameters
+        events = []
+        page_token = None
+        while True:
+            result = await self._request('list', calendar_id, 'GET', self._events_url(calendar_id),
+                                         params=dict(list_params, pageToken=page_token))
+            events.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return events
+
+    async def insert_event(self, calendar_id: str, body: dict) -> dict:
+        return await self._request('insert', calendar_id, 'POST', self._events_url(calendar_id), body=body)
+
+    async def update_event(self, calendar_id: str, event_id: str, body: dict) -> dict:
+        return await self._request('update', calendar_id, 'PUT', self._events_url(calendar_id, event_id),
+                                   params={'sendUpdates': 'none'}, body=body)
+
+    async def patch_event(self, calendar_id: str, event_id: str, body: dict) -> dict:
+        return await self._request('patch', calendar_id, 'PATCH', self._events_url(calendar_id, event_id),
+                                   params={'sendUpdates': 'none'}, body=body)
+
+    async def delete_event(self, calendar_id: str, event_id: str):
+        await self._request('delete', calendar_id, 'DELETE', self._events_url(calendar_id, event_id),
+                            params={'sendUpdates': 'none'})
+
+    async def _apply_one(self, calendar_id: str, operation: Operation) -> BatchItemResult:
+        name, key, event_id, body = operation
+        try:
+            if name == 'insert':
+                try:
+                    response = await self.insert_event(calendar_id, body)
+                except Exception as exception:
+                    # Same conflict rule as CalendarBatchWriter, a retried insert with a client id is a no-op
+                    update_body = conflict_body(name, event_id, body, exception)
+                    if update_body is None:
+                        raise
+                    METRICS.incr('calendar_conflicts', operation=name)
+                    response = await self.update_event(calendar_id, event_id, update_body)
+                event_id = response.get('id')
+            elif name == 'patch':
+                response = await self.patch_event(calendar_id, event_id, body)
+            elif name == 'delete':
+                response = await self.delete_event(calendar_id, event_id)
+            else:
+                raise ValueError(f"Unknown calendar operation {name}")
+            error = None
+        except Exception as exception:
+            response, error = None, exception
+            if is_already_deleted(name, exception):
+                error = None
+        METRICS.incr('calendar_mutations', operation=name, outcome='ok' if error is None else 'error')
+        return BatchItemResult(name, key, event_id, response, error)
+
+    async def apply(self, calendar_id: str, operations: Iterable[Operation]) -> List[BatchItemResult]:
+        # The async counterpart of CalendarBatchWriter.execute, results come back in queue order
+        return list(await asyncio.gather(*(self._apply_one(calendar_id, operation) for operation in operations)))
@@ -0,0 +1,166 @@
+import time
+import logging
+from typing import Optional, List, NamedTuple, Any, Tuple, Callable
+
+from src.Classes.Run_Metrics import METRICS
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter, get_rate_limiter, error_status, \
+    retry_after_seconds
+
+
+class BatchItemResult(NamedTuple):
+    operation: str
+    key: Optional[str]
+    event_id: Optional[str]
+    response: Optional[dict]
+    error: Optional[Exception]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def conflict_body(operation: str, event_id: Optional[str], body: Optional[dict],
+                  error: Optional[Exception]) -> Optional[dict]:
+    # The id is taken: an earlier attempt of this insert landed, or the shift was deleted and came
+    # back. An update with the full body and status confirmed covers both, None when not a conflict.
+    if operation == 'insert' and error_status(error) == 409 and event_id is not None and body is not None:
+        return dict(body, status='confirmed')
+    return None
+
+
+def is_already_deleted(operation: str, error: Optional[Exception]) -> bool:
+    # A delete that finds the event gone got what it wanted
+    return operation == 'delete' and error_status(error) in (404, 410)
+
+
+class CalendarBatchWriter(object):
+    # The Calendar API documents 50 calls per batch as the practical limit, the
+    # global batch endpoint caps out at 1000 but rejects large calendar batches.
+    MAX_BATCH_SIZE = 50
+
+    def __init__(self, service: Any, calendar_id: str, batch_size: int = MAX_BATCH_SIZE,
+                 limiter: Optional[CalendarRateLimiter] = None):
+        if not 0 < batch_size <= self.MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {self.MAX_BATCH_SIZE}, got {batch_size}")
+        self.service = service
+        self.calendar_id = calendar_id
+        self.batch_size = batch_size
+        self.limiter = limiter or get_rate_limiter()
+        self._pending = []
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def insert(self, body: dict, key: Optional[str] = None):
+        # A body with a client chosen id makes the insert idempotent, see _resolve_conflict
+        request = self.service.events().insert(calendarId=self.calendar_id, body=body)
+        self._pending.append(('insert', key, body.get('id'), request, body))
+
+    def patch(self, event_id: str, body: dict, key: Optional[str] = None):
+        request = self.service.events().patch(calendarId=self.calendar_id, eventId=event_id, body=body,
+                                              sendUpdates='none')
+        self._pending.append(('patch', key, event_id, request, body))
+
+    def delete(self, event_id: str, key: Optional[str] = None):
+        request = self.service.events().delete(calendarId=self.calendar_id, eventId=event_id,
+                                               sendUpdates='none')
+        self._pending.append(('delete', key, event_id, request, None))
+
+    def queued(self) -> List[Tuple[str, Optional[str], Optional[str], Optional[dict]]]:
+        # (operation, key, event id, body) of everything not executed yet, e.g. for a journal
+        return [(operation, key, event_id, body) for operation, key, event_id, _, body in self._pending]
+
+    def _resolve_conflict(self, operation: str, key: Optional[str], event_id: Optional[str], body: Optional[dict],
+                          error: Exception) -> Optional[tuple]:
+        update_body = conflict_body(operation, event_id, body, error)
+        if update_body is None:
+            return None
+        request = self.service.events().update(calendarId=self.calendar_id, eventId=event_id, body=update_body,
+                                               sendUpdates='none')
+        return operation, key, event_id, request, body
+
+    def _execute_chunk(self, chunk: list) -> dict:
+        chunk_results = {}
+
+        def callback(request_id: str, response: Optional[dict], exception: Optional[Exception]):
+            chunk_results[request_id] = (response, exception)
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for index, (_, _, _, request, _) in enumerate(chunk):
+            batch.add(request, request_id=str(index))
+        # Every call inside a batch counts against the quota, not the batch itself
+        attempt = 0
+        while True:
+            self.limiter.acquire('batch', tokens=len(chunk))
+            try:
+                batch.execute()
+                break
+            except Exception as error:
+                if not self.limiter.should_retry(error, attempt, 'batch'):
+                    raise
+                chunk_results.clear()
+                time.sleep(self.limiter.backoff(attempt, error))
+                METRICS.incr('calendar_retries', call='batch')
+                attempt += 1
+        METRICS.incr('calendar_api_calls', call='batch')
+        return chunk_results
+
+    def execute(self, on_results: Optional[Callable[[List[BatchItemResult]], None]] = None) -> List[BatchItemResult]:
+        # on_results gets each chunk's finished items as soon as the chunk returns, e.g. to journal them
+        results = []
+        pending, self._pending = self._pending, []
+        attempt = 0
+        # Requests sent to resolve a conflict, they are not resolved a second time
+        follow_ups = set()
+        while pending:
+            retry, throttled = [], []
+            for chunk_start in range(0, len(pending), self.batch_size):
+                chunk = pending[chunk_start:chunk_start + self.batch_size]
+                chunk_results = self._execute_chunk(chunk)
+                finished = len(results)
+                for index, item in enumerate(chunk):
+                    operation, key, event_id, request, body = item
+                    response, error = chunk_results.get(str(index), (None, RuntimeError('No response in batch')))
+                    if error is not None and self.limiter.should_retry(error, attempt, operation):
+                        # Throttled inside the batch, sent again in a later batch instead of being dropped
+                        retry.append(item)
+                        throttled.append(error)
+                        continue
+                    if error is not None and id(request) not in follow_ups:
+                        follow_up = self._resolve_conflict(operation, key, event_id, body, error)
+                        if follow_up is not None:
+                            METRICS.incr('calendar_conflicts', operation=operation)
+                            follow_ups.add(id(follow_up[3]))
+                            retry.append(follow_up)
+                            continue
+                    if is_already_deleted(operation, error):
+                        error = None
+                    if event_id is None and response is not None:
+                        event_id = response.get('id')
+                    results.append(BatchItemResult(operation, key, event_id, response, error))
+                    METRICS.incr('calendar_mutations', operation=operation,
+                                 outcome='ok' if error is None else 'error')
+                if on_results is not None and len(results) > finished:
+                    on_results(results[finished:])
+            if throttled:
+                # The longest Retry-After any throttled item was given is the floor for all of them
+                hint = max(throttled, key=lambda throttle: retry_after_seconds(throttle) or 0.0)
+                delay = self.limiter.backoff(attempt, hint)
+                logging.warning(f"{len(throttled)} calendar mutations were throttled, retrying in {delay:.2f}s")
+                METRICS.incr('calendar_retries', len(throttled), call='batch_item')
+                time.sleep(delay)
+            pending = retry
+            attempt += 1
+        return results
+
+    @staticmethod
+    def report(results: List[BatchItemResult]) -> int:
+        failures = 0
+        for result in results:
+            if result.ok:
+                print(f"{result.operation.capitalize()} succeeded for {result.key or result.event_id}")
+            else:
+                failures += 1
+                logging.error(f"{result.operation.capitalize()} failed for {result.key or result.event_id}: "
+                              f"{result.error}")
+        return failures
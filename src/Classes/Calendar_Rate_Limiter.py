@@ -0,0 +1,154 @@
+import json
+import time
+import random
+import logging
+import threading
+from typing import Any, Optional, Set
+
+from src.Classes.Run_Metrics import METRICS
+from src.config.RATE_LIMIT_CONFIG import CALENDAR_QUERIES_PER_SECOND, CALENDAR_BURST, CALENDAR_MAX_RETRIES, \
+    CALENDAR_BASE_BACKOFF_SECONDS, CALENDAR_MAX_BACKOFF_SECONDS
+
+# 403s are only retried for these reasons, a 403 for a missing calendar permission never succeeds on retry
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def error_status(error: Exception) -> Optional[int]:
+    # Duck typed against googleapiclient's HttpError so the API client is not imported here
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+def error_reasons(error: Exception) -> Set[str]:
+    content = getattr(error, 'content', None)
+    if not content:
+        return set()
+    try:
+        body = json.loads(content.decode('utf-8') if isinstance(content, bytes) else content)
+    except (ValueError, UnicodeDecodeError):
+        return set()
+    if not isinstance(body, dict) or not isinstance(body.get('error'), dict):
+        return set()
+    errors = body['error'].get('errors') or []
+    return {item.get('reason') for item in errors if isinstance(item, dict) and item.get('reason')}
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = error_status(error)
+    return status == 429 or (status == 403 and bool(error_reasons(error) & RATE_LIMIT_REASONS))
+
+
+def is_retryable(error: Exception) -> bool:
+    return error_status(error) in RETRYABLE_STATUSES or is_rate_limited(error)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    resp = getattr(error, 'resp', None)
+    if resp is None or not hasattr(resp, 'get'):
+        return None
+    retry_after = resp.get('retry-after') or resp.get('Retry-After')
+    try:
+        return max(0.0, float(retry_after)) if retry_after is not None else None
+    except ValueError:
+        # The HTTP-date form is not used by Google, treat it as no hint
+        return None
+
+
+class TokenBucket(object):
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"rate must be positive and capacity at least 1, got {rate} and {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        # Takes the tokens and returns 0, or returns how long to wait before they are available.
+        # A request bigger than the bucket (a full batch) goes once the bucket is full and leaves it
+        # in debt, so the callers after it wait until the whole request has been paid for.
+        needed = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= needed:
+                self._tokens -= tokens
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        # Blocks until the tokens are available and returns the seconds spent waiting
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(tokens)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+class CalendarRateLimiter(object):
+    # Shared by every thread talking to the Calendar API: a token bucket paces the calls and
+    # rate limit and server errors are retried with full-jitter exponential backoff.
+    def __init__(self, rate: float = CALENDAR_QUERIES_PER_SECOND, burst: float = CALENDAR_BURST,
+                 max_retries: int = CALENDAR_MAX_RETRIES, base_delay: float = CALENDAR_BASE_BACKOFF_SECONDS,
+                 max_delay: float = CALENDAR_MAX_BACKOFF_SECONDS):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def acquire(self, call: str, tokens: float = 1):
+        waited = self.bucket.acquire(tokens)
+        if waited:
+            METRICS.observe('calendar_limiter_wait', waited, call=call)
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = retry_after_seconds(error) if error is not None else None
+        # Retry-After is a floor, jitter still spreads out the workers that got the same hint
+        return max(delay, min(retry_after, self.max_delay)) if retry_after is not None else delay
+
+    def should_retry(self, error: Exception, attempt: int, call: str) -> bool:
+        if not is_retryable(error):
+            return False
+        METRICS.incr('calendar_throttled', call=call, status=error_status(error))
+        if attempt >= self.max_retries:
+            METRICS.incr('calendar_retries_exhausted', call=call)
+            return False
+        return True
+
+    def execute(self, request: Any, call: str) -> Any:
+        attempt = 0
+        while True:
+            self.acquire(call)
+            try:
+                return request.execute()
+            except Exception as error:
+                if not self.should_retry(error, attempt, call):
+                    raise
+                delay = self.backoff(attempt, error)
+                logging.warning(f"Calendar {call} call throttled with HTTP {error_status(error)}, "
+                                f"retrying in {delay:.2f}s")
+                METRICS.incr('calendar_retries', call=call)
+                time.sleep(delay)
+                attempt += 1
+
+
+_default_limiter: Optional[CalendarRateLimiter] = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> CalendarRateLimiter:
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = CalendarRateLimiter()
+        return _default_limiter
@@ -0,0 +1,133 @@
+import os
+import logging
+import threading
+import datetime as dt
+from typing import Any, List, Optional, TYPE_CHECKING
+
+from src.config.LOADER_CREDENTIALS_DIRECTORY import CRED_DIR, TOKEN_DIR, DISCOVERY_DIR
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+# Refresh a bit before Google would reject the token, so no request goes out with a dying one
+REFRESH_MARGIN = dt.timedelta(minutes=5)
+
+
+class CalendarServiceFactory(object):
+    def __init__(self, scopes: List[str] = SCOPES, token_path: str = TOKEN_DIR, cred_path: str = CRED_DIR,
+                 discovery_path: str = DISCOVERY_DIR):
+        self.scopes = scopes
+        self.token_path = token_path
+        self.cred_path = cred_path
+        self.discovery_path = discovery_path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._creds: Optional['Credentials'] = None
+        self._discovery_doc: Optional[str] = None
+
+    def _load_credentials(self) -> Optional['Credentials']:
+        # The google auth stack is imported on first use so dry runs and parse-only paths never load it
+        from google.auth.transport.requests import Request
+        from google.auth.exceptions import RefreshError
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        creds = None
+        # The file token.json stores the user's access and refresh tokens, and is
+        # created automatically when the authorization flow completes for the first
+        # time.
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, self.scopes)
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    try:
+                        creds.refresh(Request())
+                        self._save_credentials(creds)
+                    except RefreshError:
+                        print("Token expired, need to reauthenticate")
+                        os.remove(self.token_path)
+
+        if not os.path.exists(self.token_path):
+            # If there are no (valid) credentials available, let the user log in.
+            flow = InstalledAppFlow.from_client_secrets_file(self.cred_path, self.scopes)
+            creds = flow.run_local_server(port=0)
+            self._save_credentials(creds)
+        return creds
+
+    def _save_credentials(self, creds: 'Credentials'):
+        # Save the credentials for the next run
+        with open(self.token_path, 'w') as token:
+            token.write(creds.to_json())
+
+    def _needs_refresh(self, creds: 'Credentials') -> bool:
+        if not creds.valid:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        return creds.expiry is not None and creds.expiry - dt.datetime.utcnow() < REFRESH_MARGIN
+
+    def get_credentials(self) -> Optional['Credentials']:
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+            elif self._creds.refresh_token and self._needs_refresh(self._creds):
+                from google.auth.transport.requests import Request
+                from google.auth.exceptions import RefreshError
+                try:
+                    self._creds.refresh(Request())
+                    self._save_credentials(self._creds)
+                except RefreshError:
+                    logging.error('Refreshing cached calendar credentials failed, reloading from disk')
+                    self._creds = self._load_credentials()
+            return self._creds
+
+    def get_discovery_document(self) -> str:
+        with self._lock:
+            if self._discovery_doc is not None:
+                return self._discovery_doc
+            if os.path.exists(self.discovery_path):
+                with open(self.discovery_path, 'r') as discovery_file:
+                    self._discovery_doc = discovery_file.read()
+                return self._discovery_doc
+            # Newer googleapiclient releases ship the document, older ones need one download
+            from googleapiclient.discovery_cache import get_static_doc
+            discovery_doc = get_static_doc('calendar', 'v3')
+            if discovery_doc is None:
+                import requests
+                from googleapiclient.discovery import DISCOVERY_URI
+                response = requests.get(DISCOVERY_URI.format(api='calendar', apiVersion='v3'), timeout=30)
+                response.raise_for_status()
+                discovery_doc = response.text
+            try:
+                with open(self.discovery_path, 'w') as discovery_file:
+                    discovery_file.write(discovery_doc)
+            except OSError:
+                logging.warning(f"Could not cache the calendar discovery document at {self.discovery_path}")
+            self._discovery_doc = discovery_doc
+            return discovery_doc
+
+    def get_service(self) -> Any:
+        # googleapiclient services wrap an httplib2 connection, which is not thread safe, so
+        # each thread gets its own service built from the shared credentials and document.
+        creds = self.get_credentials()
+        if creds is None:
+            raise ValueError(
+                "Error generating credentials for google calendar api, check token and google api settings")
+        service = getattr(self._local, 'service', None)
+        if service is None or getattr(self._local, 'creds', None) is not creds:
+            from googleapiclient.discovery import build_from_document
+            service = build_from_document(self.get_discovery_document(), credentials=creds)
+            self._local.service = service
+            self._local.creds = creds
+        return service
+
+
+_default_factory: Optional[CalendarServiceFactory] = None
+_default_factory_lock = threading.Lock()
+
+
+def get_service_factory() -> CalendarServiceFactory:
+    global _default_factory
+    with _default_factory_lock:
+        if _default_factory is None:
+            _default_factory = CalendarServiceFactory()
+        return _default_factory
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from src.Classes.Run_Metrics import METRICS
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter, get_rate_limiter, error_status
+from src.config.SYNC_STATE_DIRECTORY import SYNC_DIR
+from src.config.CALENDAR_EVENTS_CONFIG import LEGACY_SUMMARY_FALLBACK
+
+LOADER_EVENT_SUMMARY = 'Lush Shift'
+LOADER_EVENT_LOCATION = '1961 Chain Bridge Rd Unit G7U, McLean, VA 22102'
+# Private extended properties are only visible to this OAuth client, so nothing else can claim our events
+LOADER_PROPERTY = 'workScheduleLoader'
+SHIFT_KEY_PROPERTY = 'shiftKey'
+LOADER_PROPERTY_FILTER = f"{LOADER_PROPERTY}=1"
+
+
+def loader_properties(key: str) -> dict:
+    return {'private': {LOADER_PROPERTY: '1', SHIFT_KEY_PROPERTY: key}}
+
+
+def event_id_for(calendar_id: str, key: str) -> str:
+    # Same calendar and shift always give the same id, so a repeated insert is a 409 instead of a duplicate.
+    # Client chosen ids may only use lowercase a-v and 0-9, which a hex digest already satisfies.
+    return hashlib.sha1(f"{calendar_id}|{key}".encode('utf-8')).hexdigest()
+
+
+def event_shift_key(event: dict) -> Optional[str]:
+    private = (event.get('extendedProperties') or {}).get('private') or {}
+    return private.get(SHIFT_KEY_PROPERTY) if private.get(LOADER_PROPERTY) == '1' else None
+
+
+def is_tagged_event(event: dict) -> bool:
+    private = (event.get('extendedProperties') or {}).get('private') or {}
+    return private.get(LOADER_PROPERTY) == '1'
+
+
+def is_loader_event(event: dict) -> bool:
+    # Untagged events with the loader's title were written before tagging and are still ours
+    return is_tagged_event(event) or event.get('summary') == LOADER_EVENT_SUMMARY
+
+
+def list_events_paged(service: Any, calendar_id: str, limiter: Optional[CalendarRateLimiter] = None,
+                      **list_kwargs) -> List[dict]:
+    # Follow nextPageToken until the window is exhausted instead of stopping at the first page
+    limiter = limiter or get_rate_limiter()
+    events = []
+    page_token = None
+    while True:
+        result = limiter.execute(service.events().list(calendarId=calendar_id, pageToken=page_token, **list_kwargs),
+                                 call='list')
+        METRICS.incr('calendar_api_calls', call='list')
+        events.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return events
+
+
+def list_loader_events(service: Any, calendar_id: str, limiter: Optional[CalendarRateLimiter] = None,
+                       legacy_fallback: bool = LEGACY_SUMMARY_FALLBACK, **list_kwargs) -> List[dict]:
+    # Google filters on the tag, so personal events on a shared calendar never come back
+    events = list_events_paged(service, calendar_id, limiter, privateExtendedProperty=LOADER_PROPERTY_FILTER,
+                               **list_kwargs)
+    if legacy_fallback:
+        seen = {event.get('id') for event in events}
+        legacy_events = list_events_paged(service, calendar_id, limiter, q=LOADER_EVENT_SUMMARY, **list_kwargs)
+        # q is a full text search, the exact title match still has to happen here
+        events.extend(event for event in legacy_events if event.get('id') not in seen
+                      and not is_tagged_event(event) and event.get('summary') == LOADER_EVENT_SUMMARY)
+    return events
+
+
+class CalendarSyncState(object):
+    def __init__(self, calendar_id: str, state_dir: str = SYNC_DIR):
+        self.calendar_id = calendar_id
+        file_name = hashlib.sha1(calendar_id.encode('utf-8')).hexdigest() + '.json'
+        self.path = os.path.join(state_dir, file_name)
+        self.sync_token: Optional[str] = None
+        self.events: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            logging.error(f"Could not read sync state at {self.path}, falling back to a full sync")
+            return
+        if state.get('calendar_id') == self.calendar_id:
+            self.sync_token = state.get('sync_token')
+            self.events = state.get('events', {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as state_file:
+            json.dump({'calendar_id': self.calendar_id,
+                       'sync_token': self.sync_token,
+                       'events': self.events}, state_file)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.sync_token = None
+        self.events = {}
+
+    def apply(self, event: dict):
+        event_id = event.get('id')
+        if event_id is None:
+            return
+        # syncToken cannot be combined with privateExtendedProperty, so the tag is checked here instead
+        if event.get('status') == 'cancelled' or not is_loader_event(event):
+            self.events.pop(event_id, None)
+        else:
+            self.events[event_id] = {'id': event_id,
+                                     'summary': event.get('summary'),
+                                     'start': event.get('start'),
+                                     'end': event.get('end'),
+                                     'extendedProperties': event.get('extendedProperties')}
+
+    def sync(self, service: Any, time_min: str, limiter: Optional[CalendarRateLimiter] = None) -> List[dict]:
+        # With a stored token only the events changed since the last run are listed,
+        # a full listing is done on the first run or when Google expires the token.
+        limiter = limiter or get_rate_limiter()
+        if self.sync_token is not None:
+            list_kwargs = {'syncToken': self.sync_token, 'singleEvents': True}
+        else:
+            self.reset()
+            # Not filtered on the tag: Google returns no nextSyncToken for a privateExtendedProperty
+            # listing, and without one every later run would be a full listing. apply filters instead.
+            list_kwargs = {'timeMin': time_min, 'singleEvents': True}
+
+        page_token = None
+        while True:
+            try:
+                result = limiter.execute(service.events().list(calendarId=self.calendar_id, pageToken=page_token,
+                                                               maxResults=250, **list_kwargs), call='list')
+                METRICS.incr('calendar_api_calls', call='list_sync' if self.sync_token else 'list')
+            except Exception as error:
+                if error_status(error) == 410 and self.sync_token is not None:
+                    print('Sync token expired, running a full sync')
+                    self.reset()
+                    return self.sync(service, time_min, limiter)
+                raise
+            for event in result.get('items', []):
+                self.apply(event)
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                self.sync_token = result.get('nextSyncToken')
+                break
+
+        self.save()
+        return self.upcoming_events(time_min)
+
+    def upcoming_events(self, time_min: str) -> List[dict]:
+        # Events are indexed forever, only hand back the ones from the listing window onwards
+        upcoming = []
+        for event in self.events.values():
+            start = (event.get('start') or {}).get('dateTime')
+            if start is not None and start[:10] >= time_min[:10]:
+                upcoming.append(event)
+        return sorted(upcoming, key=lambda e: e['start']['dateTime'])
@@ -0,0 +1,127 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.common.exceptions import WebDriverException
+
+from src.Classes.Driver_Resolver import resolve_chromedriver
+from src.Classes.Run_Metrics import METRICS
+from src.config.DRIVER_POOL_CONFIG import DRIVER_MAX_USES, HEADLESS
+from src.config.LUSH_STORE_FORCE_URL import URL
+from src.config.RUNNER_CONFIG import MAX_WORKERS
+
+
+class ChromeDriverPool(object):
+    def __init__(self, size: int = MAX_WORKERS, max_uses: int = DRIVER_MAX_USES, headless: bool = HEADLESS):
+        if size < 1 or max_uses < 1:
+            raise ValueError(f"size and max_uses must be at least 1, got {size} and {max_uses}")
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[WebDriver] = []
+        self._uses: Dict[int, int] = {}
+        self._driver_path = None
+        self._closed = False
+
+    def _launch(self) -> WebDriver:
+        with self._lock:
+            # Resolve the driver binary once per pool rather than once per browser
+            if self._driver_path is None:
+                with METRICS.span('scrape_phase', phase='driver_install'):
+                    self._driver_path = resolve_chromedriver()
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless=new')
+            options.add_argument('--window-size=1920,1080')
+        options.add_argument('--disable-dev-shm-usage')
+        with METRICS.span('scrape_phase', phase='driver_start'):
+            driver = webdriver.Chrome(service=ChromeService(self._driver_path), options=options)
+        self._uses[id(driver)] = 0
+        return driver
+
+    @staticmethod
+    def _is_alive(driver: WebDriver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def _discard(self, driver: WebDriver):
+        self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            logging.warning('Pooled driver could not be quit cleanly, it probably crashed')
+
+    @staticmethod
+    def _reset(driver: WebDriver):
+        # Storage is per origin, so clear it while the previous user's page is still loaded
+        driver.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+        driver.delete_all_cookies()
+        parsed_url = urlparse(URL)
+        try:
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin',
+                                   {'origin': f"{parsed_url.scheme}://{parsed_url.netloc}", 'storageTypes': 'all'})
+        except WebDriverException:
+            pass
+        driver.get('about:blank')
+
+    def acquire(self) -> WebDriver:
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        raise RuntimeError('ChromeDriverPool is closed')
+                    driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    return self._launch()
+                if self._is_alive(driver):
+                    return driver
+                self._discard(driver)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver: WebDriver, broken: bool = False):
+        try:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            if broken or self._closed or self._uses[id(driver)] >= self.max_uses:
+                self._discard(driver)
+                return
+            try:
+                self._reset(driver)
+            except WebDriverException:
+                self._discard(driver)
+                return
+            with self._lock:
+                self._idle.append(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self) -> Iterator[WebDriver]:
+        driver = self.acquire()
+        try:
+            yield driver
+        except BaseException:
+            # A failed scrape only recycles the browser if it no longer responds
+            self.release(driver, broken=not self._is_alive(driver))
+            raise
+        else:
+            self.release(driver)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
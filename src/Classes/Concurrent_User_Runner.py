@@ -0,0 +1,71 @@
+import time
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from src.Classes.Schedule_Pipeline import build_pipeline, load_user_schedule
+from src.Classes.Run_Metrics import METRICS
+from src.config.RUNNER_CONFIG import MAX_WORKERS, USE_PROCESSES
+
+
+class UserRunResult(NamedTuple):
+    user: str
+    calendar_id: str
+    seconds: float
+    ok: bool
+    error: Optional[str]
+
+
+def run_user(user_in: str, user_pass: str, calendar_id: str, writer_kwargs: dict) -> UserRunResult:
+    # Module level so it can be pickled for the process pool. Every call builds its own
+    # source and sinks and therefore its own Chrome driver, nothing is shared between users. Metrics
+    # recorded inside a worker process stay in that process.
+    start_time = time.perf_counter()
+    try:
+        source, sinks = build_pipeline(**writer_kwargs)
+        load_user_schedule(source, sinks, user_in, user_pass, calendar_id)
+    except Exception as error:
+        logging.error(f"Loading schedule failed for user {user_in}:\n{traceback.format_exc()}")
+        result = UserRunResult(user_in, calendar_id, time.perf_counter() - start_time, False, repr(error))
+    else:
+        result = UserRunResult(user_in, calendar_id, time.perf_counter() - start_time, True, None)
+    METRICS.observe('user_run', result.seconds, outcome='ok' if result.ok else 'failed')
+    return result
+
+
+class ConcurrentUserRunner(object):
+    def __init__(self, max_workers: int = MAX_WORKERS, use_processes: bool = USE_PROCESSES,
+                 writer_kwargs: Optional[dict] = None):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        # max_workers also bounds the number of browsers open at once, one per running user
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.writer_kwargs = writer_kwargs or {}
+        if use_processes and self.writer_kwargs.get('driver_pool') is not None:
+            raise ValueError('A driver pool can only be shared between threads, not processes')
+
+    def run(self, users: Iterable[Tuple[str, str, str]]) -> List[UserRunResult]:
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        results = []
+        with executor_cls(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(run_user, user_in, user_pass, calendar_id, self.writer_kwargs): user_in
+                       for user_in, user_pass, calendar_id in users}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    # Only reached if the worker itself died, e.g. a killed process
+                    results.append(UserRunResult(futures[future], '', 0.0, False, repr(error)))
+        return results
+
+    @staticmethod
+    def print_summary(results: List[UserRunResult]):
+        user_width = max([len('User')] + [len(result.user) for result in results])
+        print(f"{'User':<{user_width}}  {'Seconds':>8}  Outcome")
+        for result in sorted(results, key=lambda r: r.user):
+            outcome = 'ok' if result.ok else f"FAILED: {result.error}"
+            print(f"{result.user:<{user_width}}  {result.seconds:>8.2f}  {outcome}")
+        failed = sum(1 for result in results if not result.ok)
+        print(f"{len(results) - failed} succeeded, {failed} failed")
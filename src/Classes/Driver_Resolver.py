@@ -0,0 +1,43 @@
+import os
+import json
+import logging
+import threading
+from typing import Optional
+
+from src.config.DRIVER_CACHE_DIRECTORY import CACHE_DIR, CHROMEDRIVER_VERSION
+
+PIN_FILE_NAME = 'chromedriver_pin.json'
+_resolve_lock = threading.Lock()
+
+
+def _read_pin(pin_path: str) -> Optional[dict]:
+    try:
+        with open(pin_path, 'r') as pin_file:
+            return json.load(pin_file)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve_chromedriver(cache_dir: str = CACHE_DIR, version: Optional[str] = CHROMEDRIVER_VERSION,
+                         refresh: bool = False) -> str:
+    # Offline first: once a chromedriver has been installed its path is pinned next to the cache,
+    # and later runs use it without webdriver_manager going to the network for a version check.
+    pin_path = os.path.join(cache_dir, PIN_FILE_NAME)
+    with _resolve_lock:
+        pin = None if refresh else _read_pin(pin_path)
+        if pin is not None and os.path.exists(pin.get('path', '')) and version in (None, pin.get('version')):
+            return pin['path']
+
+        # Only imported when a download is actually needed
+        from webdriver_manager.chrome import ChromeDriverManager
+        logging.info(f"No pinned chromedriver in {cache_dir}, resolving with webdriver_manager")
+        if version is not None:
+            driver_path = ChromeDriverManager(version=version, path=cache_dir).install()
+        else:
+            driver_path = ChromeDriverManager(path=cache_dir).install()
+        try:
+            with open(pin_path, 'w') as pin_file:
+                json.dump({'version': version, 'path': driver_path}, pin_file)
+        except OSError:
+            logging.warning(f"Could not write the chromedriver pin file at {pin_path}")
+        return driver_path
@@ -1,40 +1,48 @@
 from __future__ import print_function
-import os.path
 import datetime as dt
 import logging
 import random
 from typing import Optional, Dict, Tuple
 
-from google.auth.transport.requests import Request
-from google.auth.exceptions import RefreshError
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
 from src.Classes.work_shift import WorkShift
-from src.Classes.Schedule_Loader import ScheduleLoader
-from src.config.LOADER_CREDENTIALS_DIRECTORY import CRED_DIR, TOKEN_DIR
+from src.Classes.Schedule_Sink import ScheduleSink, ScheduleSinkError
+from src.Classes.Calendar_Batch_Writer import CalendarBatchWriter
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter, get_rate_limiter
+from src.Classes.Calendar_Sync_State import CalendarSyncState, list_loader_events, is_loader_event, \
+    is_tagged_event, loader_properties, event_id_for, LOADER_EVENT_SUMMARY, \
+    LOADER_EVENT_LOCATION
+from src.Classes.Calendar_Service_Factory import CalendarServiceFactory, get_service_factory
+from src.Classes.Reconciliation_Planner import ReconciliationPlan, plan_reconciliation, horizon_end
+from src.Classes.Schedule_Snapshot_Store import ScheduleSnapshotStore
+from src.Classes.Mutation_Journal import MutationJournal, JournalEntry
+from src.Classes.Run_Metrics import METRICS
+from src.config.STORE_TIMEZONE import STORE_TIMEZONE
+from src.config.SYNC_STATE_DIRECTORY import SYNC_DIR
 from src.config.Motivational_Quotes_Config import QUOTES
 
 
-class LushGoogleCalendarWriter(object):
-
-    def __init__(self, user_in: str, user_pass: str, calendar_id: str, debug: bool = False):
-        self._SCOPES = ['https://www.googleapis.com/auth/calendar']
+class LushGoogleCalendarWriter(ScheduleSink):
+    # Writes a fetched schedule to its Google calendar. Fetching it and handing it to the other sinks is
+    # up to Schedule_Pipeline.load_user_schedule
+    def __init__(self, incremental: bool = False, service_factory: Optional[CalendarServiceFactory] = None,
+                 snapshot_store: Optional[ScheduleSnapshotStore] = None,
+                 rate_limiter: Optional[CalendarRateLimiter] = None, journal_dir: Optional[str] = None,
+                 sync_dir: str = SYNC_DIR):
+        self.incremental = incremental
+        self.sync_dir = sync_dir
+        self.snapshot_store = snapshot_store
+        # Shared by default, every writer in the process draws from the one project quota
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        # Without a journal directory an interrupted run is simply reconciled again from a full listing
+        self.journal_dir = journal_dir
+        # Credentials and the discovery document are loaded once per process and shared by every writer
+        self.service_factory = service_factory or get_service_factory()
         self._creds = self.load_gcalendar_api_credentials()
-        self._calendar_id = calendar_id
-        self.debug = debug
-        if self._creds is not None:
-            try:
-                self.service = build('calendar', 'v3', credentials=self._creds)
-                self.load_user_schedule(user_in, user_pass, self._calendar_id)
-            except HttpError as error:
-                print('An error occurred: %s' % error)
-        else:
+        if self._creds is None:
             logging.error("Credentials failed to initialize, raising error")
             raise ValueError(
                 "Error generating credentials for google calendar api, check token and google api settings")
+        self.service = self.service_factory.get_service()
 
     @staticmethod
     def get_start_end_for_event(event: dict) -> Tuple[Optional[dt.datetime], Optional[dt.datetime]]:
@@ -53,20 +61,21 @@ class LushGoogleCalendarWriter(object):
         return start_dt, end_dt
 
     @staticmethod
-    def create_event(start_dt: dt.datetime, end_dt: dt.datetime) -> dict:
+    def create_event(start_dt: dt.datetime, end_dt: dt.datetime, key: Optional[str] = None,
+                     event_id: Optional[str] = None) -> dict:
         # See https://developers.google.com/calendar/api/v3/reference/events for fields
         desc = random.choice(QUOTES)
         event = {
-            'summary': 'Lush Shift',
-            'location': '1961 Chain Bridge Rd Unit G7U, McLean, VA 22102',
+            'summary': LOADER_EVENT_SUMMARY,
+            'location': LOADER_EVENT_LOCATION,
             'description': desc,
             'start': {
                 'dateTime': start_dt.isoformat(),
-                'timeZone': 'America/New_York',
+                'timeZone': STORE_TIMEZONE,
             },
             'end': {
                 'dateTime': end_dt.isoformat(),
-                'timeZone': 'America/New_York',
+                'timeZone': STORE_TIMEZONE,
             },
             'reminders': {
                 'useDefault': False,
@@ -76,84 +85,117 @@ class LushGoogleCalendarWriter(object):
                 ],
             },
         }
+        if key is not None:
+            event['extendedProperties'] = loader_properties(key)
+        if event_id is not None:
+            event['id'] = event_id
         return event
 
     def load_gcalendar_api_credentials(self) -> Optional[dict]:
-        creds = None
-        # The file token.json stores the user's access and refresh tokens, and is
-        # created automatically when the authorization flow completes for the first
-        # time.
-        if os.path.exists(TOKEN_DIR):
-            creds = Credentials.from_authorized_user_file(TOKEN_DIR, self._SCOPES)
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    try:
-                        creds.refresh(Request())
-                    except RefreshError:
-                        print("Token expired, need to reauthenticate")
-                        os.remove(TOKEN_DIR)
+        return self.service_factory.get_credentials()
 
-        if not os.path.exists(TOKEN_DIR):
-            # If there are no (valid) credentials available, let the user log in.
-            flow = InstalledAppFlow.from_client_secrets_file(CRED_DIR, self._SCOPES)
-            creds = flow.run_local_server(port=0)
-            # Save the credentials for the next run
-            with open(TOKEN_DIR, 'w') as token:
-                token.write(creds.to_json())
-        return creds
-
-    def update_schedule(self, up_to_date: Dict[str, WorkShift]):
+    @staticmethod
+    def shift_times_body(work_shift: WorkShift, key: Optional[str] = None) -> dict:
+        body = {'start': {'dateTime': work_shift.shift_local_start_time.isoformat(), 'timeZone': STORE_TIMEZONE},
+                'end': {'dateTime': work_shift.shift_local_end_time.isoformat(), 'timeZone': STORE_TIMEZONE}}
+        if key is not None:
+            body['extendedProperties'] = loader_properties(key)
+        return body
+
+    def update_schedule(self, calendar_id: str, up_to_date: Dict[str, WorkShift], batch: CalendarBatchWriter,
+                        months: int) -> ReconciliationPlan:
         # Call the Calendar API, 'Z' indicates UTC time
         now = dt.datetime.fromisoformat(dt.datetime.utcnow().date().isoformat()).isoformat() + 'Z'
-        events_result = self.service.events().list(calendarId=self._calendar_id, timeMin=now,
-                                                   maxResults=30, singleEvents=True,
-                                                   orderBy='startTime').execute()
-        events = events_result.get('items', [])
-
-        if not events:
-            print('No upcoming events found.')
+        with METRICS.span('calendar_phase', phase='list'):
+            if self.incremental:
+                # Only pulls the events changed since the last run, the rest come from the local index
+                events = CalendarSyncState(calendar_id, self.sync_dir).sync(self.service, now, self.rate_limiter)
+            else:
+                events = list_loader_events(self.service, calendar_id, self.rate_limiter, timeMin=now,
+                                            maxResults=250, singleEvents=True, orderBy='startTime')
+        loader_events = [event for event in events if is_loader_event(event)]
+
+        # The scrape covers tomorrow through the end of the source's last month, see ScheduleLoader.iter_schedule
+        today = dt.date.today()
+        with METRICS.span('calendar_phase', phase='plan'):
+            plan = plan_reconciliation(up_to_date.values(), loader_events, window_start=today + dt.timedelta(days=1),
+                                       window_end=horizon_end(today, months))
+        print(f"Reconciliation plan for calendar {calendar_id}: {plan.summary()}")
+        for mutation in plan.mutations:
+            if mutation.operation == 'insert':
+                batch.insert(self.create_event(mutation.shift.shift_local_start_time,
+                                               mutation.shift.shift_local_end_time, mutation.key,
+                                               event_id_for(calendar_id, mutation.key)), key=mutation.key)
+            elif mutation.operation == 'patch':
+                batch.patch(mutation.event_id, self.shift_times_body(mutation.shift, mutation.key), key=mutation.key)
+            else:
+                batch.delete(mutation.event_id, key=mutation.key)
+        # Untagged events that already match are tagged once, after that the filtered listing finds them
+        untagged = {event.get('id') for event in loader_events if not is_tagged_event(event)}
+        for key, event_id in sorted(plan.unchanged.items()):
+            if event_id in untagged:
+                batch.patch(event_id, {'extendedProperties': loader_properties(key)}, key=key)
+        return plan
+
+    def replay_journal(self, user_in: str, calendar_id: str, schedule_dict: Dict[str, WorkShift],
+                       journal: MutationJournal, entry: JournalEntry) -> bool:
+        # True when an interrupted run's plan was finished off and the calendar needs nothing else
+        if entry.schedule_hash != ScheduleSnapshotStore.content_hash(schedule_dict):
+            print(f"Schedule for user {user_in} changed since the interrupted run, reconciling from scratch")
+            journal.clear()
+            return False
+        pending = entry.pending
+        print(f"Replaying {len(pending)} of {len(entry.operations)} journaled mutations for calendar {calendar_id}")
+        METRICS.incr('journal_replays')
+        batch = CalendarBatchWriter(self.service, calendar_id, limiter=self.rate_limiter)
+        for operation, key, event_id, body in pending:
+            if operation == 'insert':
+                batch.insert(body, key=key)
+            elif operation == 'patch':
+                batch.patch(event_id, body, key=key)
+            else:
+                batch.delete(event_id, key=key)
+        with METRICS.span('calendar_phase', phase='replay'):
+            results = batch.execute(on_results=journal.mark_done)
+        failures = batch.report(results)
+        if failures:
+            logging.error(f"{failures} journaled mutations failed again for calendar {calendar_id}, reconciling")
+            return False
+        if self.snapshot_store is not None:
+            self.snapshot_store.record(user_in, calendar_id, schedule_dict, journal.load().event_ids())
+        journal.clear()
+        return True
+
+    def write_schedule(self, user_in: str, calendar_id: str, schedule: Dict[str, WorkShift], months: int):
+        journal, interrupted = None, False
+        if self.journal_dir is not None:
+            journal = MutationJournal(calendar_id, self.journal_dir)
+            entry = journal.load()
+            interrupted = entry is not None
+            if interrupted and self.replay_journal(user_in, calendar_id, schedule, journal, entry):
+                return
+        # A half applied plan means the calendar matches neither schedule, so the snapshot can't vouch for it
+        if not interrupted and self.snapshot_store is not None and \
+                self.snapshot_store.is_unchanged(user_in, calendar_id, schedule):
+            print(f"Schedule for user {user_in} is unchanged since the last run, skipping the calendar")
+            METRICS.incr('snapshot_skips')
             return
-
-        for event in events:
-            event_name = event.get('summary')
-            if event_name != 'Lush Shift':
-                continue
-
-            start_dt, end_dt = self.get_start_end_for_event(event)
-            if start_dt is not None:
-                start_date_string = start_dt.strftime('%Y%m%d')
-                possibly_updated_shift = up_to_date.get(start_date_string)
-                if possibly_updated_shift is not None and end_dt is not None:
-                    print(f"Found shift for user on date {start_date_string}, comparing:")
-                    if possibly_updated_shift.shift_local_start_time != start_dt or possibly_updated_shift.shift_local_end_time != end_dt:
-                        print('Deleting event from calendar and replacing, dates do not match')
-                        kwargs = {'calendarId': self._calendar_id,
-                                  'eventId': event.get('id'),
-                                  'sendNotifications': False}
-                        rq = self.service.events().delete(**kwargs)
-                        resp = rq.execute()
-                    else:
-                        print('Up to date, deleting from dictionary')
-                        del up_to_date[start_date_string]
-        return
-
-    def load_user_schedule(self, user_in: str, user_pass: str, calendar_id: str):
-        # Get the up to date schedule from website
-        schedule_dict = ScheduleLoader(user_in, user_pass, 40).schedule_dict
-        # Delete events in the calendar that have updated start and end times, or delete entries
-        # that are not updated in schedule dict:
-        # This line is a test that I added in doom emacs to push to github using magit
-        if not self.debug:
-            self.update_schedule(up_to_date=schedule_dict)
-            # Add the remaining shifts to the calendar:
-            for _, work_shift_obj in schedule_dict.items():
-                new_event_body = self.create_event(work_shift_obj.shift_local_start_time,
-                                                   work_shift_obj.shift_local_end_time)
-                try:
-                    new_event = self.service.events().insert(calendarId=calendar_id, body=new_event_body).execute()
-                    print('Event created: %s' % (new_event.get('htmlLink')))
-                except Exception:
-                    print('Error creating event')
-                    continue
-        else:
-            pass
+        batch = CalendarBatchWriter(self.service, calendar_id, limiter=self.rate_limiter)
+        # Plan the minimal set of inserts, patches and deletes, then send them together:
+        plan = self.update_schedule(calendar_id, up_to_date=schedule, batch=batch, months=months)
+        if journal is not None and len(batch):
+            journal.begin(ScheduleSnapshotStore.content_hash(schedule), plan.unchanged, batch.queued())
+        with METRICS.span('calendar_phase', phase='write'):
+            results = batch.execute(on_results=journal.mark_done if journal is not None else None)
+        failures = batch.report(results)
+        if failures:
+            # The journal keeps the failed mutations for the next run to replay
+            raise ScheduleSinkError(f"{failures} of {len(results)} calendar mutations failed "
+                                    f"for calendar {calendar_id}")
+        if journal is not None:
+            journal.clear()
+        if self.snapshot_store is not None:
+            # Only a fully applied plan is recorded, otherwise the next run has to reconcile again
+            event_ids = dict(plan.unchanged)
+            event_ids.update({result.key: result.event_id for result in results if result.operation != 'delete'})
+            self.snapshot_store.record(user_in, calendar_id, schedule, event_ids)
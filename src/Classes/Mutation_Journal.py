@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.Classes.Calendar_Batch_Writer import BatchItemResult
+from src.config.MUTATION_JOURNAL_CONFIG import JOURNAL_DIR
+
+# Write-ahead log of the mutations planned for one calendar. The plan is written before the first
+# batch goes out and every finished item is appended after its batch, so a run that dies halfway
+# leaves behind exactly the operations that still have to be sent.
+
+# (operation, key, event id, body), the tuples CalendarBatchWriter.queued returns
+JournalOperation = Tuple[str, Optional[str], Optional[str], Optional[dict]]
+
+
+class JournalEntry(NamedTuple):
+    schedule_hash: str
+    unchanged: Dict[str, str]
+    operations: List[JournalOperation]
+    # (operation, key) -> event id of every operation that finished
+    done: Dict[Tuple[str, Optional[str]], Optional[str]]
+
+    @property
+    def pending(self) -> List[JournalOperation]:
+        return [operation for operation in self.operations if (operation[0], operation[1]) not in self.done]
+
+    def event_ids(self) -> Dict[str, str]:
+        # shift key -> event id once the journaled plan is fully applied, same shape the snapshot store records
+        event_ids = dict(self.unchanged)
+        event_ids.update({key: event_id for (operation, key), event_id in self.done.items()
+                          if operation != 'delete' and key is not None and event_id is not None})
+        return event_ids
+
+
+class MutationJournal(object):
+    def __init__(self, calendar_id: str, journal_dir: str = JOURNAL_DIR):
+        self.calendar_id = calendar_id
+        file_name = hashlib.sha1(calendar_id.encode('utf-8')).hexdigest() + '.journal'
+        self.path = os.path.join(journal_dir, file_name)
+
+    def _append(self, records: Iterable[dict], mode: str = 'a'):
+        with open(self.path, mode) as journal_file:
+            for record in records:
+                journal_file.write(json.dumps(record) + '\n')
+            journal_file.flush()
+            # The line has to be on disk before the calls it describes are sent
+            os.fsync(journal_file.fileno())
+
+    def begin(self, schedule_hash: str, unchanged: Dict[str, str], operations: List[JournalOperation]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._append([{'calendar_id': self.calendar_id, 'schedule_hash': schedule_hash, 'unchanged': unchanged,
+                       'operations': [list(operation) for operation in operations]}], mode='w')
+
+    def mark_done(self, results: List[BatchItemResult]):
+        # Failed items stay pending, the next run sends them again
+        done = [{'done': [result.operation, result.key, result.event_id]} for result in results if result.ok]
+        if done:
+            self._append(done)
+
+    def load(self) -> Optional[JournalEntry]:
+        if not os.path.exists(self.path):
+            return None
+        records = []
+        try:
+            with open(self.path, 'r') as journal_file:
+                for line in journal_file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A crash mid write leaves a torn last line, everything before it is intact
+                        break
+        except OSError:
+            logging.error(f"Could not read mutation journal at {self.path}, discarding it")
+            return None
+        if not records or records[0].get('calendar_id') != self.calendar_id:
+            return None
+        header = records[0]
+        done = {(record['done'][0], record['done'][1]): record['done'][2] for record in records[1:] if 'done' in record}
+        return JournalEntry(header['schedule_hash'], header.get('unchanged', {}),
+                            [tuple(operation) for operation in header['operations']], done)
+
+    def clear(self):
+        # Called once the plan is fully applied, or to drop a plan the schedule has moved past
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,119 @@
+import calendar
+import datetime as dt
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.Classes.work_shift import WorkShift, get_store_zone
+from src.Classes.Calendar_Sync_State import event_shift_key
+from src.config.STORE_TIMEZONE import STORE_TIMEZONE
+
+# Pure planning, no network: takes the scraped shifts and the events already on the
+# calendar and works out the fewest inserts, patches and deletes that make them match.
+
+
+class PlannedMutation(NamedTuple):
+    operation: str
+    key: str
+    event_id: Optional[str]
+    shift: Optional[WorkShift]
+
+
+class ReconciliationPlan(NamedTuple):
+    mutations: List[PlannedMutation]
+    # shift key -> event id of events that already match their shift
+    unchanged: Dict[str, str]
+
+    def operations(self, operation: str) -> List[PlannedMutation]:
+        return [mutation for mutation in self.mutations if mutation.operation == operation]
+
+    def summary(self) -> str:
+        return (f"{len(self.operations('insert'))} inserts, {len(self.operations('patch'))} patches, "
+                f"{len(self.operations('delete'))} deletes, {len(self.unchanged)} unchanged")
+
+
+def shift_key(date: dt.date, ordinal: int) -> str:
+    # Ordinal of the shift within its day, ordered by start time, so split shifts get distinct keys
+    return f"{date.strftime('%Y%m%d')}-{ordinal}"
+
+
+def horizon_end(today: dt.date, months: int) -> dt.date:
+    # Imported here, Schedule_Parser imports key_shifts from this module
+    from src.Classes.Schedule_Parser import month_offset
+    year, month = month_offset(today, months - 1)
+    return dt.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def event_times(event: dict) -> Tuple[Optional[dt.datetime], Optional[dt.datetime]]:
+    start = (event.get('start') or {}).get('dateTime')
+    end = (event.get('end') or {}).get('dateTime')
+    return (dt.datetime.fromisoformat(start) if start else None,
+            dt.datetime.fromisoformat(end) if end else None)
+
+
+def key_shifts(shifts: Iterable[WorkShift]) -> Dict[str, WorkShift]:
+    by_date: Dict[dt.date, List[WorkShift]] = {}
+    for shift in shifts:
+        by_date.setdefault(shift.date, []).append(shift)
+    keyed = {}
+    for date, day_shifts in by_date.items():
+        for ordinal, shift in enumerate(sorted(day_shifts, key=lambda s: s.shift_local_start_time)):
+            keyed[shift_key(date, ordinal)] = shift
+    return keyed
+
+
+def key_events(events: Iterable[dict], zone_key: str = STORE_TIMEZONE) -> Dict[str, dict]:
+    # Tagged events keep the key they were written with, so a moved event still pairs with its
+    # own shift. Untagged ones, and a second event claiming the same key, get the free ordinals.
+    zone = get_store_zone(zone_key)
+    keyed = {}
+    by_date: Dict[dt.date, List[Tuple[dt.datetime, dict]]] = {}
+    for event in events:
+        start_dt, _ = event_times(event)
+        if start_dt is None:
+            continue
+        key = event_shift_key(event)
+        if key is not None and key not in keyed:
+            keyed[key] = event
+            continue
+        by_date.setdefault(start_dt.astimezone(zone).date(), []).append((start_dt, event))
+    for date, day_events in by_date.items():
+        ordinal = 0
+        for _, event in sorted(day_events, key=lambda pair: pair[0]):
+            while shift_key(date, ordinal) in keyed:
+                ordinal += 1
+            keyed[shift_key(date, ordinal)] = event
+            ordinal += 1
+    return keyed
+
+
+def plan_reconciliation(shifts: Iterable[WorkShift], events: Iterable[dict], window_start: dt.date,
+                        window_end: Optional[dt.date] = None,
+                        zone_key: str = STORE_TIMEZONE) -> ReconciliationPlan:
+    # Only events between window_start and window_end were covered by the scrape, anything
+    # outside of it is left alone rather than treated as a cancelled shift.
+    zone = get_store_zone(zone_key)
+    windowed_events = []
+    for event in events:
+        start_dt, _ = event_times(event)
+        if start_dt is None:
+            continue
+        start_date = start_dt.astimezone(zone).date()
+        if start_date >= window_start and (window_end is None or start_date <= window_end):
+            windowed_events.append(event)
+
+    keyed_shifts = key_shifts(shifts)
+    keyed_events = key_events(windowed_events, zone_key)
+    mutations, unchanged = [], {}
+    for key, shift in sorted(keyed_shifts.items()):
+        event = keyed_events.get(key)
+        if event is None:
+            mutations.append(PlannedMutation('insert', key, None, shift))
+            continue
+        start_dt, end_dt = event_times(event)
+        if start_dt == shift.shift_local_start_time and end_dt == shift.shift_local_end_time:
+            unchanged[key] = event.get('id')
+        else:
+            mutations.append(PlannedMutation('patch', key, event.get('id'), shift))
+    for key, event in sorted(keyed_events.items()):
+        if key not in keyed_shifts:
+            mutations.append(PlannedMutation('delete', key, event.get('id'), None))
+    return ReconciliationPlan(mutations, unchanged)
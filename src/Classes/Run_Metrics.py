@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from src.config.METRICS_CONFIG import METRICS_DIR
+
+METRIC_PREFIX = 'work_schedule_loader'
+metrics_logger = logging.getLogger('work_schedule_loader.metrics')
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry(object):
+    # Counters and timers for one process. Spans also emit one structured log line each, so a
+    # slow run can be read back phase by phase.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._timers: Dict[Tuple[str, LabelKey], list] = {}
+        # Daemon polls for different users finish together and all write the same files
+        self._write_lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            timer = self._timers.setdefault(key, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        start_time = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            seconds = time.perf_counter() - start_time
+            self.observe(name, seconds, **labels)
+            metrics_logger.info(json.dumps({'span': name, 'seconds': round(seconds, 4), 'outcome': outcome,
+                                            **{key: str(value) for key, value in labels.items()}}))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                                 for (name, labels), value in sorted(self._counters.items())],
+                    'timers': [{'name': name, 'labels': dict(labels), 'count': timer[0],
+                                'sum_seconds': timer[1], 'max_seconds': timer[2]}
+                               for (name, labels), timer in sorted(self._timers.items())]}
+
+    @staticmethod
+    def _prometheus_labels(labels: dict) -> str:
+        if not labels:
+            return ''
+        escaped = []
+        for key, value in labels.items():
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def prometheus_text(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for counter in snapshot['counters']:
+            name = re.sub(r'[^a-zA-Z0-9_]', '_', f"{METRIC_PREFIX}_{counter['name']}_total")
+            lines.append(f"{name}{self._prometheus_labels(counter['labels'])} {counter['value']}")
+        for timer in snapshot['timers']:
+            name = re.sub(r'[^a-zA-Z0-9_]', '_', f"{METRIC_PREFIX}_{timer['name']}_seconds")
+            labels = self._prometheus_labels(timer['labels'])
+            lines.append(f"{name}_count{labels} {timer['count']}")
+            lines.append(f"{name}_sum{labels} {timer['sum_seconds']:.6f}")
+            lines.append(f"{name}_max{labels} {timer['max_seconds']:.6f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, directory: str = METRICS_DIR, run_name: str = 'last_run'):
+        # Written atomically so a node exporter textfile collector never reads half a file
+        os.makedirs(directory, exist_ok=True)
+        with self._write_lock:
+            for file_name, content in ((f"{run_name}.prom", self.prometheus_text()),
+                                       (f"{run_name}.json", json.dumps(self.snapshot(), indent=2))):
+                path = os.path.join(directory, file_name)
+                # A unique temp file in the same directory, so os.replace stays atomic and no two
+                # writers ever share one
+                descriptor, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{file_name}.", suffix='.tmp')
+                try:
+                    with os.fdopen(descriptor, 'w') as metrics_file:
+                        metrics_file.write(content)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+
+
+METRICS = MetricsRegistry()
@@ -1,50 +1,150 @@
 import datetime as dt
 import time
 import logging
-from typing import Tuple, Dict, List
-from src.config.DRIVER_CACHE_DIRECTORY import CACHE_DIR
+from contextlib import contextmanager
+from typing import Tuple, Dict, Iterator, List, Optional, TYPE_CHECKING
 from src.config.LUSH_STORE_FORCE_URL import URL
+from src.config.SCHEDULE_HORIZON_CONFIG import HORIZON_MONTHS
+from src.config.SCRAPE_CONFIG import EXTRACTION_MODE
+from src.config.SESSION_CACHE_CONFIG import SESSION_CHECK_TIMEOUT_SECONDS
 from src.Classes.work_shift import WorkShift
+from src.Classes.Driver_Resolver import resolve_chromedriver
+from src.Classes.Session_Cache import SessionCache
+from src.Classes.Schedule_Source import ScheduleFetchError
+from src.Classes.Schedule_Parser import extract_scheduled_rows, build_schedule, parse_workday_shift_string, \
+    iter_month_shifts, month_offset, rows_from_script, SCHEDULED_ROWS_SCRIPT, SCHEDULED_DAY_SELECTOR
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Run_Metrics import METRICS
 from selenium import webdriver
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.common.exceptions import TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-import copy
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException, \
+    WebDriverException
 import re
 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from src.Classes.Chrome_Driver_Pool import ChromeDriverPool
+
+
+MONTH_NAME_LOCATOR = (By.CSS_SELECTOR, '[data-bind="text: MonthName"]')
+SCHEDULED_DAY_LOCATOR = (By.CSS_SELECTOR, 'div.calendar-day.scheduled')
+CALENDAR_DAY_LOCATOR = (By.CSS_SELECTOR, 'div.calendar-day')
+SCHEDULE_BUTTON_LOCATOR = (By.CSS_SELECTOR, '#buttons [data-bind="click: ScheduleClicked"]')
+LOGIN_BUTTON_LOCATOR = (By.CLASS_NAME, 'login-inputs__button')
+
+
+def session_landing(driver: WebDriver):
+    # Where a restored session ends up: the menu when it is still valid, the login form otherwise
+    if driver.find_elements(*SCHEDULE_BUTTON_LOCATOR):
+        return 'schedule'
+    if driver.find_elements(*LOGIN_BUTTON_LOCATOR):
+        return 'login'
+    return False
+
+
+class calendar_rendered(object):
+    # Expected condition in the style of selenium's EC classes: true once the knockout
+    # MonthName differs from the previous month and the scheduled days stopped changing
+    # between two polls.
+    def __init__(self, previous_month: Optional[str] = None):
+        self.previous_month = previous_month
+        self._last_signature = None
+
+    def __call__(self, driver: WebDriver):
+        month_name = driver.find_element(*MONTH_NAME_LOCATOR).text
+        if not month_name or month_name == self.previous_month:
+            return False
+        signature = (month_name, len(driver.find_elements(*SCHEDULED_DAY_LOCATOR)))
+        settled = signature == self._last_signature
+        self._last_signature = signature
+        return month_name if settled else False
+
 
 class ScheduleLoader(object):
-    def __init__(self, user_in: str, user_pass: str, timeout: int):
+    def __init__(self, user_in: str, user_pass: str, timeout: int, driver_pool: Optional['ChromeDriverPool'] = None,
+                 load: bool = True, date: Optional[dt.date] = None, months: int = HORIZON_MONTHS,
+                 extraction: str = EXTRACTION_MODE, session_cache: Optional[SessionCache] = None):
+        if months < 1:
+            raise ValueError(f"months must be at least 1, got {months}")
+        if extraction not in ('script', 'page_source'):
+            raise ValueError(f"extraction must be 'script' or 'page_source', got {extraction}")
         self.user_in = user_in
         self.user_pass = user_pass
         self.timeout = timeout
-        self.date = dt.date.today()
-        self.driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager(path=CACHE_DIR).install()))
-        self.schedule_dict = self.load_schedule()
-        self.driver.quit()
+        self.date = date or dt.date.today()
+        self.months = months
+        self.extraction = extraction
+        self.session_cache = session_cache
+        # (wait name, seconds actually waited) for every wait in the scrape
+        self.wait_timings: List[Tuple[str, float]] = []
+        self.schedule_dict = None
+        self.logged_in = False
+        if not load:
+            # Parse-only use, e.g. benchmarks and offline checks, no browser is started
+            return
+        with self.open_driver(driver_pool) as driver:
+            self.driver = driver
+            self.schedule_dict = self.load_schedule()
+
+    @contextmanager
+    def open_driver(self, driver_pool: Optional['ChromeDriverPool'] = None) -> Iterator[WebDriver]:
+        if driver_pool is not None:
+            # Borrow a warm browser, the pool clears cookies and storage before the next user gets it
+            with driver_pool.driver() as driver:
+                yield driver
+            return
+        with METRICS.span('scrape_phase', phase='driver_install'):
+            driver_path = resolve_chromedriver()
+        with METRICS.span('scrape_phase', phase='driver_start'):
+            driver = webdriver.Chrome(service=ChromeService(driver_path))
+        try:
+            yield driver
+        finally:
+            driver.quit()
+
+    def stream(self, driver_pool: Optional['ChromeDriverPool'] = None) -> Iterator[WorkShift]:
+        # Shifts are handed out month by month while the browser is still scraping the later months
+        with self.open_driver(driver_pool) as driver:
+            self.driver = driver
+            yield from self.iter_schedule()
 
     def wait_to_find(self, condition: EC) -> WebDriver:
         wait = WebDriverWait(self.driver, timeout=self.timeout)
         return wait.until(condition)
 
+    def timed_wait(self, name: str, condition, timeout: float, fallback_sleep: float = 0.0):
+        start_time = time.perf_counter()
+        wait = WebDriverWait(self.driver, timeout=timeout, poll_frequency=0.1,
+                             ignored_exceptions=(NoSuchElementException, StaleElementReferenceException))
+        try:
+            result = wait.until(condition)
+        except TimeoutException:
+            # The page never signalled it was ready, fall back to the old fixed sleep
+            logging.warning(f"Wait '{name}' timed out after {timeout}s, sleeping {fallback_sleep}s instead")
+            time.sleep(fallback_sleep)
+            result = None
+        self.wait_timings.append((name, time.perf_counter() - start_time))
+        METRICS.observe('scrape_wait', self.wait_timings[-1][1], wait=name)
+        return result
+
     def login(self, user_box: webdriver, pass_box: webdriver, login_btn: webdriver) -> bool:
         start_time = time.perf_counter()
         run_time = 0
         while self.timeout > run_time:
             user_box.send_keys(self.user_in)
-            time.sleep(.25)
+            self.timed_wait('user_typed', lambda d: user_box.get_attribute('value') == self.user_in, 1, .25)
             pass_box.send_keys(self.user_pass)
-            time.sleep(.25)
+            self.timed_wait('pass_typed', lambda d: pass_box.get_attribute('value') == self.user_pass, 1, .25)
             try:
                 login_btn.click()
                 WebDriverWait(self.driver, 10).until(lambda d: d.find_element(By.ID, 'buttons').find_element(By.CSS_SELECTOR, '[data-bind="click: ScheduleClicked"]'))
                 return True
             except TimeoutException:
+                METRICS.incr('login_retries')
                 run_time = time.perf_counter() - start_time
                 self.driver.find_element(By.ID, 'btnMessageBoxClose').click()
                 user_box.clear()
@@ -52,47 +152,89 @@ class ScheduleLoader(object):
                 continue
         return False
 
-    def parse_scheduled_days(self, schedule: List[List[BeautifulSoup]]) -> Dict[str, WorkShift]:
-        out_dict = {}
+    def parse_scheduled_days(self, schedule: List[List['BeautifulSoup']]) -> Dict[str, WorkShift]:
+        # Reference parser over full-document soup, kept for parity checks against parse_scheduled_rows
+        shifts = []
         for index, month_sched_days in enumerate(schedule):
-            year = self.date.year
-            if not index:
-                month = self.date.month
-            else:
-                if self.date.month == 12:
-                    month = 1
-                    year += 1
-                else:
-                    month = self.date.month + 1
+            year, month = month_offset(self.date, index)
             for day in month_sched_days:
                 shift_day_numeric = int(day.find_next('label', attrs={'data-bind': re.compile("Day$")}).text)
-                if shift_day_numeric <= self.date.day and month == self.date.month:
+                shift_date = dt.date(year, month, shift_day_numeric)
+                if shift_date <= self.date:
                     continue
                 else:
                     shift_hours_raw = day.find_next('label', attrs={'data-bind': re.compile("Shift$")}).text
                     shift_start, shift_end = self.parse_workday_shift_string(shift_hours_raw)
-                    shift_date = dt.date(year, month, shift_day_numeric)
-                    out_dict[shift_date.strftime('%Y%m%d')] = WorkShift(shift_date, shift_start, shift_end)
-        return out_dict
+                    shifts.append(WorkShift(shift_date, shift_start, shift_end))
+        return key_shifts(shifts)
+
+    def parse_scheduled_rows(self, schedule: List[List[Tuple[int, str]]]) -> Dict[str, WorkShift]:
+        # Same output as parse_scheduled_days, from the (day, shift string) rows of extract_scheduled_rows
+        return build_schedule(schedule, self.date)
 
     @staticmethod
     def parse_workday_shift_string(workday_shift_string: str) -> Tuple[dt.time, dt.time]:
-        workday_shift_range_strings = [shift.strip() for shift in workday_shift_string.split('-')]
-        start_time, end_time = dt.datetime.strptime(workday_shift_range_strings[0],
-                                                    "%I:%M %p").time(), dt.datetime.strptime(
-            workday_shift_range_strings[1], "%I:%M %p").time()
-        return start_time, end_time
+        return parse_workday_shift_string(workday_shift_string)
+
+    def displayed_month_name(self) -> Optional[str]:
+        try:
+            return self.driver.find_element(*MONTH_NAME_LOCATOR).text
+        except WebDriverException:
+            return None
+
+    def page_source(self) -> str:
+        page_src = self.driver.page_source
+        METRICS.incr('page_source_bytes', len(page_src))
+        return page_src
 
-    def load_schedule(self) -> Dict[str, WorkShift]:
-        self.driver.get(URL)
+    def script_rows(self) -> Optional[List[Tuple[int, str]]]:
+        # (day, shift string) rows of the rendered month in one WebDriver round trip, None if the script failed
+        try:
+            rows = rows_from_script(self.driver.execute_script(SCHEDULED_ROWS_SCRIPT, SCHEDULED_DAY_SELECTOR))
+        except (WebDriverException, TypeError, ValueError) as error:
+            logging.warning(f"Script extraction failed for user {self.user_in}, parsing the page source: {error}")
+            return None
+        METRICS.incr('scrape_extractions', mode='script')
+        return rows
+
+    def resume_session(self) -> bool:
+        state = self.session_cache.load(self.user_in)
+        if state is None:
+            self.session_cache.record('miss')
+            return False
+        with METRICS.span('scrape_phase', phase='session_restore'):
+            try:
+                SessionCache.apply(self.driver, state, URL)
+                landed = WebDriverWait(self.driver, SESSION_CHECK_TIMEOUT_SECONDS, poll_frequency=0.1,
+                                       ignored_exceptions=(NoSuchElementException, StaleElementReferenceException)
+                                       ).until(session_landing)
+            except WebDriverException as error:
+                logging.info(f"Restoring the cached session for user {self.user_in} failed: {error}")
+                landed = None
+        if landed == 'schedule':
+            self.session_cache.record('hit')
+            return True
+        # The site dropped the session, start the full login from a clean cookie jar
+        self.session_cache.record('expired')
+        self.session_cache.invalidate(self.user_in)
+        self.driver.delete_all_cookies()
+        return False
 
+    def open_schedule(self) -> bool:
+        if self.session_cache is not None and self.resume_session():
+            logging.info(f"Reused the cached session for user {self.user_in}, skipping the login form")
+            METRICS.incr('logins', outcome='cached')
+            self.driver.find_element(*SCHEDULE_BUTTON_LOCATOR).click()
+            return True
         # inputs_locator = (By.ID, 'login-inputs-container')
         login_btn_locator = (By.CLASS_NAME, 'login-inputs__button')
         user_box_locator = (By.CSS_SELECTOR, '[type="text"]')
         pass_box_locator = (By.CSS_SELECTOR, '[type="password"]')
-        self.wait_to_find(EC.presence_of_element_located(login_btn_locator))
-        self.wait_to_find(EC.presence_of_element_located(user_box_locator))
-        self.wait_to_find(EC.presence_of_element_located(pass_box_locator))
+        with METRICS.span('scrape_phase', phase='page_load'):
+            self.driver.get(URL)
+            self.wait_to_find(EC.presence_of_element_located(login_btn_locator))
+            self.wait_to_find(EC.presence_of_element_located(user_box_locator))
+            self.wait_to_find(EC.presence_of_element_located(pass_box_locator))
 
 
         # inputs_location = self.driver.find_element(By.ID, 'login-inputs-container')
@@ -100,30 +242,60 @@ class ScheduleLoader(object):
         username_box = self.driver.find_element(By.CSS_SELECTOR, '[type="text"]')
         password_box = self.driver.find_element(By.CSS_SELECTOR, '[type="password"]')
 
-        logged_in = self.login(username_box, password_box, login_btn)
-
+        with METRICS.span('scrape_phase', phase='login'):
+            logged_in = self.login(username_box, password_box, login_btn)
+        METRICS.incr('logins', outcome='ok' if logged_in else 'failed')
+        if logged_in and self.session_cache is not None:
+            try:
+                self.session_cache.save(self.user_in, self.driver)
+            except (WebDriverException, OSError) as error:
+                logging.warning(f"Could not cache the session for user {self.user_in}: {error}")
         if logged_in:
             # Wait for the schedule button to load, then click it
             self.driver.find_element(By.ID, 'buttons').find_element(By.CSS_SELECTOR, '[data-bind="click: ScheduleClicked"]').click()
+        return logged_in
 
-            # Refactor with beautiful soup:
-            # Wait condition for calendar:
-            cal_wait_cond = EC.presence_of_element_located((By.CSS_SELECTOR, '[data-bind="foreach: ScheduleWeeks"]'))
-            self.wait_to_find(cal_wait_cond)
-            time.sleep(2)
-            page_src = copy.deepcopy(self.driver.page_source)
-            soup_current_month = BeautifulSoup(page_src, 'html.parser')
-            # Check next month:
-            self.driver.find_element(By.CSS_SELECTOR, '[data-bind="click: NextMonthClicked"]').click()
-            self.wait_to_find(cal_wait_cond)
-            time.sleep(2)
-            next_month_page_src = copy.deepcopy(self.driver.page_source)
-            soup_next_month = BeautifulSoup(next_month_page_src, 'html.parser')
-            # Get the days scheduled for this and next month:
-            scheduled_days_current_month = soup_current_month.find_all('div', class_="calendar-day scheduled")
-            scheduled_days_next_month = soup_next_month.find_all('div', class_="calendar-day scheduled")
-            schedule = [scheduled_days_current_month, scheduled_days_next_month]
-            return self.parse_scheduled_days(schedule)
-        else:
+    def iter_schedule(self) -> Iterator[WorkShift]:
+        self.logged_in = self.open_schedule()
+        if not self.logged_in:
             logging.error(f"Unable to log in for user {self.user_in}, please retry with a higher timeout or check logic")
+            return
+
+        # Wait condition for calendar:
+        cal_wait_cond = EC.presence_of_element_located((By.CSS_SELECTOR, '[data-bind="foreach: ScheduleWeeks"]'))
+        previous_month_name = None
+        for index in range(self.months):
+            self.wait_to_find(cal_wait_cond)
+            month_name = self.timed_wait(f"month_{index}_render", calendar_rendered(previous_month_name), 10, 2)
+            if month_name is None:
+                # Timed out: only go on if the page did move past the previous month. Otherwise its shifts
+                # would be written onto this month's dates and the real ones deleted.
+                month_name = self.displayed_month_name()
+                if not month_name or month_name == previous_month_name:
+                    raise ScheduleFetchError(f"Month {index + 1} of {self.months} never rendered for user "
+                                             f"{self.user_in}, the page still shows {month_name!r}")
+            previous_month_name = month_name
+            month_rows = self.script_rows() if self.extraction == 'script' else None
+            page_src = self.page_source() if month_rows is None else None
+            # Checked before the next month is clicked. A month without scheduled days is only trusted
+            # as empty when its calendar rendered days at all, otherwise every event in it would be deleted
+            has_days = bool(month_rows) or bool(self.driver.find_elements(*CALENDAR_DAY_LOCATOR))
+            if index + 1 < self.months:
+                # Start rendering the next month before parsing this one, the browser and the
+                # parser then work at the same time
+                self.driver.find_element(By.CSS_SELECTOR, '[data-bind="click: NextMonthClicked"]').click()
+            if month_rows is None:
+                METRICS.incr('scrape_extractions', mode='page_source')
+                with METRICS.span('scrape_phase', phase='parse'):
+                    month_rows = extract_scheduled_rows(page_src)
+            if not month_rows and not has_days:
+                raise ScheduleFetchError(f"Month {index + 1} of {self.months} rendered no calendar days for user "
+                                         f"{self.user_in}, not trusting it as empty")
+            year, month = month_offset(self.date, index)
+            yield from list(iter_month_shifts(month_rows, year, month, self.date))
+        logging.info(f"Waited {sum(seconds for _, seconds in self.wait_timings):.2f}s in total while scraping "
+                     f"{self.months} months for user {self.user_in}: {self.wait_timings}")
 
+    def load_schedule(self) -> Optional[Dict[str, WorkShift]]:
+        schedule_dict = key_shifts(self.iter_schedule())
+        return schedule_dict if self.logged_in else None
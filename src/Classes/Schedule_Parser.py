@@ -0,0 +1,135 @@
+import re
+import datetime as dt
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Reconciliation_Planner import key_shifts
+
+try:
+    # selectolax 1.0 dropped the modest backend, lexbor has the same css/attributes/text API
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = 'lxml'
+except ImportError:
+    BS4_PARSER = 'html.parser'
+
+# Same match as find_all('div', class_="calendar-day scheduled"): the whole class attribute
+SCHEDULED_DAY_CLASS = 'calendar-day scheduled'
+SCHEDULED_DAY_SELECTOR = f'div[class="{SCHEDULED_DAY_CLASS}"]'
+DAY_BIND_PATTERN = re.compile('Day$')
+SHIFT_BIND_PATTERN = re.compile('Shift$')
+
+# Runs in the browser with SCHEDULED_DAY_SELECTOR as arguments[0] and applies the same rules as
+# extract_scheduled_rows, so the page comes back as a few hundred bytes of [day, shift] pairs
+SCHEDULED_ROWS_SCRIPT = """
+var rows = [];
+var days = document.querySelectorAll(arguments[0]);
+for (var i = 0; i < days.length; i++) {
+    var dayText = null, shiftText = null;
+    var labels = days[i].querySelectorAll('label');
+    for (var j = 0; j < labels.length; j++) {
+        var bind = labels[j].getAttribute('data-bind') || '';
+        if (dayText === null && /Day$/.test(bind)) {
+            dayText = labels[j].textContent;
+        } else if (shiftText === null && /Shift$/.test(bind)) {
+            shiftText = labels[j].textContent;
+        }
+    }
+    if (dayText !== null && shiftText !== null) {
+        rows.push([dayText, shiftText]);
+    }
+}
+return rows;
+"""
+
+
+def _rows_selectolax(page_source: str) -> List[Tuple[int, str]]:
+    rows = []
+    for day in HTMLParser(page_source).css(SCHEDULED_DAY_SELECTOR):
+        day_text, shift_text = None, None
+        for label in day.css('label'):
+            data_bind = label.attributes.get('data-bind') or ''
+            if day_text is None and DAY_BIND_PATTERN.search(data_bind):
+                day_text = label.text()
+            elif shift_text is None and SHIFT_BIND_PATTERN.search(data_bind):
+                shift_text = label.text()
+        if day_text is not None and shift_text is not None:
+            rows.append((int(day_text), shift_text))
+    return rows
+
+
+@lru_cache(maxsize=None)
+def scheduled_day_strainer():
+    # bs4 is only imported when selectolax is missing, it adds ~100ms to startup otherwise
+    from bs4 import SoupStrainer
+    return SoupStrainer('div', attrs={'class': SCHEDULED_DAY_CLASS})
+
+
+def _rows_bs4(page_source: str) -> List[Tuple[int, str]]:
+    from bs4 import BeautifulSoup
+    rows = []
+    # Only the scheduled day divs are turned into a tree, the rest of the page is skipped
+    soup = BeautifulSoup(page_source, BS4_PARSER, parse_only=scheduled_day_strainer())
+    for day in soup.find_all('div', class_=SCHEDULED_DAY_CLASS):
+        day_label = day.find('label', attrs={'data-bind': DAY_BIND_PATTERN})
+        shift_label = day.find('label', attrs={'data-bind': SHIFT_BIND_PATTERN})
+        if day_label is not None and shift_label is not None:
+            rows.append((int(day_label.text), shift_label.text))
+    return rows
+
+
+def rows_from_script(script_result: List[list]) -> List[Tuple[int, str]]:
+    # execute_script hands back JSON lists, the day is converted here like the HTML parsers do
+    return [(int(day_text), shift_text) for day_text, shift_text in script_result]
+
+
+def extract_scheduled_rows(page_source: str) -> List[Tuple[int, str]]:
+    # (day of month, raw shift string) for every scheduled day on a rendered calendar page
+    if HTMLParser is not None:
+        return _rows_selectolax(page_source)
+    return _rows_bs4(page_source)
+
+
+def parse_workday_shift_string(workday_shift_string: str) -> Tuple[dt.time, dt.time]:
+    workday_shift_range_strings = [shift.strip() for shift in workday_shift_string.split('-')]
+    start_time, end_time = dt.datetime.strptime(workday_shift_range_strings[0],
+                                                "%I:%M %p").time(), dt.datetime.strptime(
+        workday_shift_range_strings[1], "%I:%M %p").time()
+    return start_time, end_time
+
+
+def month_offset(date: dt.date, offset: int) -> Tuple[int, int]:
+    # (year, month) of the month `offset` months after date's, rolling over as many years as needed
+    month_index = date.month - 1 + offset
+    return date.year + month_index // 12, month_index % 12 + 1
+
+
+def iter_month_shifts(month_rows: List[Tuple[int, str]], year: int, month: int,
+                      date: dt.date) -> Iterator[WorkShift]:
+    # Shifts from one month's (day, shift string) rows, days up to and including date are dropped
+    shift_rows = []
+    for shift_day_numeric, shift_hours_raw in month_rows:
+        shift_date = dt.date(year, month, shift_day_numeric)
+        if shift_date <= date:
+            continue
+        shift_start, shift_end = parse_workday_shift_string(shift_hours_raw)
+        shift_rows.append((shift_date, shift_start, shift_end))
+    yield from WorkShift.from_rows(shift_rows)
+
+
+def build_schedule(schedule: List[List[Tuple[int, str]]], date: dt.date) -> Dict[str, WorkShift]:
+    # schedule holds the rows of date's month followed by as many consecutive months as were scraped.
+    # Keyed like the planner keys shifts, so a split shift's second half is not lost to the first.
+    shifts = []
+    for index, month_rows in enumerate(schedule):
+        year, month = month_offset(date, index)
+        shifts.extend(iter_month_shifts(month_rows, year, month, date))
+    return key_shifts(shifts)
@@ -0,0 +1,45 @@
+import logging
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Schedule_Source import ScheduleSource, SeleniumScheduleSource
+from src.Classes.Schedule_Sink import ScheduleSink, ScheduleSinkError
+from src.Classes.Google_Calendar_Writer import LushGoogleCalendarWriter
+from src.Classes.Run_Metrics import METRICS
+
+if TYPE_CHECKING:
+    from src.Classes.Chrome_Driver_Pool import ChromeDriverPool
+
+
+def load_user_schedule(source: ScheduleSource, sinks: List[ScheduleSink], user_in: str, user_pass: str,
+                       calendar_id: str) -> Dict[str, WorkShift]:
+    # The schedule is fetched once and every sink gets the same copy, in order
+    with METRICS.span('fetch_schedule', source=type(source).__name__):
+        schedule_dict = source.fetch_schedule(user_in, user_pass)
+    failures = []
+    for sink in sinks:
+        try:
+            with METRICS.span('sink_write', sink=type(sink).__name__):
+                sink.write_schedule(user_in, calendar_id, schedule_dict, source.months)
+        except Exception as error:
+            # One broken sink must not keep the schedule from the others
+            logging.exception(f"{type(sink).__name__} failed for user {user_in}")
+            METRICS.incr('sink_failures', sink=type(sink).__name__)
+            failures.append(f"{type(sink).__name__}: {error}")
+    if failures:
+        raise ScheduleSinkError(f"{len(failures)} of {len(sinks)} sinks failed for user {user_in}: "
+                                + '; '.join(failures))
+    return schedule_dict
+
+
+def build_pipeline(debug: bool = False, calendar_api: bool = True, driver_pool: Optional['ChromeDriverPool'] = None,
+                   schedule_source: Optional[ScheduleSource] = None, sinks: Optional[List[ScheduleSink]] = None,
+                   **calendar_kwargs) -> Tuple[ScheduleSource, List[ScheduleSink]]:
+    # Turns the runner's writer_kwargs into a source and its sinks, anything not listed here configures
+    # the Google Calendar sink. That sink goes first unless calendar_api is off
+    source = schedule_source or SeleniumScheduleSource(40, driver_pool=driver_pool)
+    if debug:
+        # Dry run: the schedule is fetched but nothing is written, and no credentials are loaded
+        return source, []
+    calendar_sinks = [LushGoogleCalendarWriter(**calendar_kwargs)] if calendar_api else []
+    return source, calendar_sinks + list(sinks or [])
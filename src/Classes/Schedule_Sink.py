@@ -0,0 +1,164 @@
+import os
+import hashlib
+import datetime as dt
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Reconciliation_Planner import key_shifts, horizon_end
+from src.Classes.Calendar_Sync_State import event_id_for, LOADER_EVENT_SUMMARY, LOADER_EVENT_LOCATION
+from src.Classes.Run_Metrics import METRICS
+from src.config.ICS_FEED_CONFIG import ICS_FEED_DIR
+
+
+class ScheduleSinkError(Exception):
+    pass
+
+
+class ScheduleSink(ABC):
+    # Somewhere a fetched schedule is written to. months is the window the source covered,
+    # shifts missing inside it were cancelled, anything outside it is left alone.
+    @abstractmethod
+    def write_schedule(self, user_in: str, calendar_id: str, schedule: Dict[str, WorkShift], months: int):
+        pass
+
+    def close(self):
+        pass
+
+
+# Feed files are plain RFC 5545, lines end in CRLF and are folded at 75 octets
+ICS_LINE_END = '\r\n'
+ICS_PRODUCT_ID = '-//work-schedule-loader//Schedule Feed//EN'
+ICS_KEY_PROPERTY = 'X-WORK-SCHEDULE-KEY'
+ICS_TIME_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+class IcsEvent(NamedTuple):
+    key: str
+    start: str
+    end: str
+    sequence: int
+    text: str
+
+
+def ics_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_fold(line: str) -> str:
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        # Never split inside a multibyte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start = end
+    return (ICS_LINE_END + ' ').join(parts)
+
+
+def ics_utc(value: dt.datetime) -> str:
+    # UTC times need no VTIMEZONE block, clients show them in their own zone
+    return value.astimezone(dt.timezone.utc).strftime(ICS_TIME_FORMAT)
+
+
+def render_vevent(uid: str, key: str, shift: WorkShift, sequence: int, stamp: str) -> str:
+    lines = ['BEGIN:VEVENT', f"UID:{uid}", f"DTSTAMP:{stamp}", f"SEQUENCE:{sequence}",
+             f"DTSTART:{ics_utc(shift.shift_local_start_time)}", f"DTEND:{ics_utc(shift.shift_local_end_time)}",
+             f"SUMMARY:{ics_escape(LOADER_EVENT_SUMMARY)}", f"LOCATION:{ics_escape(LOADER_EVENT_LOCATION)}",
+             f"{ICS_KEY_PROPERTY}:{key}"]
+    # Same reminders the Google events get
+    for minutes in (90, 45):
+        lines += ['BEGIN:VALARM', 'ACTION:DISPLAY', f"DESCRIPTION:{ics_escape(LOADER_EVENT_SUMMARY)}",
+                  f"TRIGGER:-PT{minutes}M", 'END:VALARM']
+    lines.append('END:VEVENT')
+    return ''.join(ics_fold(line) + ICS_LINE_END for line in lines)
+
+
+def parse_vevents(content: str) -> List[IcsEvent]:
+    events = []
+    for block in content.split('BEGIN:VEVENT' + ICS_LINE_END)[1:]:
+        block, separator, _ = block.partition('END:VEVENT' + ICS_LINE_END)
+        if not separator:
+            continue
+        properties = {}
+        for line in block.replace(ICS_LINE_END + ' ', '').split(ICS_LINE_END):
+            name, _, value = line.partition(':')
+            # VALARM lines come later and must not shadow the event's own properties
+            properties.setdefault(name, value)
+        if ICS_KEY_PROPERTY not in properties:
+            continue
+        events.append(IcsEvent(properties[ICS_KEY_PROPERTY], properties.get('DTSTART'), properties.get('DTEND'),
+                               int(properties.get('SEQUENCE') or 0),
+                               'BEGIN:VEVENT' + ICS_LINE_END + block + 'END:VEVENT' + ICS_LINE_END))
+    return events
+
+
+class IcsScheduleSink(ScheduleSink):
+    # Regenerates one feed per user without any network calls. Unchanged VEVENTs are copied over
+    # byte for byte, changed ones get a bumped SEQUENCE, and an identical feed is not rewritten at
+    # all so subscribed clients see an unchanged file.
+    def __init__(self, feed_dir: str = ICS_FEED_DIR, calendar_name: str = LOADER_EVENT_SUMMARY):
+        self.feed_dir = feed_dir
+        self.calendar_name = calendar_name
+
+    def path_for(self, user: str) -> str:
+        return os.path.join(self.feed_dir, hashlib.sha1(user.encode('utf-8')).hexdigest() + '.ics')
+
+    def _read(self, path: str) -> Optional[str]:
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as feed_file:
+                return feed_file.read()
+        except FileNotFoundError:
+            return None
+
+    def render(self, calendar_id: str, schedule: Dict[str, WorkShift], months: int,
+               existing: Optional[str] = None, today: Optional[dt.date] = None) -> str:
+        today = today or dt.date.today()
+        window_start, window_end = today + dt.timedelta(days=1), horizon_end(today, months)
+        stamp = dt.datetime.now(dt.timezone.utc).strftime(ICS_TIME_FORMAT)
+        previous = {event.key: event for event in parse_vevents(existing or '')}
+        blocks = {}
+        for key, event in previous.items():
+            key_date = dt.datetime.strptime(key.split('-')[0], '%Y%m%d').date()
+            if not window_start <= key_date <= window_end:
+                # Outside what was scraped, kept as is
+                blocks[key] = event.text
+        counts = {'unchanged': 0, 'changed': 0, 'added': 0}
+        for key, shift in key_shifts(shift for shift in schedule.values()
+                                     if window_start <= shift.date <= window_end).items():
+            old = previous.get(key)
+            if old is not None and (old.start, old.end) == (ics_utc(shift.shift_local_start_time),
+                                                            ics_utc(shift.shift_local_end_time)):
+                blocks[key] = old.text
+                counts['unchanged'] += 1
+                continue
+            uid = f"{event_id_for(calendar_id, key)}@work-schedule-loader"
+            blocks[key] = render_vevent(uid, key, shift, old.sequence + 1 if old is not None else 0, stamp)
+            counts['changed' if old is not None else 'added'] += 1
+        counts['removed'] = len(previous) + counts['added'] - len(blocks)
+        for outcome, count in counts.items():
+            if count:
+                METRICS.incr('ics_events', count, outcome=outcome)
+        header = ['BEGIN:VCALENDAR', 'VERSION:2.0', f"PRODID:{ICS_PRODUCT_ID}", 'CALSCALE:GREGORIAN',
+                  f"X-WR-CALNAME:{ics_escape(self.calendar_name)}"]
+        return (''.join(ics_fold(line) + ICS_LINE_END for line in header) +
+                ''.join(blocks[key] for key in sorted(blocks)) + 'END:VCALENDAR' + ICS_LINE_END)
+
+    def write_schedule(self, user_in: str, calendar_id: str, schedule: Dict[str, WorkShift], months: int):
+        path = self.path_for(user_in)
+        existing = self._read(path)
+        content = self.render(calendar_id, schedule, months, existing)
+        if content == existing:
+            print(f"ICS feed for user {user_in} is unchanged")
+            return
+        os.makedirs(self.feed_dir, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as feed_file:
+            feed_file.write(content)
+        # Clients polling the feed never see a half written file
+        os.replace(tmp_path, path)
+        print(f"Wrote ICS feed for user {user_in} to {path}")
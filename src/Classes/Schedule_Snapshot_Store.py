@@ -0,0 +1,84 @@
+import json
+import sqlite3
+import hashlib
+import datetime as dt
+from contextlib import closing
+from typing import Dict, List, NamedTuple, Optional
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.config.SNAPSHOT_STORE_CONFIG import SNAPSHOT_DB, SNAPSHOT_MAX_AGE_HOURS
+
+
+class ScheduleChanges(NamedTuple):
+    added: List[str]
+    removed: List[str]
+    changed: List[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+class ScheduleSnapshotStore(object):
+    def __init__(self, db_path: str = SNAPSHOT_DB,
+                 max_age: Optional[dt.timedelta] = dt.timedelta(hours=SNAPSHOT_MAX_AGE_HOURS)):
+        self.db_path = db_path
+        self.max_age = max_age
+        with closing(self._connect()) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS snapshots ('
+                         'user TEXT NOT NULL, calendar_id TEXT NOT NULL, content_hash TEXT NOT NULL, '
+                         'shifts TEXT NOT NULL, updated_at TEXT NOT NULL, PRIMARY KEY (user, calendar_id))')
+            conn.execute('CREATE TABLE IF NOT EXISTS written_events ('
+                         'user TEXT NOT NULL, calendar_id TEXT NOT NULL, shift_key TEXT NOT NULL, '
+                         'event_id TEXT NOT NULL, PRIMARY KEY (user, calendar_id, shift_key))')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps the store safe to share between worker threads
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def serialize(schedule: Dict[str, WorkShift]) -> Dict[str, List[str]]:
+        return {key: [shift.shift_local_start_time.isoformat(), shift.shift_local_end_time.isoformat()]
+                for key, shift in sorted(key_shifts(schedule.values()).items())}
+
+    @classmethod
+    def content_hash(cls, schedule: Dict[str, WorkShift]) -> str:
+        return hashlib.sha256(json.dumps(cls.serialize(schedule), sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _snapshot_row(self, user: str, calendar_id: str) -> Optional[tuple]:
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT content_hash, shifts, updated_at FROM snapshots '
+                                'WHERE user = ? AND calendar_id = ?', (user, calendar_id)).fetchone()
+
+    def is_unchanged(self, user: str, calendar_id: str, schedule: Dict[str, WorkShift]) -> bool:
+        row = self._snapshot_row(user, calendar_id)
+        if row is None or row[0] != self.content_hash(schedule):
+            return False
+        if self.max_age is not None:
+            return dt.datetime.utcnow() - dt.datetime.fromisoformat(row[2]) < self.max_age
+        return True
+
+    def changes_since_last_run(self, user: str, calendar_id: str, schedule: Dict[str, WorkShift]) -> ScheduleChanges:
+        row = self._snapshot_row(user, calendar_id)
+        previous = json.loads(row[1]) if row is not None else {}
+        current = self.serialize(schedule)
+        return ScheduleChanges(added=sorted(current.keys() - previous.keys()),
+                               removed=sorted(previous.keys() - current.keys()),
+                               changed=sorted(key for key in current.keys() & previous.keys()
+                                              if current[key] != previous[key]))
+
+    def last_event_ids(self, user: str, calendar_id: str) -> Dict[str, str]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT shift_key, event_id FROM written_events WHERE user = ? AND calendar_id = ?',
+                                (user, calendar_id)).fetchall()
+        return dict(rows)
+
+    def record(self, user: str, calendar_id: str, schedule: Dict[str, WorkShift], event_ids: Dict[str, str]):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO snapshots (user, calendar_id, content_hash, shifts, updated_at) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (user, calendar_id, self.content_hash(schedule), json.dumps(self.serialize(schedule)),
+                          dt.datetime.utcnow().isoformat()))
+            conn.execute('DELETE FROM written_events WHERE user = ? AND calendar_id = ?', (user, calendar_id))
+            conn.executemany('INSERT INTO written_events (user, calendar_id, shift_key, event_id) VALUES (?, ?, ?, ?)',
+                             [(user, calendar_id, key, event_id) for key, event_id in sorted(event_ids.items())])
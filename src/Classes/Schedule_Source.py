@@ -0,0 +1,155 @@
+import datetime as dt
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, TYPE_CHECKING
+from urllib.parse import urljoin
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Schedule_Parser import parse_workday_shift_string, month_offset
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Session_Cache import SessionCache, get_session_cache
+from src.config.LUSH_STORE_FORCE_URL import URL, LOGIN_PATH, SCHEDULE_PATH
+from src.config.RUNNER_CONFIG import MAX_WORKERS
+from src.config.SCHEDULE_HORIZON_CONFIG import HORIZON_MONTHS
+
+if TYPE_CHECKING:
+    import requests
+    from src.Classes.Chrome_Driver_Pool import ChromeDriverPool
+
+
+class ScheduleFetchError(Exception):
+    pass
+
+
+class ScheduleSource(ABC):
+    # Months covered by fetch_schedule, starting with the current one; the writer reconciles the same window
+    months = HORIZON_MONTHS
+
+    @abstractmethod
+    def fetch_schedule(self, user_in: str, user_pass: str) -> Dict[str, WorkShift]:
+        pass
+
+    def close(self):
+        pass
+
+
+class SeleniumScheduleSource(ScheduleSource):
+    def __init__(self, timeout: int = 40, driver_pool: Optional['ChromeDriverPool'] = None,
+                 months: int = HORIZON_MONTHS, session_cache: Optional[SessionCache] = None):
+        self.timeout = timeout
+        self.driver_pool = driver_pool
+        self.months = months
+        # Shared by default so every scrape in the process adds to one hit rate
+        self.session_cache = session_cache or get_session_cache()
+
+    def fetch_schedule(self, user_in: str, user_pass: str) -> Dict[str, WorkShift]:
+        # Empty only when every month rendered its calendar days without a scheduled one, like the
+        # HTTP source, otherwise ScheduleLoader raises. selenium is only loaded once a browser scrape is run
+        from src.Classes.Schedule_Loader import ScheduleLoader
+        schedule_dict = ScheduleLoader(user_in, user_pass, self.timeout, driver_pool=self.driver_pool,
+                                       months=self.months, session_cache=self.session_cache).schedule_dict
+        if schedule_dict is None:
+            raise ScheduleFetchError(f"Browser scrape did not return a schedule for user {user_in}")
+        return schedule_dict
+
+
+class HttpScheduleSource(ScheduleSource):
+    # Talks to the JSON endpoints the knockout app reads its ScheduleWeeks model from,
+    # so no browser is needed. Each user gets their own cookie jar on top of one shared
+    # connection pool.
+    def __init__(self, base_url: str = URL, timeout: float = 10, months: int = HORIZON_MONTHS,
+                 pool_size: int = MAX_WORKERS):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.months = months
+        from requests.adapters import HTTPAdapter
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def _new_session(self) -> 'requests.Session':
+        import requests
+        session = requests.Session()
+        session.mount('http://', self._adapter)
+        session.mount('https://', self._adapter)
+        return session
+
+    def login(self, session: 'requests.Session', user_in: str, user_pass: str):
+        response = session.post(urljoin(self.base_url, LOGIN_PATH),
+                                json={'UserName': user_in, 'Password': user_pass}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ScheduleFetchError(f"Login failed for user {user_in} with HTTP {response.status_code}")
+        body = response.json() if response.content else {}
+        if body.get('Success') is False:
+            raise ScheduleFetchError(f"Login rejected for user {user_in}: {body.get('Message')}")
+
+    def fetch_month(self, session: 'requests.Session', year: int, month: int) -> dict:
+        response = session.get(urljoin(self.base_url, SCHEDULE_PATH),
+                               params={'year': year, 'month': month}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ScheduleFetchError(f"Schedule request for {year}-{month:02d} failed with HTTP {response.status_code}")
+        return response.json()
+
+    @staticmethod
+    def parse_month(month_model: dict, year: int, month: int, today: dt.date) -> Dict[str, WorkShift]:
+        if not isinstance(month_model, dict) or not isinstance(month_model.get('ScheduleWeeks'), list):
+            # A login page or error body parses to no shifts, which the planner would read as every shift cancelled
+            raise ScheduleFetchError(f"Schedule response for {year}-{month:02d} is not a ScheduleWeeks model")
+        shift_rows, days_seen = [], 0
+        for week in month_model.get('ScheduleWeeks', []):
+            for day in week.get('Days', []):
+                days_seen += 1 if day.get('Day') else 0
+                shift_hours_raw = day.get('Shift')
+                if not shift_hours_raw or not day.get('Day'):
+                    continue
+                shift_date = dt.date(year, month, int(day['Day']))
+                if shift_date <= today:
+                    continue
+                shift_start, shift_end = parse_workday_shift_string(shift_hours_raw)
+                shift_rows.append((shift_date, shift_start, shift_end))
+        if not days_seen:
+            # Only a month that lists its days can vouch for having no shifts, see SeleniumScheduleSource
+            raise ScheduleFetchError(f"Schedule response for {year}-{month:02d} has no days")
+        return key_shifts(WorkShift.from_rows(shift_rows))
+
+    def fetch_schedule(self, user_in: str, user_pass: str) -> Dict[str, WorkShift]:
+        import requests
+        today = dt.date.today()
+        out_dict = {}
+        # Not closed on purpose, closing a session closes the adapter shared with the other users
+        session = self._new_session()
+        try:
+            self.login(session, user_in, user_pass)
+            for offset in range(self.months):
+                year, month = month_offset(today, offset)
+                out_dict.update(self.parse_month(self.fetch_month(session, year, month), year, month, today))
+        except (requests.RequestException, ValueError) as error:
+            raise ScheduleFetchError(f"HTTP schedule fetch failed for user {user_in}: {error}") from error
+        finally:
+            session.cookies.clear()
+        if not out_dict:
+            # Every month was a well formed model listing its days, so the user really has no shifts
+            logging.info(f"User {user_in} has no shifts in the next {self.months} months")
+        return out_dict
+
+    def close(self):
+        self._adapter.close()
+
+
+class FallbackScheduleSource(ScheduleSource):
+    def __init__(self, sources: List[ScheduleSource]):
+        if not sources:
+            raise ValueError('FallbackScheduleSource needs at least one source')
+        self.sources = sources
+        # Reconciling past what the chosen source fetched would delete real shifts
+        self.months = min(source.months for source in sources)
+
+    def fetch_schedule(self, user_in: str, user_pass: str) -> Dict[str, WorkShift]:
+        for source in self.sources[:-1]:
+            try:
+                return source.fetch_schedule(user_in, user_pass)
+            except ScheduleFetchError as error:
+                logging.warning(f"{type(source).__name__} failed, falling back: {error}")
+        return self.sources[-1].fetch_schedule(user_in, user_pass)
+
+    def close(self):
+        for source in self.sources:
+            source.close()
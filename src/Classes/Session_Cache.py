@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+from typing import Any, Optional
+
+from src.Classes.Run_Metrics import METRICS
+from src.config.SESSION_CACHE_CONFIG import SESSION_CACHE_DIR, SESSION_KEY_FILE, SESSION_CACHE_ENABLED, \
+    SESSION_MAX_AGE_HOURS
+
+# Cookies and web storage of a logged in StoreForce session, encrypted per user so the next run
+# can skip the login form while the session is still alive on the server.
+
+_STORAGE_SCRIPT = """
+var dump = function (storage) {
+    var out = {};
+    for (var i = 0; i < storage.length; i++) {
+        out[storage.key(i)] = storage.getItem(storage.key(i));
+    }
+    return out;
+};
+return {local: dump(window.localStorage), session: dump(window.sessionStorage)};
+"""
+_RESTORE_STORAGE_SCRIPT = """
+var state = arguments[0];
+Object.keys(state.local).forEach(function (key) { window.localStorage.setItem(key, state.local[key]); });
+Object.keys(state.session).forEach(function (key) { window.sessionStorage.setItem(key, state.session[key]); });
+"""
+
+
+class SessionCache(object):
+    def __init__(self, cache_dir: str = SESSION_CACHE_DIR, key_file: str = SESSION_KEY_FILE,
+                 max_age_hours: float = SESSION_MAX_AGE_HOURS):
+        self.cache_dir = cache_dir
+        self.key_file = key_file
+        self.max_age_seconds = max_age_hours * 60 * 60
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._fernet = None
+
+    def __getstate__(self) -> dict:
+        # Worker processes get their own lock and re-read the key
+        state = dict(self.__dict__)
+        state['_lock'], state['_fernet'] = None, None
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_fernet(self) -> Any:
+        from cryptography.fernet import Fernet
+        with self._lock:
+            if self._fernet is None:
+                if not os.path.exists(self.key_file):
+                    os.makedirs(os.path.dirname(self.key_file) or '.', exist_ok=True)
+                    try:
+                        # Only readable by the account running the loader
+                        descriptor = os.open(self.key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                        with os.fdopen(descriptor, 'wb') as key_file:
+                            key_file.write(Fernet.generate_key())
+                    except FileExistsError:
+                        # Another worker process created it first
+                        pass
+                with open(self.key_file, 'rb') as key_file:
+                    self._fernet = Fernet(key_file.read().strip())
+            return self._fernet
+
+    def path_for(self, user: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(user.encode('utf-8')).hexdigest() + '.session')
+
+    def load(self, user: str) -> Optional[dict]:
+        from cryptography.fernet import InvalidToken
+        path = self.path_for(user)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as session_file:
+                state = json.loads(self._get_fernet().decrypt(session_file.read()))
+        except (OSError, ValueError, InvalidToken):
+            logging.warning(f"Cached session for user {user} could not be read, discarding it")
+            self.invalidate(user)
+            return None
+        now = time.time()
+        if state.get('user') != user or now - state.get('saved_at', 0) > self.max_age_seconds:
+            self.invalidate(user)
+            return None
+        state['cookies'] = [cookie for cookie in state.get('cookies', [])
+                            if cookie.get('expiry') is None or cookie['expiry'] > now]
+        return state if state['cookies'] else None
+
+    def save(self, user: str, driver: Any):
+        storage = driver.execute_script(_STORAGE_SCRIPT) or {'local': {}, 'session': {}}
+        state = {'user': user, 'saved_at': time.time(), 'cookies': driver.get_cookies(),
+                 'local_storage': storage.get('local') or {}, 'session_storage': storage.get('session') or {}}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(user)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as session_file:
+            session_file.write(self._get_fernet().encrypt(json.dumps(state).encode('utf-8')))
+        os.replace(tmp_path, path)
+
+    def invalidate(self, user: str):
+        try:
+            os.remove(self.path_for(user))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def apply(driver: Any, state: dict, url: str):
+        # Cookies can only be set for the page's own origin, so the login page is loaded first
+        driver.get(url)
+        for cookie in state['cookies']:
+            if cookie.get('sameSite') not in (None, 'Strict', 'Lax', 'None'):
+                # Selenium rejects sameSite values it does not know, the browser default is fine
+                cookie = {key: value for key, value in cookie.items() if key != 'sameSite'}
+            driver.add_cookie(cookie)
+        driver.execute_script(_RESTORE_STORAGE_SCRIPT, {'local': state.get('local_storage') or {},
+                                                        'session': state.get('session_storage') or {}})
+        driver.get(url)
+
+    def record(self, outcome: str):
+        # outcome is 'hit', 'miss' (nothing usable cached) or 'expired' (rejected by the site)
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            else:
+                self.misses += 1
+        METRICS.incr('session_cache', outcome=outcome)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_default_cache: Optional[SessionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_session_cache() -> Optional[SessionCache]:
+    # None when switched off or when cryptography is missing, cookies are never stored in the clear
+    global _default_cache
+    if not SESSION_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            if importlib.util.find_spec('cryptography') is None:
+                logging.warning('cryptography is not installed, logging in on every run without a session cache')
+                return None
+            _default_cache = SessionCache()
+        return _default_cache
@@ -1,36 +1,68 @@
 import datetime as dt
-import time
-from typing import Tuple
+from functools import lru_cache
+from typing import Tuple, Iterable, List
+from zoneinfo import ZoneInfo
+
+from src.config.STORE_TIMEZONE import STORE_TIMEZONE
+
+
+@lru_cache(maxsize=None)
+def get_store_zone(zone_key: str = STORE_TIMEZONE) -> ZoneInfo:
+    return ZoneInfo(zone_key)
 
 
 class WorkShift(object):
-    def __init__(self, date: dt.date, start_time: dt.time, end_time = dt.time):
-        self.date = date
-        self.start_time = start_time
-        self.end_time = end_time
-        self.shift_local_start_time, self.shift_local_end_time = self.initialize_local_dts()
-
-    def initialize_local_dts(self) -> Tuple[dt.datetime, dt.datetime]:
-        date_str = self.date.strftime('%Y%m%d')
-        start_time_str = self.start_time.strftime("%I:%M %p")
-        end_time_str = self.end_time.strftime("%I:%M %p")
-        tz_str = self.generate_gmt_offset()
-        start_dt_str = ' '.join([date_str, start_time_str, tz_str])
-        end_dt_str = ' '.join([date_str, end_time_str, tz_str])
-        start_localized_dt = dt.datetime.strptime(start_dt_str, '%Y%m%d %I:%M %p %z')
-        end_localized_dt = dt.datetime.strptime(end_dt_str, '%Y%m%d %I:%M %p %z')
-        return start_localized_dt, end_localized_dt
+    __slots__ = ('date', 'start_time', 'end_time', 'zone_key', 'shift_local_start_time', 'shift_local_end_time')
+
+    def __init__(self, date: dt.date, start_time: dt.time, end_time: dt.time, zone_key: str = STORE_TIMEZONE):
+        self._set_fields(date, start_time, end_time, zone_key, get_store_zone(zone_key))
+
+    def _set_fields(self, date: dt.date, start_time: dt.time, end_time: dt.time, zone_key: str, zone: ZoneInfo):
+        start_dt, end_dt = self.initialize_local_dts(date, start_time, end_time, zone)
+        object.__setattr__(self, 'date', date)
+        object.__setattr__(self, 'start_time', start_time)
+        object.__setattr__(self, 'end_time', end_time)
+        object.__setattr__(self, 'zone_key', zone_key)
+        object.__setattr__(self, 'shift_local_start_time', start_dt)
+        object.__setattr__(self, 'shift_local_end_time', end_dt)
 
     @staticmethod
-    def generate_gmt_offset() -> str:
-        gmt_off_int = round(time.localtime().tm_gmtoff / 60 / 60 * 100)
-        east_of_gmt = False
-        if gmt_off_int < 0:
-            east_of_gmt = True
-            gmt_off_int *= -1
-        gmt_off_string = str(gmt_off_int)
-        if len(gmt_off_string) == 3:
-            gmt_off_string = '0' + gmt_off_string
-        if east_of_gmt:
-            gmt_off_string = '-' + gmt_off_string
-        return gmt_off_string
+    def initialize_local_dts(date: dt.date, start_time: dt.time, end_time: dt.time,
+                             zone: ZoneInfo) -> Tuple[dt.datetime, dt.datetime]:
+        # The offset comes from the shift's own date, so shifts after a DST change get the right one
+        return dt.datetime.combine(date, start_time, tzinfo=zone), dt.datetime.combine(date, end_time, tzinfo=zone)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[dt.date, dt.time, dt.time]],
+                  zone_key: str = STORE_TIMEZONE) -> List['WorkShift']:
+        zone = get_store_zone(zone_key)
+        shifts = []
+        for date, start_time, end_time in rows:
+            shift = cls.__new__(cls)
+            shift._set_fields(date, start_time, end_time, zone_key, zone)
+            shifts.append(shift)
+        return shifts
+
+    def _key(self) -> Tuple[dt.date, dt.time, dt.time, str]:
+        return self.date, self.start_time, self.end_time, self.zone_key
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"WorkShift is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"WorkShift is immutable, cannot delete {name}")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, WorkShift):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __reduce__(self):
+        return self.__class__, self._key()
+
+    def __repr__(self) -> str:
+        return (f"WorkShift({self.date.isoformat()}, {self.start_time.strftime('%H:%M')}-"
+                f"{self.end_time.strftime('%H:%M')}, {self.zone_key})")
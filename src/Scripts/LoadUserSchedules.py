@@ -1,7 +1,17 @@
 import sys
+import logging
 from src.config.Credential_Dir.CREDENTIALS import ARI_USER, JETS_USER, TAYL_USER, PASSWD
 from src.config.Credential_Dir.CALENDAR_IDS import ARI_SCHEDULE_ID, JESS_SCHEDULE_ID, TAYLOR_SCHEDULE_ID
-from src.Classes.Google_Calendar_Writer import LushGoogleCalendarWriter
+from src.Classes.Concurrent_User_Runner import ConcurrentUserRunner
+from src.Classes.Chrome_Driver_Pool import ChromeDriverPool
+from src.Classes.Schedule_Source import SeleniumScheduleSource, HttpScheduleSource, FallbackScheduleSource
+from src.Classes.Schedule_Snapshot_Store import ScheduleSnapshotStore
+from src.Classes.Session_Cache import get_session_cache
+from src.Classes.Schedule_Sink import IcsScheduleSink
+from src.Classes.Run_Metrics import METRICS
+from src.config.MUTATION_JOURNAL_CONFIG import JOURNAL_DIR
+from src.config.ICS_FEED_CONFIG import ICS_FEED_ENABLED
+from src.config.RUNNER_CONFIG import MAX_WORKERS, USE_PROCESSES, USE_HTTP_SOURCE
 
 USERS_DICT = {
     ARI_USER: ARI_SCHEDULE_ID,
@@ -10,8 +20,35 @@ USERS_DICT = {
 
 
 def main():
-    for user, calendar in USERS_DICT.items():
-        LushGoogleCalendarWriter(user, PASSWD, calendar)
+    logging.basicConfig(level=logging.INFO)
+    writer_kwargs = {'incremental': True, 'snapshot_store': ScheduleSnapshotStore(), 'journal_dir': JOURNAL_DIR}
+    if ICS_FEED_ENABLED:
+        writer_kwargs['sinks'] = [IcsScheduleSink()]
+    # Processes can't share browsers, each worker process launches its own per user instead
+    driver_pool = None if USE_PROCESSES else ChromeDriverPool(size=MAX_WORKERS)
+    if driver_pool is not None:
+        writer_kwargs['driver_pool'] = driver_pool
+    if USE_HTTP_SOURCE and not USE_PROCESSES:
+        writer_kwargs['schedule_source'] = FallbackScheduleSource(
+            [HttpScheduleSource(), SeleniumScheduleSource(driver_pool=driver_pool)])
+    try:
+        runner = ConcurrentUserRunner(max_workers=MAX_WORKERS, use_processes=USE_PROCESSES,
+                                      writer_kwargs=writer_kwargs)
+        results = runner.run((user, PASSWD, calendar) for user, calendar in USERS_DICT.items())
+    finally:
+        if 'schedule_source' in writer_kwargs:
+            writer_kwargs['schedule_source'].close()
+        if driver_pool is not None:
+            driver_pool.close()
+    runner.print_summary(results)
+    # Worker processes keep their own counts, so the parent's would read 0 of 0. The exported metrics
+    # have the per-process totals in that mode
+    session_cache = None if USE_PROCESSES else get_session_cache()
+    if session_cache is not None and session_cache.hits + session_cache.misses:
+        print(f"Session cache: {session_cache.hits} hits, {session_cache.misses} misses, "
+              f"{session_cache.hit_rate:.0%} hit rate")
+    METRICS.write(run_name='load_user_schedules')
+    return 0 if all(result.ok for result in results) else 1
 
 
 if __name__ == '__main__':
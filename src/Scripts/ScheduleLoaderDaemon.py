@@ -0,0 +1,189 @@
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.config.Credential_Dir.CREDENTIALS import PASSWD
+from src.Classes.Concurrent_User_Runner import run_user
+from src.Classes.Chrome_Driver_Pool import ChromeDriverPool
+from src.Classes.Schedule_Source import SeleniumScheduleSource, HttpScheduleSource, FallbackScheduleSource
+from src.Classes.Schedule_Snapshot_Store import ScheduleSnapshotStore
+from src.Classes.Schedule_Sink import IcsScheduleSink
+from src.Classes.Calendar_Service_Factory import get_service_factory
+from src.Classes.Run_Metrics import METRICS
+from src.Scripts.LoadUserSchedules import USERS_DICT
+from src.config.RUNNER_CONFIG import MAX_WORKERS, USE_HTTP_SOURCE
+from src.config.METRICS_CONFIG import METRICS_DIR
+from src.config.MUTATION_JOURNAL_CONFIG import JOURNAL_DIR
+from src.config.ICS_FEED_CONFIG import ICS_FEED_ENABLED
+from src.config.DAEMON_CONFIG import POLL_INTERVAL_SECONDS, POLL_JITTER_SECONDS, MAX_BACKOFF_SECONDS, \
+    HEALTH_HOST, HEALTH_PORT
+
+
+class UserPollState(object):
+    def __init__(self, user_in: str, user_pass: str, calendar_id: str):
+        self.user_in = user_in
+        self.user_pass = user_pass
+        self.calendar_id = calendar_id
+        self.runs = 0
+        self.consecutive_failures = 0
+        self.last_run: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return {'user': self.user_in, 'calendar_id': self.calendar_id, 'runs': self.runs,
+                'consecutive_failures': self.consecutive_failures, 'last_run': self.last_run,
+                'last_success': self.last_success, 'last_seconds': self.last_seconds,
+                'last_error': self.last_error, 'next_run': self.next_run}
+
+
+class ScheduleLoaderDaemon(object):
+    # Keeps the browsers, HTTP sessions and Calendar client warm between polls. Each user is
+    # polled on its own timer, the worker pool bounds how many users load at the same time.
+    def __init__(self, users: Iterable[Tuple[str, str, str]], writer_kwargs: Dict,
+                 interval: float = POLL_INTERVAL_SECONDS, jitter: float = POLL_JITTER_SECONDS,
+                 max_backoff: float = MAX_BACKOFF_SECONDS, max_workers: int = MAX_WORKERS,
+                 health_host: str = HEALTH_HOST, health_port: Optional[int] = HEALTH_PORT):
+        self.states = [UserPollState(user_in, user_pass, calendar_id) for user_in, user_pass, calendar_id in users]
+        self.writer_kwargs = writer_kwargs
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.max_workers = max_workers
+        self.health_host = health_host
+        self.health_port = health_port
+        self.started = time.time()
+        self._stop: Optional[asyncio.Event] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def next_delay(self, state: UserPollState) -> float:
+        delay = self.interval
+        if state.consecutive_failures:
+            delay = min(self.interval * 2 ** state.consecutive_failures, self.max_backoff)
+        return max(0.0, delay + random.uniform(-self.jitter, self.jitter))
+
+    def status(self) -> dict:
+        return {'status': 'stopping' if self._stop is not None and self._stop.is_set() else 'ok',
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'users': [state.as_dict() for state in self.states]}
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _sleep_or_stop(self, seconds: float) -> bool:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _poll_user(self, state: UserPollState):
+        loop = asyncio.get_running_loop()
+        # Spread the first runs out so every user does not hit StoreForce at once
+        if await self._sleep_or_stop(random.uniform(0, self.jitter)):
+            return
+        while not self._stop.is_set():
+            state.last_run = time.time()
+            result = await loop.run_in_executor(self._executor, run_user, state.user_in, state.user_pass,
+                                                state.calendar_id, self.writer_kwargs)
+            state.runs += 1
+            state.last_seconds = round(result.seconds, 2)
+            if result.ok:
+                state.consecutive_failures = 0
+                state.last_success = time.time()
+                state.last_error = None
+            else:
+                state.consecutive_failures += 1
+                state.last_error = result.error
+            delay = self.next_delay(state)
+            state.next_run = time.time() + delay
+            print(f"User {state.user_in} {'ok' if result.ok else 'FAILED'} in {result.seconds:.2f}s, "
+                  f"next poll in {delay:.0f}s")
+            try:
+                await loop.run_in_executor(None, METRICS.write, METRICS_DIR, 'schedule_loader_daemon')
+            except OSError as error:
+                # Metrics are best effort, a full disk or locked file must not stop the polling
+                logging.error(f"Writing daemon metrics to {METRICS_DIR} failed: {error}")
+            if await self._sleep_or_stop(delay):
+                return
+
+    async def _handle_health(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            path = request_line[1] if len(request_line) > 1 else '/'
+            content_type = 'application/json'
+            if path == '/health':
+                code, body = '200 OK', {'status': self.status()['status']}
+            elif path == '/metrics':
+                code, body, content_type = '200 OK', METRICS.prometheus_text(), 'text/plain; version=0.0.4'
+            elif path == '/status':
+                code, body = '200 OK', self.status()
+            else:
+                code, body = '404 Not Found', {'error': f"unknown path {path}"}
+            payload = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+            writer.write(f"HTTP/1.1 {code}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def _install_signal_handlers(self, loop: asyncio.AbstractEventLoop):
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops have no add_signal_handler
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(self.stop))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._install_signal_handlers(loop)
+        server = None
+        if self.health_port is not None:
+            server = await asyncio.start_server(self._handle_health, self.health_host, self.health_port)
+            print(f"Health endpoint listening on http://{self.health_host}:{self.health_port}/status")
+        try:
+            await asyncio.gather(*(self._poll_user(state) for state in self.states))
+        finally:
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+            # Let in-flight users finish writing before the browsers go away
+            await loop.run_in_executor(None, self._executor.shutdown, True)
+            print('Daemon stopped cleanly')
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    # Warm the Calendar credentials and discovery document once for the lifetime of the daemon
+    get_service_factory().get_credentials()
+    driver_pool = ChromeDriverPool(size=MAX_WORKERS)
+    schedule_source = SeleniumScheduleSource(driver_pool=driver_pool)
+    if USE_HTTP_SOURCE:
+        schedule_source = FallbackScheduleSource([HttpScheduleSource(), schedule_source])
+    writer_kwargs = {'incremental': True, 'snapshot_store': ScheduleSnapshotStore(),
+                     'schedule_source': schedule_source, 'journal_dir': JOURNAL_DIR}
+    if ICS_FEED_ENABLED:
+        writer_kwargs['sinks'] = [IcsScheduleSink()]
+    daemon = ScheduleLoaderDaemon([(user, PASSWD, calendar) for user, calendar in USERS_DICT.items()], writer_kwargs)
+    try:
+        asyncio.run(daemon.run())
+    finally:
+        schedule_source.close()
+        driver_pool.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,36 +1,40 @@
 import datetime as dt
 import os
 import time
-from typing import Tuple, Dict
-from src.config.DRIVER_CACHE_DIRECTORY import CACHE_DIR
+import logging
+from typing import Dict
 from src.config.LUSH_STORE_FORCE_URL import URL
 from src.Classes.work_shift import WorkShift
+from src.Classes.Driver_Resolver import resolve_chromedriver
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Schedule_Parser import SCHEDULED_ROWS_SCRIPT, SCHEDULED_DAY_SELECTOR, rows_from_script, \
+    parse_workday_shift_string
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-
-
-def parse_workday_shift_string(workday_shift_string: str) -> Tuple[dt.time, dt.time]:
-    workday_shift_range_strings = [shift.strip() for shift in workday_shift_string.split('-')]
-    start_time, end_time = dt.datetime.strptime(workday_shift_range_strings[0], "%I:%M %p").time(), dt.datetime.strptime(workday_shift_range_strings[1], "%I:%M %p").time()
-    return start_time, end_time
+from selenium.common.exceptions import TimeoutException
 
 
 def send_data(input_box: webdriver, _in: str, timeout: int) -> bool:
     count = 0
+    start_time = time.perf_counter()
     while input_box.get_attribute('value') != _in:
         if count > timeout:
             return False
         input_box.send_keys(_in)
         count += 1
-        time.sleep(1)
+        # Returns as soon as the box holds the value, a full second is only spent when it never does
+        try:
+            WebDriverWait(input_box, timeout=1, poll_frequency=0.05).until(lambda box: box.get_attribute('value') == _in)
+        except TimeoutException:
+            continue
+    logging.info(f"Waited {time.perf_counter() - start_time:.2f}s for input to be accepted")
     return True
 
 
 def get_schedule_dict_for_user(user_in: str, user_pass: str) -> Dict[str, WorkShift]:
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager(path=CACHE_DIR).install()))
+    driver = webdriver.Chrome(service=ChromeService(resolve_chromedriver()))
     driver.implicitly_wait(10)
     driver.get(URL)
 
@@ -57,29 +61,23 @@ def get_schedule_dict_for_user(user_in: str, user_pass: str) -> Dict[str, WorkSh
                                  "%B").month
     today = dt.datetime.today().date()
     assert today.month == month
-    weeks = WebDriverWait(week_tbody, timeout=5).until(lambda d: d.find_elements(By.TAG_NAME, 'tr'))
-
-    sched_dict = {}
-    for week in weeks:
-        days = WebDriverWait(week, timeout=5).until(lambda d: d.find_elements(By.TAG_NAME, 'td'))
-        for index, day in enumerate(days):
-            try:
-                workday_str = day.text
-                if len(workday_str) <= 1:
-                    continue
-                workday_info = workday_str.split('\n')
-                workday_numeric_day = int(workday_info[0])
-                if workday_numeric_day < today.day:
-                    continue
-                workday_shift_string = workday_info[-1]
-                workday_shift_start, workday_shift_end = parse_workday_shift_string(workday_shift_string)
-                workday_date = dt.datetime(today.year, today.month, workday_numeric_day).date()
-                work_shift = WorkShift(workday_date, workday_shift_start, workday_shift_end)
-                sched_dict[workday_date.strftime('%Y%m%d')] = work_shift
-            except Exception:
-                continue
+    WebDriverWait(week_tbody, timeout=5).until(lambda d: d.find_elements(By.TAG_NAME, 'tr'))
+
+    # One execute_script call returns every scheduled day instead of a round trip per row, cell and text
+    shifts = []
+    for workday_numeric_day, workday_shift_string in rows_from_script(
+            driver.execute_script(SCHEDULED_ROWS_SCRIPT, SCHEDULED_DAY_SELECTOR)):
+        if workday_numeric_day < today.day:
+            continue
+        try:
+            workday_shift_start, workday_shift_end = parse_workday_shift_string(workday_shift_string)
+        except (ValueError, IndexError):
+            continue
+        workday_date = dt.datetime(today.year, today.month, workday_numeric_day).date()
+        shifts.append(WorkShift(workday_date, workday_shift_start, workday_shift_end))
     driver.quit()
-    return sched_dict
+    # Keyed like the planner keys shifts, so split shifts on one day are all kept
+    return key_shifts(shifts)
 
 
 
@@ -1,18 +1,19 @@
 from __future__ import print_function
 import sys
-import os.path
 import datetime as dt
 from typing import Optional, Dict, Tuple
 
-from google.auth.transport.requests import Request
-from google.auth.exceptions import RefreshError
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from src.Classes.work_shift import WorkShift
-from src.config.LOADER_CREDENTIALS_DIRECTORY import CRED_DIR, TOKEN_DIR
+from src.Classes.Calendar_Batch_Writer import CalendarBatchWriter
+from src.Classes.Calendar_Sync_State import list_loader_events, is_loader_event, loader_properties, \
+    event_id_for
+from src.Classes.Calendar_Service_Factory import get_service_factory
+from src.Classes.Reconciliation_Planner import plan_reconciliation, horizon_end
+from src.Classes.Run_Metrics import METRICS
+from src.config.STORE_TIMEZONE import STORE_TIMEZONE
 from src.config.Credential_Dir.CREDENTIALS import ARI_USER, JETS_USER, TAYL_USER, ARI_PASS
 from src.config.Credential_Dir.CALENDAR_IDS import ARI_SCHEDULE_ID, JESS_SCHEDULE_ID, TAYLOR_SCHEDULE_ID
 from src.Scripts.schedule_getter_storeforce import get_schedule_dict_for_user
@@ -21,10 +22,8 @@ from src.Scripts.schedule_getter_storeforce import get_schedule_dict_for_user
 # Based on https://developers.google.com/calendar/api/quickstart/python, see for more info, can remove token to make more secure
 # See https://developers.google.com/calendar/api/guides/auth for scopes
 
-SCOPES = ['https://www.googleapis.com/auth/calendar']
 
-
-def create_event(start_dt: dt.datetime, end_dt: dt.datetime) -> dict:
+def create_event(start_dt: dt.datetime, end_dt: dt.datetime, key: Optional[str] = None) -> dict:
     # See https://developers.google.com/calendar/api/v3/reference/events for fields
     event = {
         'summary': 'Lush Shift',
@@ -32,11 +31,11 @@ def create_event(start_dt: dt.datetime, end_dt: dt.datetime) -> dict:
         'description': 'Workin hard for the money! Go baby!',
         'start': {
             'dateTime': start_dt.isoformat(),
-            'timeZone': 'America/New_York',
+            'timeZone': STORE_TIMEZONE,
         },
         'end': {
             'dateTime': end_dt.isoformat(),
-            'timeZone': 'America/New_York',
+            'timeZone': STORE_TIMEZONE,
         },
         'reminders': {
             'useDefault': False,
@@ -46,32 +45,13 @@ def create_event(start_dt: dt.datetime, end_dt: dt.datetime) -> dict:
             ],
         },
     }
+    if key is not None:
+        event['extendedProperties'] = loader_properties(key)
     return event
 
 
 def load_gcalendar_api_credentials() -> Optional[dict]:
-    creds = None
-    # The file token.json stores the user's access and refresh tokens, and is
-    # created automatically when the authorization flow completes for the first
-    # time.
-    if os.path.exists(TOKEN_DIR):
-        creds = Credentials.from_authorized_user_file(TOKEN_DIR, SCOPES)
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except RefreshError:
-                    print("Token expired, need to reauthenticate")
-                    os.remove(TOKEN_DIR)
-
-    if not os.path.exists(TOKEN_DIR):
-        # If there are no (valid) credentials available, let the user log in.
-        flow = InstalledAppFlow.from_client_secrets_file(CRED_DIR, SCOPES)
-        creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open(TOKEN_DIR, 'w') as token:
-            token.write(creds.to_json())
-    return creds
+    return get_service_factory().get_credentials()
 
 
 def get_start_end_for_event(event: dict) -> Tuple[Optional[dt.datetime], Optional[dt.datetime]]:
@@ -90,39 +70,30 @@ def get_start_end_for_event(event: dict) -> Tuple[Optional[dt.datetime], Optiona
     return start_dt, end_dt
 
 
-def update_schedule(service: build, calendar_id: str, up_to_date: Dict[str, WorkShift]):
+def update_schedule(service: build, calendar_id: str, up_to_date: Dict[str, WorkShift], batch: CalendarBatchWriter):
     # Call the Calendar API, 'Z' indicates UTC time
     now = dt.datetime.fromisoformat(dt.datetime.utcnow().date().isoformat()).isoformat() + 'Z'
-    events_result = service.events().list(calendarId=calendar_id, timeMin=now,
-                                          maxResults=30, singleEvents=True,
-                                          orderBy='startTime').execute()
-    events = events_result.get('items', [])
-
-    if not events:
-        print('No upcoming events found.')
-        return
-
-    for event in events:
-        event_name = event.get('summary')
-        if event_name != 'Lush Shift':
+    events = list_loader_events(service, calendar_id, timeMin=now, maxResults=250,
+                                singleEvents=True, orderBy='startTime')
+    loader_events = [event for event in events if is_loader_event(event)]
+
+    # get_schedule_dict_for_user scrapes from today through the end of the current month
+    today = dt.date.today()
+    plan = plan_reconciliation(up_to_date.values(), loader_events, window_start=today,
+                               window_end=horizon_end(today, 1))
+    print(f"Reconciliation plan: {plan.summary()}")
+    for mutation in plan.mutations:
+        if mutation.operation == 'delete':
+            batch.delete(mutation.event_id, key=mutation.key)
             continue
-
-        start_dt, end_dt = get_start_end_for_event(event)
-        if start_dt is not None:
-            start_date_string = start_dt.strftime('%Y%m%d')
-            possibly_updated_shift = up_to_date.get(start_date_string)
-            if possibly_updated_shift is not None and end_dt is not None:
-                print(f"Found shift for user on date {start_date_string}, comparing:")
-                if possibly_updated_shift.shift_local_start_time != start_dt or possibly_updated_shift.shift_local_end_time != end_dt:
-                    print('Deleting event from calendar and replacing, dates do not match')
-                    kwargs = {'calendarId': calendar_id,
-                              'eventId': event.get('id'),
-                              'sendNotifications': False}
-                    rq = service.events().delete(**kwargs)
-                    resp = rq.execute()
-                else:
-                    print('Up to date, deleting from dictionary')
-                    del up_to_date[start_date_string]
+        new_event_body = create_event(mutation.shift.shift_local_start_time, mutation.shift.shift_local_end_time,
+                                      mutation.key)
+        if mutation.operation == 'insert':
+            batch.insert(dict(new_event_body, id=event_id_for(calendar_id, mutation.key)), key=mutation.key)
+        else:
+            batch.patch(mutation.event_id, {'start': new_event_body['start'], 'end': new_event_body['end'],
+                                            'extendedProperties': new_event_body['extendedProperties']},
+                        key=mutation.key)
     return
 
 
@@ -130,18 +101,14 @@ def load_user_schedule(user_in: str, user_pass: str, calendar_id: str):
     creds = load_gcalendar_api_credentials()
     if creds is not None:
         try:
-            service = build('calendar', 'v3', credentials=creds)
+            service = get_service_factory().get_service()
             # Get the up to date schedule from website
-            schedule_dict = get_schedule_dict_for_user(user_in, user_pass)
-            # Delete events in the calendar that have updated start and end times, or delete entries
-            # that are not updated in schedule dict:
-            update_schedule(service=service, calendar_id=calendar_id, up_to_date=schedule_dict)
-            # Add the remaining shifts to the calendar:
-            for _, work_shift_obj in schedule_dict.items():
-                new_event_body = create_event(work_shift_obj.shift_local_start_time,
-                                              work_shift_obj.shift_local_end_time)
-                new_event = service.events().insert(calendarId=calendar_id, body=new_event_body).execute()
-                print('Event created: %s' % (new_event.get('htmlLink')))
+            with METRICS.span('fetch_schedule', source='schedule_getter_storeforce'):
+                schedule_dict = get_schedule_dict_for_user(user_in, user_pass)
+            # Insert new shifts, patch moved ones and delete cancelled ones in as few batches as possible:
+            batch = CalendarBatchWriter(service, calendar_id)
+            update_schedule(service=service, calendar_id=calendar_id, up_to_date=schedule_dict, batch=batch)
+            CalendarBatchWriter.report(batch.execute())
 
         except HttpError as error:
             print('An error occurred: %s' % error)
@@ -154,6 +121,7 @@ def main():
     load_user_schedule(ARI_USER, ARI_PASS, ARI_SCHEDULE_ID)
     load_user_schedule(JETS_USER, ARI_PASS, JESS_SCHEDULE_ID)
     load_user_schedule(TAYL_USER, ARI_PASS, TAYLOR_SCHEDULE_ID)
+    METRICS.write(run_name='schedule_loader_google_calendar')
 
 
 
@@ -0,0 +1,3 @@
+# Also pick up events written before they were tagged, by title. Costs one extra list call per run,
+# switch off once every calendar has been reconciled once with tagging
+LEGACY_SUMMARY_FALLBACK = True
\ No newline at end of file
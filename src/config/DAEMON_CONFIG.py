@@ -0,0 +1,5 @@
+POLL_INTERVAL_SECONDS = 15 * 60
+POLL_JITTER_SECONDS = 60
+MAX_BACKOFF_SECONDS = 4 * 60 * 60
+HEALTH_HOST = '127.0.0.1'
+HEALTH_PORT = 8765
\ No newline at end of file
@@ -1 +1,3 @@
-CACHE_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader"
\ No newline at end of file
+CACHE_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader"
+# Pin a chromedriver version to stop webdriver_manager checking for a newer one, None takes the first one installed
+CHROMEDRIVER_VERSION = None
\ No newline at end of file
@@ -0,0 +1,2 @@
+DRIVER_MAX_USES = 20
+HEADLESS = True
\ No newline at end of file
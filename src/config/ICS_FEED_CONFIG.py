@@ -0,0 +1,3 @@
+ICS_FEED_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\feeds"
+# One .ics file per user that Apple Calendar or any other client can subscribe to, no API quota involved
+ICS_FEED_ENABLED = True
\ No newline at end of file
@@ -1,2 +1,3 @@
 CRED_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\credentials.json"
-TOKEN_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\token.json"
\ No newline at end of file
+TOKEN_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\token.json"
+DISCOVERY_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\calendar_v3_discovery.json"
\ No newline at end of file
@@ -1 +1,4 @@
-URL = "https://sf.lush.com/storeforce/ess/"
\ No newline at end of file
+URL = "https://sf.lush.com/storeforce/ess/"
+# JSON endpoints behind the knockout ESS app, relative to URL
+LOGIN_PATH = "api/Login"
+SCHEDULE_PATH = "api/Schedule"
\ No newline at end of file
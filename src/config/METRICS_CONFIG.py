@@ -0,0 +1 @@
+METRICS_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\metrics"
\ No newline at end of file
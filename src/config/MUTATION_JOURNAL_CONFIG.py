@@ -0,0 +1 @@
+JOURNAL_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\journal"
\ No newline at end of file
@@ -0,0 +1,9 @@
+# One Google Cloud project quota is shared by every user, these keep all workers under it together
+CALENDAR_QUERIES_PER_SECOND = 5.0
+CALENDAR_BURST = 10
+CALENDAR_MAX_RETRIES = 6
+CALENDAR_BASE_BACKOFF_SECONDS = 1.0
+CALENDAR_MAX_BACKOFF_SECONDS = 64.0
+# In-flight requests for the async client, across all calendars and per calendar
+ASYNC_MAX_CONCURRENCY = 20
+ASYNC_PER_CALENDAR_CONCURRENCY = 4
\ No newline at end of file
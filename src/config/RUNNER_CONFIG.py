@@ -0,0 +1,4 @@
+MAX_WORKERS = 3
+USE_PROCESSES = False
+# Read schedules from the StoreForce JSON endpoints first, the browser is only used if that fails
+USE_HTTP_SOURCE = False
\ No newline at end of file
@@ -0,0 +1,2 @@
+# Months of schedule published to the calendar, starting with the current one
+HORIZON_MONTHS = 2
\ No newline at end of file
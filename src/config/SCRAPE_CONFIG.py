@@ -0,0 +1,2 @@
+# 'script' reads the scheduled days with one execute_script call per month, 'page_source' parses the full HTML
+EXTRACTION_MODE = 'script'
\ No newline at end of file
@@ -0,0 +1,8 @@
+SESSION_CACHE_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\sessions"
+# Fernet key for the cached cookies. It lives in the user's own config directory, apart from the
+# cached sessions, so copying or syncing Client Files never carries the key along with the cookies
+SESSION_KEY_FILE = "C:\\Users\\mikep\\AppData\\Roaming\\work-schedule-loader\\session.key"
+SESSION_CACHE_ENABLED = True
+# StoreForce sessions are dropped server side well before their cookies expire
+SESSION_MAX_AGE_HOURS = 12
+SESSION_CHECK_TIMEOUT_SECONDS = 5
\ No newline at end of file
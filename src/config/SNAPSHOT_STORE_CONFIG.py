@@ -0,0 +1,3 @@
+SNAPSHOT_DB = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\schedule_snapshots.sqlite3"
+# Reconcile against the calendar at least this often even when the scrape has not changed
+SNAPSHOT_MAX_AGE_HOURS = 24
\ No newline at end of file
@@ -0,0 +1 @@
+STORE_TIMEZONE = 'America/New_York'
\ No newline at end of file
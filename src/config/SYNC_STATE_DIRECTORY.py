@@ -0,0 +1 @@
+SYNC_DIR = "C:\\Users\\mikep\\PycharmProjects\\work-schedule-loader\\src\\Client Files\\sync_state"
\ No newline at end of file
@@ -0,0 +1,17 @@
+import pytest
+
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter
+from src.config.RATE_LIMIT_CONFIG import CALENDAR_MAX_RETRIES
+
+
+@pytest.fixture
+def make_limiter():
+    # The fakes have no quota: no pacing, and backoffs short enough that retries cost milliseconds
+    def make(max_retries: int = CALENDAR_MAX_RETRIES) -> CalendarRateLimiter:
+        return CalendarRateLimiter(rate=1e9, burst=1e9, max_retries=max_retries, base_delay=0.005, max_delay=0.02)
+    return make
+
+
+@pytest.fixture
+def limiter(make_limiter) -> CalendarRateLimiter:
+    return make_limiter()
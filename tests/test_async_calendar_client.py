@@ -0,0 +1,124 @@
+import time
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+
+from src.Classes.Async_Calendar_Client import AsyncCalendarClient, CalendarApiError
+from src.Benchmarks.fake_calendar_server import FakeCalendarServer
+
+pytest.importorskip('aiohttp')
+
+
+class TrackingCalendarServer(FakeCalendarServer):
+    # Records how many calls were in flight at once, overall and per calendar
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = Counter()
+        self.peak = Counter()
+        self._tracking_lock = threading.Lock()
+
+    def call(self, method, path, query, body):
+        calendar = path.split('/')[4]
+        with self._tracking_lock:
+            for scope in ('all', calendar):
+                self.in_flight[scope] += 1
+                self.peak[scope] = max(self.peak[scope], self.in_flight[scope])
+        try:
+            # Long enough that concurrent calls overlap
+            time.sleep(0.03)
+            return super().call(method, path, query, body)
+        finally:
+            with self._tracking_lock:
+                for scope in ('all', calendar):
+                    self.in_flight[scope] -= 1
+
+
+def event_body(index):
+    return {'summary': f"Shift {index}", 'start': {'dateTime': f"2026-03-{index % 28 + 1:02d}T10:00:00-05:00"},
+            'end': {'dateTime': f"2026-03-{index % 28 + 1:02d}T18:00:00-05:00"}}
+
+
+def client_for(server, limiter, **kwargs):
+    return AsyncCalendarClient(token_provider=lambda: 'test-token', base_url=server.url + 'calendar/v3/',
+                               limiter=limiter, **kwargs)
+
+
+def test_list_events_follows_every_page(limiter):
+    with FakeCalendarServer() as server:
+        for index in range(520):
+            server.service.insert_event('paged@test', event_body(index))
+
+        async def list_all():
+            async with client_for(server, limiter) as client:
+                return await client.list_events('paged@test', maxResults=250)
+
+        events = asyncio.run(list_all())
+        assert len(events) == 520
+        assert len({event['id'] for event in events}) == 520
+        assert server.service.calls['list'] == 3
+
+
+def test_concurrency_limits_hold_per_calendar_and_globally(limiter):
+    with TrackingCalendarServer() as server:
+        calendars = [f"cal{index}@test" for index in range(3)]
+
+        async def insert_everywhere():
+            async with client_for(server, limiter, max_concurrency=4, per_calendar_concurrency=2) as client:
+                return await asyncio.gather(*(client.apply(calendar, [('insert', str(index), None, event_body(index))
+                                                                      for index in range(8)])
+                                              for calendar in calendars))
+
+        results = asyncio.run(insert_everywhere())
+        assert all(result.ok for calendar_results in results for result in calendar_results)
+        assert server.peak['all'] == 4
+        assert max(server.peak[calendar] for calendar in calendars) == 2
+        assert all(len(server.service.live_events(calendar)) == 8 for calendar in calendars)
+
+
+def test_rate_limited_calls_are_retried_until_they_land(make_limiter):
+    with FakeCalendarServer(throttle_rate=0.3, seed=7) as server:
+
+        async def insert_all():
+            async with client_for(server, make_limiter(max_retries=20)) as client:
+                return await client.apply('busy@test', [('insert', str(index), None, event_body(index))
+                                                        for index in range(30)])
+
+        results = asyncio.run(insert_all())
+        assert all(result.ok for result in results)
+        assert server.requests['throttled'] > 0
+        # Throttled calls never reached the calendar, so retrying them made no duplicates
+        assert len(server.service.live_events('busy@test')) == 30
+
+
+def test_rate_limit_errors_surface_once_retries_run_out(make_limiter):
+    with FakeCalendarServer(throttle_rate=1.0) as server:
+
+        async def insert_one():
+            async with client_for(server, make_limiter(max_retries=2)) as client:
+                return await client.apply('busy@test', [('insert', '0', None, event_body(0))])
+
+        result, = asyncio.run(insert_one())
+        assert isinstance(result.error, CalendarApiError)
+        assert result.error.resp.status == 403
+        assert server.requests['throttled'] == 3
+
+
+def test_retried_insert_and_repeated_delete_are_no_ops(limiter):
+    with FakeCalendarServer() as server:
+        body = dict(event_body(0), id='deterministicid0')
+        server.service.insert_event('retry@test', dict(body))
+        gone = server.service.insert_event('retry@test', event_body(1))
+        server.service.delete_event('retry@test', gone['id'])
+
+        async def replay():
+            async with client_for(server, limiter) as client:
+                return await client.apply('retry@test', [('insert', '0', body['id'], body),
+                                                         ('delete', '1', gone['id'], None)])
+
+        results = asyncio.run(replay())
+        assert [(result.ok, result.event_id) for result in results] == [(True, body['id']), (True, gone['id'])]
+        # The taken id was written over instead of failing or making a second copy
+        assert server.service.calls['update'] == 1
+        assert [event['id'] for event in server.service.live_events('retry@test')] == [body['id']]
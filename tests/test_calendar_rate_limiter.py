@@ -0,0 +1,83 @@
+import json
+import datetime as dt
+
+import pytest
+
+from src.Classes import Calendar_Batch_Writer
+from src.Classes.Calendar_Batch_Writer import CalendarBatchWriter
+from src.Classes.Calendar_Rate_Limiter import CalendarRateLimiter, TokenBucket
+from src.Classes.Google_Calendar_Writer import LushGoogleCalendarWriter
+from src.Classes.work_shift import WorkShift
+from src.Benchmarks.fake_calendar_service import FakeCalendarService
+
+CALENDAR = 'limiter@test'
+
+
+class ApiError(Exception):
+    # Shaped like googleapiclient's HttpError: resp carries the status and headers, content the JSON body
+    def __init__(self, status, reason=None, retry_after=None):
+        super().__init__(f"HTTP {status} {reason or ''}")
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.resp = type('Response', (dict,), {'status': status})(headers)
+        self.content = json.dumps({'error': {'errors': [{'reason': reason}]}}).encode('utf-8') if reason else b''
+
+
+def test_bucket_paces_single_calls_after_the_burst():
+    bucket = TokenBucket(5.0, 10)
+    assert all(bucket.try_acquire() == 0 for _ in range(10))
+    assert bucket.try_acquire() == pytest.approx(0.2, abs=0.01)
+
+
+def test_request_bigger_than_the_bucket_is_paid_in_full():
+    bucket = TokenBucket(5.0, 10)
+    assert bucket.try_acquire(50) == 0
+    # The 40 call debt plus the next call, at 5 per second
+    assert bucket.try_acquire(1) == pytest.approx(41 / 5, abs=0.01)
+    assert bucket.try_acquire(50) == pytest.approx(50 / 5, abs=0.01)
+
+
+def test_should_retry_only_rate_limits_and_server_errors():
+    limiter = CalendarRateLimiter(max_retries=2)
+    assert limiter.should_retry(ApiError(429), 0, 'insert')
+    assert limiter.should_retry(ApiError(403, 'rateLimitExceeded'), 0, 'insert')
+    assert limiter.should_retry(ApiError(403, 'userRateLimitExceeded'), 0, 'insert')
+    assert limiter.should_retry(ApiError(503), 0, 'insert')
+    assert not limiter.should_retry(ApiError(403, 'forbiddenForNonOrganizer'), 0, 'insert')
+    assert not limiter.should_retry(ApiError(403), 0, 'insert')
+    assert not limiter.should_retry(ApiError(404, 'notFound'), 0, 'insert')
+    assert not limiter.should_retry(ApiError(429), 2, 'insert')
+
+
+def test_backoff_uses_retry_after_as_a_floor():
+    limiter = CalendarRateLimiter(base_delay=0.01, max_delay=64)
+    assert 0 <= limiter.backoff(0) <= 0.01
+    assert limiter.backoff(0, ApiError(429, retry_after=3)) == 3
+    # The hint is capped like any other delay
+    assert limiter.backoff(0, ApiError(429, retry_after=600)) == 64
+
+
+class ThrottlingCalendarService(FakeCalendarService):
+    def __init__(self, retry_after):
+        super().__init__()
+        self.retry_after = retry_after
+
+    def insert_event(self, calendar_id, body):
+        if self.retry_after:
+            retry_after, self.retry_after = self.retry_after, None
+            raise ApiError(429, 'rateLimitExceeded', retry_after)
+        return super().insert_event(calendar_id, body)
+
+
+def test_throttled_batch_items_honour_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(Calendar_Batch_Writer.time, 'sleep', sleeps.append)
+    service = ThrottlingCalendarService(retry_after=2)
+    # Not the shared test limiter, its short max_delay would cap the hint
+    batch = CalendarBatchWriter(service, CALENDAR,
+                                limiter=CalendarRateLimiter(rate=1e9, burst=1e9, base_delay=0.01))
+    shift = WorkShift(dt.date(2026, 3, 12), dt.time(9), dt.time(17))
+    batch.insert(LushGoogleCalendarWriter.create_event(shift.shift_local_start_time, shift.shift_local_end_time,
+                                                       '20260312-0'), key='20260312-0')
+    results = batch.execute()
+    assert [result.ok for result in results] == [True]
+    assert sleeps == [2.0]
@@ -0,0 +1,90 @@
+import datetime as dt
+
+from src.Classes.Calendar_Sync_State import CalendarSyncState, loader_properties, LOADER_EVENT_SUMMARY, \
+    LOADER_PROPERTY_FILTER
+from src.Classes.Reconciliation_Planner import plan_reconciliation
+from src.Classes.work_shift import WorkShift
+from src.Benchmarks.fake_calendar_service import FakeCalendarService, FakeHttpError
+
+CALENDAR = 'sync@test'
+TIME_MIN = '2026-03-10T00:00:00Z'
+
+
+class RecordingCalendarService(FakeCalendarService):
+    def __init__(self):
+        super().__init__()
+        self.lists = []
+        self.expired = False
+
+    def list_events(self, calendar_id, page_token, max_results, sync_token, time_min, private_property=None,
+                    query=None):
+        self.lists.append({'syncToken': sync_token, 'privateExtendedProperty': private_property, 'q': query})
+        if sync_token is not None and self.expired:
+            self.expired = False
+            raise FakeHttpError(410, 'Sync token is no longer valid')
+        return super().list_events(calendar_id, page_token, max_results, sync_token, time_min, private_property,
+                                   query)
+
+
+def event(summary, start, key=None):
+    body = {'summary': summary, 'start': {'dateTime': start}, 'end': {'dateTime': start}}
+    if key is not None:
+        body['extendedProperties'] = loader_properties(key)
+    return body
+
+
+def seeded_service():
+    service = RecordingCalendarService()
+    service.insert_event(CALENDAR, event(LOADER_EVENT_SUMMARY, '2026-03-12T09:00:00-04:00', '20260312-0'))
+    service.insert_event(CALENDAR, event('Dentist', '2026-03-12T15:00:00-04:00'))
+    return service
+
+
+def test_full_sync_indexes_only_loader_events_and_keeps_a_token(tmp_path, limiter):
+    service = seeded_service()
+    service.insert_event(CALENDAR, event(LOADER_EVENT_SUMMARY, '2026-03-13T09:00:00-04:00'))
+    state = CalendarSyncState(CALENDAR, str(tmp_path))
+    events = state.sync(service, TIME_MIN, limiter)
+    # The tagged event and the untagged one from before tagging, not the personal one
+    assert sorted(item['start']['dateTime'][:10] for item in events) == ['2026-03-12', '2026-03-13']
+    # Unfiltered, so Google hands back a token and the next run is incremental
+    assert service.lists == [{'syncToken': None, 'privateExtendedProperty': None, 'q': None}]
+    assert state.sync_token is not None
+
+
+def test_filtered_listing_gets_no_sync_token():
+    result = seeded_service().list_events(CALENDAR, None, 250, None, TIME_MIN, LOADER_PROPERTY_FILTER)
+    assert 'nextSyncToken' not in result
+
+
+def test_incremental_sync_applies_only_changes(tmp_path, limiter):
+    service = seeded_service()
+    CalendarSyncState(CALENDAR, str(tmp_path)).sync(service, TIME_MIN, limiter)
+    added = service.insert_event(CALENDAR, event(LOADER_EVENT_SUMMARY, '2026-03-14T09:00:00-04:00', '20260314-0'))
+    events = CalendarSyncState(CALENDAR, str(tmp_path)).sync(service, TIME_MIN, limiter)
+    assert added['id'] in {item['id'] for item in events} and len(events) == 2
+    assert service.lists[1]['syncToken'] is not None
+
+
+def test_expired_token_falls_back_to_a_full_listing(tmp_path, limiter):
+    service = seeded_service()
+    CalendarSyncState(CALENDAR, str(tmp_path)).sync(service, TIME_MIN, limiter)
+    service.expired = True
+    # A fresh instance reads the token the first run saved
+    events = CalendarSyncState(CALENDAR, str(tmp_path)).sync(service, TIME_MIN, limiter)
+    assert len(events) == 1
+    assert service.lists[1]['syncToken'] is not None
+    assert service.lists[2] == {'syncToken': None, 'privateExtendedProperty': None, 'q': None}
+
+
+def test_planner_matches_tagged_events_on_their_shift_key():
+    shifts = [WorkShift(dt.date(2026, 3, 12), dt.time(9), dt.time(13)),
+              WorkShift(dt.date(2026, 3, 12), dt.time(17), dt.time(21))]
+    evening = dict(event(LOADER_EVENT_SUMMARY, shifts[1].shift_local_start_time.isoformat(), '20260312-1'),
+                   id='evening', end={'dateTime': shifts[1].shift_local_end_time.isoformat()})
+    # The morning event was dragged past the evening one, by ordinal they would swap keys
+    moved = dict(event(LOADER_EVENT_SUMMARY, '2026-03-12T22:00:00-04:00', '20260312-0'), id='moved')
+    plan = plan_reconciliation(shifts, [evening, moved], window_start=dt.date(2026, 3, 11))
+    assert [(mutation.operation, mutation.key, mutation.event_id) for mutation in plan.mutations] == \
+        [('patch', '20260312-0', 'moved')]
+    assert plan.unchanged == {'20260312-1': 'evening'}
@@ -0,0 +1,73 @@
+import datetime as dt
+
+from src.Classes.Concurrent_User_Runner import run_user
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Schedule_Sink import ScheduleSink
+from src.Classes.work_shift import WorkShift
+from src.Benchmarks.fake_calendar_service import FakeCalendarService, FakeServiceFactory, FakeHttpError
+from src.Benchmarks.static_schedule_source import StaticScheduleSource
+
+CALENDAR = 'runner@test'
+
+
+class RejectingCalendarService(FakeCalendarService):
+    def insert_event(self, calendar_id, body):
+        self.count('insert')
+        raise FakeHttpError(400, 'Invalid start time')
+
+
+class MissingCalendarService(FakeCalendarService):
+    def list_events(self, *args, **kwargs):
+        raise FakeHttpError(404, 'Calendar not found')
+
+
+def upcoming():
+    return key_shifts([WorkShift(dt.date.today() + dt.timedelta(days=2), dt.time(9), dt.time(17))])
+
+
+def writer_kwargs(service, limiter):
+    return {'schedule_source': StaticScheduleSource({'user': upcoming()}),
+            'service_factory': FakeServiceFactory(service), 'rate_limiter': limiter}
+
+
+def test_successful_run_is_ok(limiter):
+    service = FakeCalendarService()
+    result = run_user('user', 'pass', CALENDAR, writer_kwargs(service, limiter))
+    assert result.ok and result.error is None
+    assert len(service.live_events(CALENDAR)) == 1
+
+
+def test_failed_mutations_fail_the_user(limiter):
+    result = run_user('user', 'pass', CALENDAR, writer_kwargs(RejectingCalendarService(), limiter))
+    assert not result.ok
+    assert '1 of 1 calendar mutations failed' in result.error
+
+
+def test_api_error_fails_the_user(limiter):
+    result = run_user('user', 'pass', CALENDAR, writer_kwargs(MissingCalendarService(), limiter))
+    assert not result.ok
+    assert 'Calendar not found' in result.error
+
+
+class RecordingSink(ScheduleSink):
+    def __init__(self):
+        self.written = []
+
+    def write_schedule(self, user_in, calendar_id, schedule, months):
+        self.written.append((user_in, calendar_id, len(schedule)))
+
+
+def test_calendar_api_off_writes_only_the_other_sinks():
+    recording = RecordingSink()
+    # No service factory, loading credentials would fail the user
+    result = run_user('user', 'pass', CALENDAR, {'schedule_source': StaticScheduleSource({'user': upcoming()}),
+                                                 'sinks': [recording], 'calendar_api': False})
+    assert result.ok
+    assert recording.written == [('user', CALENDAR, 1)]
+
+
+def test_dry_run_writes_nothing(limiter):
+    service, recording = FakeCalendarService(), RecordingSink()
+    result = run_user('user', 'pass', CALENDAR, dict(writer_kwargs(service, limiter), sinks=[recording], debug=True))
+    assert result.ok
+    assert recording.written == [] and service.live_events(CALENDAR) == []
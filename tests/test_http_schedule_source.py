@@ -0,0 +1,121 @@
+import datetime as dt
+
+import pytest
+
+from src.Classes.work_shift import WorkShift
+from src.Classes.Schedule_Parser import month_offset, parse_workday_shift_string
+from src.Classes.Schedule_Source import HttpScheduleSource, FallbackScheduleSource, ScheduleFetchError
+from src.Benchmarks.fake_storeforce_server import FakeStoreForceServer
+from src.Benchmarks.static_schedule_source import StaticScheduleSource
+
+USERS = {'alice': 'secret'}
+
+
+class GarbageStoreForceServer(FakeStoreForceServer):
+    # Answers the schedule endpoint with something that is not a ScheduleWeeks model
+    def schedule_model(self, user, year, month):
+        return {'Message': 'Session expired, please log in again'}
+
+
+class EmptyStoreForceServer(FakeStoreForceServer):
+    # A ScheduleWeeks model with no weeks in it, which says nothing about the user's shifts
+    def schedule_model(self, user, year, month):
+        return {'MonthName': 'March', 'ScheduleWeeks': []}
+
+
+@pytest.fixture
+def server():
+    with FakeStoreForceServer(USERS, seed=3) as fake_server:
+        yield fake_server
+
+
+def expected_shifts(server, user, months):
+    today = dt.date.today()
+    expected = {}
+    for offset in range(months):
+        year, month = month_offset(today, offset)
+        for day, shift in server.month_schedule(user, year, month).items():
+            if dt.date(year, month, day) > today:
+                expected[dt.date(year, month, day)] = parse_workday_shift_string(shift)
+    return expected
+
+
+def test_login_sets_the_session_cookie(server):
+    source = HttpScheduleSource(base_url=server.base_url)
+    session = source._new_session()
+    source.login(session, 'alice', 'secret')
+    assert session.cookies
+    assert server.requests['login'] == 1
+
+
+def test_login_rejected_and_unavailable(server):
+    source = HttpScheduleSource(base_url=server.base_url)
+    with pytest.raises(ScheduleFetchError, match='rejected'):
+        source.login(source._new_session(), 'alice', 'wrong')
+    server.login_failure_rate = 1.0
+    with pytest.raises(ScheduleFetchError, match='HTTP 503'):
+        source.login(source._new_session(), 'alice', 'secret')
+
+
+def test_fetch_month_needs_a_session(server):
+    source = HttpScheduleSource(base_url=server.base_url)
+    with pytest.raises(ScheduleFetchError, match='HTTP 401'):
+        source.fetch_month(source._new_session(), 2026, 3)
+
+
+def test_fetch_month_and_parse_month(server):
+    source = HttpScheduleSource(base_url=server.base_url)
+    session = source._new_session()
+    source.login(session, 'alice', 'secret')
+    model = source.fetch_month(session, 2026, 3)
+    schedule = HttpScheduleSource.parse_month(model, 2026, 3, dt.date(2026, 2, 28))
+    expected = {dt.date(2026, 3, day): parse_workday_shift_string(shift)
+                for day, shift in server.month_schedule('alice', 2026, 3).items()}
+    assert {shift.date: (shift.start_time, shift.end_time) for shift in schedule.values()} == expected
+    assert all(key == shift.date.strftime('%Y%m%d') + '-0' for key, shift in schedule.items())
+
+
+def test_parse_month_rejects_unrecognised_payloads():
+    for payload in ({'Message': 'Login required'}, [], None):
+        with pytest.raises(ScheduleFetchError):
+            HttpScheduleSource.parse_month(payload, 2026, 3, dt.date(2026, 3, 1))
+
+
+def test_fetch_schedule_matches_the_site(server):
+    schedule = HttpScheduleSource(base_url=server.base_url, months=2).fetch_schedule('alice', 'secret')
+    assert {shift.date: (shift.start_time, shift.end_time) for shift in schedule.values()} == \
+        expected_shifts(server, 'alice', 2)
+
+
+def test_user_without_shifts_gets_an_empty_schedule():
+    # Every month lists its days and none has a shift, e.g. a user on leave
+    with FakeStoreForceServer(USERS, density=0.0) as idle_server:
+        assert HttpScheduleSource(base_url=idle_server.base_url).fetch_schedule('alice', 'secret') == {}
+
+
+def test_fetch_schedule_raises_on_payloads_that_cannot_vouch_for_it():
+    with EmptyStoreForceServer(USERS) as empty_server:
+        with pytest.raises(ScheduleFetchError, match='no days'):
+            HttpScheduleSource(base_url=empty_server.base_url).fetch_schedule('alice', 'secret')
+    with GarbageStoreForceServer(USERS) as garbage_server:
+        with pytest.raises(ScheduleFetchError, match='ScheduleWeeks'):
+            HttpScheduleSource(base_url=garbage_server.base_url).fetch_schedule('alice', 'secret')
+
+
+def test_fallback_uses_the_next_source_when_http_fails(server):
+    backup = StaticScheduleSource({'alice': {'20260312-0': WorkShift(dt.date(2026, 3, 12), dt.time(9), dt.time(17))}})
+    fallback = FallbackScheduleSource([HttpScheduleSource(base_url=server.base_url), backup])
+    assert fallback.fetch_schedule('alice', 'wrong') == backup.schedules['alice']
+    assert backup.calls == 1
+    # A working HTTP source never touches the backup
+    assert fallback.fetch_schedule('alice', 'secret')
+    assert backup.calls == 1
+
+
+def test_fallback_on_connection_errors():
+    with FakeStoreForceServer(USERS) as stopped_server:
+        base_url = stopped_server.base_url
+    backup = StaticScheduleSource({'alice': {}})
+    fallback = FallbackScheduleSource([HttpScheduleSource(base_url=base_url, timeout=2), backup])
+    assert fallback.fetch_schedule('alice', 'secret') == {}
+    assert backup.calls == 1
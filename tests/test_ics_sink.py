@@ -0,0 +1,86 @@
+import os
+import datetime as dt
+
+import pytest
+
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Schedule_Pipeline import load_user_schedule
+from src.Classes.Schedule_Sink import IcsScheduleSink, ScheduleSink, ScheduleSinkError, ics_fold, \
+    parse_vevents, ICS_LINE_END
+from src.Classes.work_shift import WorkShift
+from src.Benchmarks.static_schedule_source import StaticScheduleSource
+
+TODAY = dt.date(2026, 3, 10)
+CALENDAR = 'feed@test'
+
+
+def schedule(*shifts):
+    return key_shifts(WorkShift(dt.date(2026, 3, day), dt.time(start), dt.time(end)) for day, start, end in shifts)
+
+
+def test_render_round_trips_through_parse_vevents():
+    content = IcsScheduleSink().render(CALENDAR, schedule((12, 9, 13), (12, 17, 21), (14, 10, 18)), 2,
+                                       today=TODAY)
+    events = parse_vevents(content)
+    assert [(event.key, event.sequence) for event in events] == \
+        [('20260312-0', 0), ('20260312-1', 0), ('20260314-0', 0)]
+    assert events[0].start == '20260312T130000Z' and events[0].end == '20260312T170000Z'
+    assert content.startswith('BEGIN:VCALENDAR' + ICS_LINE_END)
+    assert content.endswith('END:VCALENDAR' + ICS_LINE_END)
+    assert all(len(line.encode('utf-8')) <= 75 for line in content.split(ICS_LINE_END))
+
+
+def test_fold_limits_octets_without_splitting_characters():
+    line = 'DESCRIPTION:' + 'Schichtübergabe ☕ ' * 12
+    folded = ics_fold(line)
+    physical = folded.split(ICS_LINE_END)
+    assert len(physical) > 1
+    assert all(len(part.encode('utf-8')) <= 75 for part in physical)
+    assert all(part.startswith(' ') for part in physical[1:])
+    assert folded.replace(ICS_LINE_END + ' ', '') == line
+    assert ics_fold('SUMMARY:short') == 'SUMMARY:short'
+
+
+def test_changed_shift_bumps_sequence_and_keeps_the_rest_byte_for_byte():
+    sink = IcsScheduleSink()
+    first = sink.render(CALENDAR, schedule((12, 9, 13), (14, 10, 18)), 2, today=TODAY)
+    second = sink.render(CALENDAR, schedule((12, 9, 13), (14, 11, 19)), 2, existing=first, today=TODAY)
+    before, after = parse_vevents(first), parse_vevents(second)
+    assert after[0].text == before[0].text
+    assert (after[1].sequence, after[1].start) == (1, '20260314T150000Z')
+    # A cancelled shift disappears from the feed
+    third = sink.render(CALENDAR, schedule((14, 11, 19)), 2, existing=second, today=TODAY)
+    assert [event.key for event in parse_vevents(third)] == ['20260314-0']
+
+
+def test_unchanged_feed_is_not_rewritten(tmp_path):
+    sink = IcsScheduleSink(str(tmp_path))
+    # write_schedule renders against the real date, so the shift has to be ahead of it
+    shifts = key_shifts([WorkShift(dt.date.today() + dt.timedelta(days=2), dt.time(9), dt.time(13))])
+    sink.write_schedule('user', CALENDAR, shifts, 2)
+    path = sink.path_for('user')
+    os.utime(path, (0, 0))
+    sink.write_schedule('user', CALENDAR, shifts, 2)
+    assert os.stat(path).st_mtime == 0
+    assert not os.path.exists(path + '.tmp')
+
+
+class BrokenSink(ScheduleSink):
+    def write_schedule(self, user_in, calendar_id, schedule, months):
+        raise OSError('disk full')
+
+
+class RecordingSink(ScheduleSink):
+    def __init__(self):
+        self.written = []
+
+    def write_schedule(self, user_in, calendar_id, schedule, months):
+        self.written.append((user_in, sorted(schedule)))
+
+
+def test_failing_sink_does_not_stop_the_others():
+    recording = RecordingSink()
+    with pytest.raises(ScheduleSinkError, match='1 of 2 sinks failed.*disk full'):
+        load_user_schedule(StaticScheduleSource({'user': schedule((12, 9, 13))}), [BrokenSink(), recording],
+                           'user', 'pass', CALENDAR)
+    assert recording.written == [('user', ['20260312-0'])]
@@ -0,0 +1,87 @@
+import datetime as dt
+
+from src.Classes.Calendar_Batch_Writer import CalendarBatchWriter, BatchItemResult
+from src.Classes.Calendar_Sync_State import event_id_for
+from src.Classes.Google_Calendar_Writer import LushGoogleCalendarWriter
+from src.Classes.Mutation_Journal import MutationJournal
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Schedule_Pipeline import load_user_schedule
+from src.Classes.Schedule_Snapshot_Store import ScheduleSnapshotStore
+from src.Classes.work_shift import WorkShift
+from src.Benchmarks.fake_calendar_service import FakeCalendarService, FakeServiceFactory
+from src.Benchmarks.static_schedule_source import StaticScheduleSource
+
+CALENDAR = 'journal@test'
+
+
+def upcoming_schedule():
+    # The writer reconciles from tomorrow on, so the shifts have to be ahead of the real date
+    today = dt.date.today()
+    return key_shifts(WorkShift(today + dt.timedelta(days=days), dt.time(9), dt.time(17)) for days in (2, 3))
+
+
+def insert_body(key, shift):
+    return LushGoogleCalendarWriter.create_event(shift.shift_local_start_time, shift.shift_local_end_time, key,
+                                                 event_id_for(CALENDAR, key))
+
+
+def run_writer(service, schedule, journal_dir, limiter):
+    writer = LushGoogleCalendarWriter(service_factory=FakeServiceFactory(service), rate_limiter=limiter,
+                                      journal_dir=journal_dir)
+    load_user_schedule(StaticScheduleSource({'user': schedule}), [writer], 'user', 'pass', CALENDAR)
+
+
+def test_conflicting_insert_becomes_an_update(limiter):
+    service = FakeCalendarService()
+    key, shift = next(iter(upcoming_schedule().items()))
+    body = insert_body(key, shift)
+    service.insert_event(CALENDAR, dict(body))
+    service.delete_event(CALENDAR, body['id'])
+    batch = CalendarBatchWriter(service, CALENDAR, limiter=limiter)
+    batch.insert(body, key=key)
+    results = batch.execute()
+    assert [result.ok for result in results] == [True]
+    assert service.calls['insert'] == 2 and service.calls['update'] == 1
+    # The deleted event came back instead of a second copy being made
+    assert [event['id'] for event in service.live_events(CALENDAR)] == [body['id']]
+
+
+def test_replay_sends_only_pending_operations(tmp_path, limiter):
+    service = FakeCalendarService()
+    schedule = upcoming_schedule()
+    bodies = [(key, insert_body(key, shift)) for key, shift in sorted(schedule.items())]
+    journal = MutationJournal(CALENDAR, str(tmp_path))
+    journal.begin(ScheduleSnapshotStore.content_hash(schedule), {},
+                  [('insert', key, body['id'], body) for key, body in bodies])
+    # The first insert landed before the run died
+    service.insert_event(CALENDAR, dict(bodies[0][1]))
+    journal.mark_done([BatchItemResult('insert', bodies[0][0], bodies[0][1]['id'], {}, None)])
+
+    run_writer(service, schedule, str(tmp_path), limiter)
+    assert service.calls['insert'] == 2
+    assert sorted(event['id'] for event in service.live_events(CALENDAR)) == sorted(body['id'] for _, body in bodies)
+    assert journal.load() is None
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = MutationJournal(CALENDAR, str(tmp_path))
+    journal.begin('hash', {}, [('insert', '20260312-0', 'a', {}), ('insert', '20260313-0', 'b', {})])
+    journal.mark_done([BatchItemResult('insert', '20260312-0', 'a', {}, None)])
+    with open(journal.path, 'a') as journal_file:
+        journal_file.write('{"done": ["insert", "2026031')
+    entry = journal.load()
+    assert entry.done == {('insert', '20260312-0'): 'a'}
+    assert [operation[1] for operation in entry.pending] == ['20260313-0']
+
+
+def test_changed_schedule_drops_the_journal(tmp_path, limiter):
+    service = FakeCalendarService()
+    schedule = upcoming_schedule()
+    journal = MutationJournal(CALENDAR, str(tmp_path))
+    journal.begin('stale', {}, [('delete', None, 'ghost', None)])
+
+    run_writer(service, schedule, str(tmp_path), limiter)
+    # The stale plan is not replayed, the calendar is reconciled against the new schedule instead
+    assert service.calls['delete'] == 0
+    assert len(service.live_events(CALENDAR)) == len(schedule)
+    assert journal.load() is None
@@ -0,0 +1,27 @@
+import os
+import threading
+
+from src.Classes.Run_Metrics import MetricsRegistry
+
+
+def test_concurrent_writes_do_not_collide(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.incr('user_runs')
+    errors = []
+
+    def write_many():
+        for _ in range(100):
+            try:
+                metrics.write(str(tmp_path), 'daemon')
+            except Exception as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=write_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(os.listdir(tmp_path)) == ['daemon.json', 'daemon.prom']
+    assert 'work_schedule_loader_user_runs_total 1' in (tmp_path / 'daemon.prom').read_text()
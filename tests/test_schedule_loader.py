@@ -0,0 +1,78 @@
+import datetime as dt
+
+import pytest
+
+from src.Classes.Schedule_Loader import ScheduleLoader
+from src.Classes.Schedule_Source import ScheduleFetchError
+
+SCRAPE_DATE = dt.date(2026, 3, 10)
+MONTHS = ['March', 'April']
+
+
+class FakeElement(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def text(self):
+        return self.driver.month_name
+
+    def click(self):
+        if self.driver.advances:
+            self.driver.month_index += 1
+
+
+class FakeCalendarDriver(object):
+    # Just enough WebDriver for iter_schedule: a month label, a next button, day cells and the script's rows
+    def __init__(self, advances=True, rows=([20, '9:00 AM - 5:00 PM'],), day_cells=31):
+        self.advances = advances
+        self.month_index = 0
+        self.rows = [list(row) for row in rows]
+        self.day_cells = day_cells
+
+    @property
+    def month_name(self):
+        return MONTHS[self.month_index]
+
+    def find_element(self, by, value):
+        return FakeElement(self)
+
+    def find_elements(self, by, value):
+        return [FakeElement(self)] * self.day_cells if value == 'div.calendar-day' else []
+
+    def execute_script(self, script, *args):
+        return self.rows
+
+
+def loader_for(driver, monkeypatch):
+    loader = ScheduleLoader('user', 'pass', 1, load=False, date=SCRAPE_DATE, months=len(MONTHS),
+                            extraction='script')
+    loader.driver = driver
+    monkeypatch.setattr(loader, 'open_schedule', lambda: True)
+    timed_wait = loader.timed_wait
+    # The real render wait allows 10s plus a 2s fallback sleep
+    monkeypatch.setattr(loader, 'timed_wait', lambda name, condition, timeout, fallback_sleep=0.0:
+                        timed_wait(name, condition, 0.3, 0))
+    return loader
+
+
+def test_each_month_gets_its_own_shifts(monkeypatch):
+    shifts = list(loader_for(FakeCalendarDriver(), monkeypatch).iter_schedule())
+    assert [shift.date for shift in shifts] == [dt.date(2026, 3, 20), dt.date(2026, 4, 20)]
+
+
+def test_month_that_never_renders_stops_the_scrape(monkeypatch):
+    loader = loader_for(FakeCalendarDriver(advances=False), monkeypatch)
+    with pytest.raises(ScheduleFetchError, match="still shows 'March'"):
+        # March's shift must not come back a second time as April 20th
+        list(loader.iter_schedule())
+
+
+def test_month_without_shifts_is_empty_when_its_days_rendered(monkeypatch):
+    assert list(loader_for(FakeCalendarDriver(rows=()), monkeypatch).iter_schedule()) == []
+
+
+def test_month_without_days_is_not_trusted_as_empty(monkeypatch):
+    loader = loader_for(FakeCalendarDriver(rows=(), day_cells=0), monkeypatch)
+    with pytest.raises(ScheduleFetchError, match='no calendar days'):
+        list(loader.iter_schedule())
@@ -0,0 +1,69 @@
+import os
+import datetime as dt
+
+import pytest
+from bs4 import BeautifulSoup
+
+from src.Classes import Schedule_Parser
+from src.Classes.Schedule_Loader import ScheduleLoader
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+# Saved rendered pages for two consecutive months, scraped as if on this date
+FIXTURE_PAGES = ['storeforce_schedule_2026_03.html', 'storeforce_schedule_2026_04.html']
+SCRAPE_DATE = dt.date(2026, 3, 10)
+
+
+def read_fixtures():
+    pages = []
+    for file_name in FIXTURE_PAGES:
+        with open(os.path.join(FIXTURE_DIR, file_name), 'r', encoding='utf-8') as fixture_file:
+            pages.append(fixture_file.read())
+    return pages
+
+
+def as_times(schedule):
+    return {key: (shift.shift_local_start_time, shift.shift_local_end_time) for key, shift in schedule.items()}
+
+
+def legacy_schedule(loader, pages):
+    soups = [BeautifulSoup(page, 'html.parser').find_all('div', class_='calendar-day scheduled') for page in pages]
+    return as_times(loader.parse_scheduled_days(soups))
+
+
+@pytest.fixture
+def loader():
+    return ScheduleLoader('fixture', 'fixture', 0, load=False, date=SCRAPE_DATE, months=len(FIXTURE_PAGES))
+
+
+def test_legacy_parser_reads_the_fixtures(loader):
+    schedule = legacy_schedule(loader, read_fixtures())
+    # Days after the scrape date only: 9 in March past the 10th and all 9 in April
+    assert len(schedule) == 18
+    assert schedule['20260316-0'][0].time() == dt.time(10)
+    assert schedule['20260316-0'][1].time() == dt.time(18, 30)
+
+
+requires_selectolax = pytest.mark.skipif(Schedule_Parser.HTMLParser is None, reason='selectolax is not installed')
+
+
+@requires_selectolax
+def test_selectolax_matches_legacy_parser(loader):
+    pages = read_fixtures()
+    rows = [Schedule_Parser._rows_selectolax(page) for page in pages]
+    assert as_times(loader.parse_scheduled_rows(rows)) == legacy_schedule(loader, pages)
+
+
+def test_bs4_lxml_matches_legacy_parser(loader, monkeypatch):
+    pytest.importorskip('lxml')
+    monkeypatch.setattr(Schedule_Parser, 'BS4_PARSER', 'lxml')
+    pages = read_fixtures()
+    rows = [Schedule_Parser._rows_bs4(page) for page in pages]
+    assert as_times(loader.parse_scheduled_rows(rows)) == legacy_schedule(loader, pages)
+
+
+@requires_selectolax
+def test_backends_return_identical_rows():
+    pytest.importorskip('lxml')
+    for page in read_fixtures():
+        assert [(day, ' '.join(shift.split())) for day, shift in Schedule_Parser._rows_selectolax(page)] == \
+            [(day, ' '.join(shift.split())) for day, shift in Schedule_Parser._rows_bs4(page)]
@@ -0,0 +1,62 @@
+import sqlite3
+import datetime as dt
+
+from src.Classes.Reconciliation_Planner import key_shifts
+from src.Classes.Schedule_Snapshot_Store import ScheduleSnapshotStore
+from src.Classes.work_shift import WorkShift
+
+CALENDAR = 'snapshot@test'
+
+
+def schedule(*shifts):
+    return key_shifts(WorkShift(dt.date(2026, 3, day), dt.time(start), dt.time(end)) for day, start, end in shifts)
+
+
+def store_at(tmp_path, **kwargs):
+    return ScheduleSnapshotStore(str(tmp_path / 'snapshots.sqlite3'), **kwargs)
+
+
+def test_unchanged_only_after_the_same_schedule_was_recorded(tmp_path):
+    store = store_at(tmp_path)
+    first = schedule((12, 9, 17), (13, 10, 18))
+    assert not store.is_unchanged('user', CALENDAR, first)
+    store.record('user', CALENDAR, first, {'20260312-0': 'event12', '20260313-0': 'event13'})
+    # Same shifts built again, in another order
+    assert store.is_unchanged('user', CALENDAR, schedule((13, 10, 18), (12, 9, 17)))
+    assert not store.is_unchanged('user', CALENDAR, schedule((12, 9, 17), (13, 11, 18)))
+    # Snapshots are per user and calendar
+    assert not store.is_unchanged('other', CALENDAR, first)
+    assert not store.is_unchanged('user', 'other@test', first)
+
+
+def test_old_snapshot_no_longer_vouches_for_the_calendar(tmp_path):
+    store = store_at(tmp_path, max_age=dt.timedelta(hours=1))
+    shifts = schedule((12, 9, 17))
+    store.record('user', CALENDAR, shifts, {})
+    assert store.is_unchanged('user', CALENDAR, shifts)
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute('UPDATE snapshots SET updated_at = ?',
+                     ((dt.datetime.utcnow() - dt.timedelta(hours=2)).isoformat(),))
+    assert not store.is_unchanged('user', CALENDAR, shifts)
+    # Without a max age the hash alone decides
+    assert store_at(tmp_path, max_age=None).is_unchanged('user', CALENDAR, shifts)
+
+
+def test_changes_since_last_run(tmp_path):
+    store = store_at(tmp_path)
+    assert store.changes_since_last_run('user', CALENDAR, schedule((12, 9, 17))).added == ['20260312-0']
+    store.record('user', CALENDAR, schedule((12, 9, 17), (13, 10, 18)), {})
+    changes = store.changes_since_last_run('user', CALENDAR, schedule((12, 9, 17), (13, 11, 19), (14, 9, 13)))
+    assert changes == (['20260314-0'], [], ['20260313-0'])
+    changes = store.changes_since_last_run('user', CALENDAR, schedule((12, 9, 17)))
+    assert changes == ([], ['20260313-0'], [])
+    assert not store.changes_since_last_run('user', CALENDAR, schedule((12, 9, 17), (13, 10, 18)))
+
+
+def test_record_replaces_the_written_event_ids(tmp_path):
+    store = store_at(tmp_path)
+    store.record('user', CALENDAR, schedule((12, 9, 17), (13, 10, 18)),
+                 {'20260312-0': 'event12', '20260313-0': 'event13'})
+    store.record('user', CALENDAR, schedule((12, 9, 17)), {'20260312-0': 'event12'})
+    assert store.last_event_ids('user', CALENDAR) == {'20260312-0': 'event12'}
+    assert store.last_event_ids('other', CALENDAR) == {}
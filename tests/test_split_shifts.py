@@ -0,0 +1,32 @@
+import datetime as dt
+
+from src.Classes.Schedule_Parser import build_schedule
+from src.Classes.Schedule_Source import HttpScheduleSource
+from src.Classes.Reconciliation_Planner import plan_reconciliation
+
+TODAY = dt.date(2026, 3, 10)
+
+
+def test_build_schedule_keeps_both_halves_of_a_split_shift():
+    rows = [[(12, '9:00 AM - 1:00 PM'), (12, '5:00 PM - 9:00 PM'), (13, '10:00 AM - 6:30 PM')]]
+    schedule = build_schedule(rows, TODAY)
+    assert sorted(schedule) == ['20260312-0', '20260312-1', '20260313-0']
+    assert schedule['20260312-0'].start_time == dt.time(9)
+    assert schedule['20260312-1'].start_time == dt.time(17)
+
+
+def test_parse_month_keeps_both_halves_of_a_split_shift():
+    model = {'ScheduleWeeks': [{'Days': [{'Day': 12, 'Shift': '5:00 PM - 9:00 PM'},
+                                         {'Day': 12, 'Shift': '9:00 AM - 1:00 PM'},
+                                         {'Day': None, 'Shift': None}]}]}
+    schedule = HttpScheduleSource.parse_month(model, 2026, 3, TODAY)
+    # Ordinals follow start time, not the order the site lists them in
+    assert [(key, shift.start_time) for key, shift in sorted(schedule.items())] == \
+        [('20260312-0', dt.time(9)), ('20260312-1', dt.time(17))]
+
+
+def test_split_shift_reaches_the_planner_as_two_inserts():
+    schedule = build_schedule([[(12, '9:00 AM - 1:00 PM'), (12, '5:00 PM - 9:00 PM')]], TODAY)
+    plan = plan_reconciliation(schedule.values(), [], window_start=TODAY + dt.timedelta(days=1))
+    assert [(mutation.operation, mutation.key) for mutation in plan.mutations] == \
+        [('insert', '20260312-0'), ('insert', '20260312-1')]
@@ -0,0 +1,37 @@
+import pickle
+import datetime as dt
+
+import pytest
+
+from src.Classes.work_shift import WorkShift
+
+ZONE = 'America/New_York'
+
+
+def test_offset_follows_the_shift_date_across_dst():
+    # Clocks went forward on 2026-03-08 in New York
+    before, after = WorkShift.from_rows([(dt.date(2026, 3, 7), dt.time(9), dt.time(17)),
+                                         (dt.date(2026, 3, 9), dt.time(9), dt.time(17))], ZONE)
+    assert before.shift_local_start_time.isoformat() == '2026-03-07T09:00:00-05:00'
+    assert after.shift_local_start_time.isoformat() == '2026-03-09T09:00:00-04:00'
+    assert after.shift_local_end_time.utcoffset() == dt.timedelta(hours=-4)
+    # The constructor and from_rows agree
+    assert WorkShift(dt.date(2026, 3, 9), dt.time(9), dt.time(17), ZONE).shift_local_start_time == \
+        after.shift_local_start_time
+
+
+def test_work_shift_is_immutable():
+    shift = WorkShift(dt.date(2026, 3, 9), dt.time(9), dt.time(17), ZONE)
+    with pytest.raises(AttributeError):
+        shift.start_time = dt.time(10)
+    with pytest.raises(AttributeError):
+        del shift.date
+    assert shift.start_time == dt.time(9)
+
+
+def test_work_shift_pickles_for_the_process_pool():
+    shift = WorkShift(dt.date(2026, 3, 9), dt.time(9), dt.time(17), ZONE)
+    restored = pickle.loads(pickle.dumps(shift))
+    assert restored == shift and hash(restored) == hash(shift)
+    assert restored.shift_local_start_time == shift.shift_local_start_time
+    assert restored.zone_key == ZONE